@@ -0,0 +1,11 @@
+// One page of a list endpoint. nextCursor is the X-Next-Cursor header of the
+// response: pass it back as `cursor` to fetch the page after this one. It is
+// null on the last page.
+class PagedList<T> {
+  final List<T> items;
+  final String? nextCursor;
+
+  PagedList(this.items, this.nextCursor);
+
+  bool get hasMore => nextCursor != null;
+}
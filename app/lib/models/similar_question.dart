@@ -0,0 +1,21 @@
+import 'question.dart';
+
+class SimilarQuestion {
+  final Question question;
+  final double similarity;
+  final bool likelyDuplicate;
+
+  SimilarQuestion({
+    required this.question,
+    required this.similarity,
+    required this.likelyDuplicate,
+  });
+
+  factory SimilarQuestion.fromJson(Map<String, dynamic> json) {
+    return SimilarQuestion(
+      question: Question.fromJson(json),
+      similarity: (json['similarity'] ?? 0).toDouble(),
+      likelyDuplicate: json['likely_duplicate'] ?? false,
+    );
+  }
+}
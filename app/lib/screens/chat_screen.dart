@@ -20,6 +20,7 @@ class _ChatScreenState extends State<ChatScreen> {
   // Store conversation messages
   List<ChatMessage> messages = [];
   bool isLoading = false;
+  String? loadingStatus;
   List<File> selectedFiles = [];
   
   // API Configuration - Update these with your actual values
@@ -98,6 +99,7 @@ Key signs of measles include:
         timestamp: DateTime.now(),
       ));
       isLoading = true;
+      loadingStatus = null;
     });
 
     // Scroll to bottom
@@ -109,19 +111,39 @@ Key signs of measles include:
         await _createSession();
       }
       
-      // Send query to API
-      final response = await _sendQuery(userMessage);
-      
-      // Add bot response
-      setState(() {
-        messages.add(ChatMessage(
-          text: '',
-          isUser: false,
-          timestamp: DateTime.now(),
-          response: response,
-        ));
-        isLoading = false;
-      });
+      // Stream the answer into a bot message as it arrives
+      int? botIndex;
+      void showResponse(ChatResponse response) {
+        setState(() {
+          final message = ChatMessage(
+            text: '',
+            isUser: false,
+            timestamp: DateTime.now(),
+            response: response,
+          );
+          if (botIndex == null) {
+            messages.add(message);
+            botIndex = messages.length - 1;
+          } else {
+            messages[botIndex!] = message;
+          }
+          isLoading = false;
+        });
+        _scrollToBottom();
+      }
+
+      ChatResponse response;
+      try {
+        response = await _streamQuery(
+          userMessage,
+          onAgent: (agent) => setState(() => loadingStatus = _agentStatus(agent)),
+          onUpdate: showResponse,
+        );
+      } on StreamingUnavailableException {
+        // Server without /chat_sse: wait for the whole answer instead
+        response = await _sendQuery(userMessage);
+      }
+      showResponse(response);
     } catch (e) {
       // Handle error
       setState(() {
@@ -166,6 +188,106 @@ Key signs of measles include:
     }
   }
 
+  Future<ChatResponse> _streamQuery(
+    String message, {
+    required void Function(String agent) onAgent,
+    required void Function(ChatResponse response) onUpdate,
+  }) async {
+    final client = http.Client();
+    try {
+      final request = http.Request('POST', Uri.parse('$baseUrl/chat_sse'))
+        ..headers['Content-Type'] = 'application/json'
+        ..headers['Accept'] = 'text/event-stream'
+        ..body = jsonEncode({
+          'appName': appName,
+          'userId': userId,
+          'sessionId': sessionId,
+          'newMessage': {
+            'role': 'user',
+            'parts': [
+              {
+                'text': message,
+              }
+            ]
+          },
+          'streaming': true,
+        });
+      final response = await client.send(request);
+
+      if (response.statusCode != 200) {
+        final body = await response.stream.bytesToString();
+        if (response.statusCode == 404 && body.contains('"Not Found"')) {
+          throw StreamingUnavailableException();
+        }
+        throw Exception('API call failed. Status: ${response.statusCode}, Body: $body');
+      }
+
+      // Frames: agent, token, citation, related_questions, error, done
+      String answer = '';
+      final List<String> citations = [];
+      List<String> relatedQuestions = [];
+      final lines = response.stream.transform(utf8.decoder).transform(const LineSplitter());
+      await for (final line in lines) {
+        if (!line.startsWith('data: ')) continue;
+        final frame = jsonDecode(line.substring('data: '.length));
+
+        switch (frame['type']) {
+          case 'agent':
+            onAgent(frame['agent']);
+            continue;
+          case 'token':
+            answer += frame['text'];
+            break;
+          case 'citation':
+            citations.add(frame['text']);
+            break;
+          case 'related_questions':
+            relatedQuestions = List<String>.from(frame['questions']);
+            break;
+          case 'error':
+            throw Exception(frame['message']);
+          case 'done':
+            final String finalAnswer = frame['answer'];
+            return ChatResponse(
+              message: finalAnswer.isNotEmpty ? finalAnswer : 'ASHA Vimarsh\n\nI understand your question. Let me provide you with relevant information.',
+              citations: List<String>.from(frame['citations']),
+              relatedQuestions: List<String>.from(frame['related_questions']),
+            );
+        }
+
+        if (answer.trim().isNotEmpty) {
+          onUpdate(ChatResponse(
+            message: answer.trim(),
+            citations: List<String>.from(citations),
+            relatedQuestions: relatedQuestions,
+          ));
+        }
+      }
+      throw Exception('The answer stream ended early');
+    } catch (e) {
+      if (e is StreamingUnavailableException) rethrow;
+      print('Error in _streamQuery: $e');
+      throw Exception('Failed to send query: $e');
+    } finally {
+      client.close();
+    }
+  }
+
+  String _agentStatus(String agent) {
+    switch (agent) {
+      case 'training_module_agent':
+        return 'Checking the ASHA training modules...';
+      case 'forum_agent':
+        return 'Searching the ASHA forum...';
+      case 'web_search_agent':
+        return 'Searching the web...';
+      case 'diagnostic_agent':
+        return 'Reading the report...';
+      default:
+        return 'ASHA Vimarsh is thinking...';
+    }
+  }
+
   Future<ChatResponse> _sendQuery(String message) async {
     try {
       final response = await http.post(
@@ -350,15 +472,15 @@ Key signs of measles include:
     return Container(
       margin: const EdgeInsets.symmetric(vertical: 8),
       padding: const EdgeInsets.all(16),
-      child: const Row(
+      child: Row(
         children: [
-          SizedBox(
+          const SizedBox(
             width: 20,
             height: 20,
             child: CircularProgressIndicator(strokeWidth: 2),
           ),
-          SizedBox(width: 12),
-          Text('ASHA Vimarsh is thinking...'),
+          const SizedBox(width: 12),
+          Text(loadingStatus ?? 'ASHA Vimarsh is thinking...'),
         ],
       ),
     );
@@ -519,4 +641,6 @@ class ChatResponse {
     required this.citations,
     required this.relatedQuestions,
   });
-}
\ No newline at end of file
+}
+
+class StreamingUnavailableException implements Exception {}
@@ -5,6 +5,7 @@ import '../constants/text_styles.dart';
 import '../services/api_service.dart';
 import '../models/question.dart';
 import '../models/answer.dart';
+import '../models/similar_question.dart';
 import '../widgets/forum_post_widget.dart';
 import '../widgets/answer_widget.dart';
 import '../services/api_service.dart';
@@ -20,7 +21,9 @@ class _ForumScreenState extends State<ForumScreen> {
   List<Question> _questions = [];
   bool _isLoading = true;
   String _error = '';
-  int _currentPage = 0;
+  // Cursor for the page after the last one loaded; null once all are loaded
+  String? _nextCursor;
+  bool _isLoadingMore = false;
   final int _pageSize = 10;
   final ScrollController _scrollController = ScrollController();
 
@@ -58,9 +61,9 @@ class _ForumScreenState extends State<ForumScreen> {
 
     if (response.success && response.data != null) {
       setState(() {
-        _questions = response.data!;
+        _questions = response.data!.items;
+        _nextCursor = response.data!.nextCursor;
         _isLoading = false;
-        _currentPage = 1;
       });
     } else {
       setState(() {
@@ -71,17 +74,28 @@ class _ForumScreenState extends State<ForumScreen> {
   }
 
   Future<void> _loadMoreQuestions() async {
+    final cursor = _nextCursor;
+    if (cursor == null || _isLoadingMore) {
+      return;
+    }
+    _isLoadingMore = true;
+
     final response = await ApiService.getQuestions(
-      skip: _currentPage * _pageSize,
       limit: _pageSize,
       sortBy: 'created_at',
       order: 'desc',
+      cursor: cursor,
     );
 
+    _isLoadingMore = false;
+    // A refresh while this page was loading has started over
+    if (cursor != _nextCursor) {
+      return;
+    }
     if (response.success && response.data != null) {
       setState(() {
-        _questions.addAll(response.data!);
-        _currentPage++;
+        _questions.addAll(response.data!.items);
+        _nextCursor = response.data!.nextCursor;
       });
     }
   }
@@ -266,6 +280,21 @@ class _CreateQuestionDialogState extends State<CreateQuestionDialog> {
         .where((tag) => tag.isNotEmpty)
         .toList();
 
+    // Point out likely duplicates before posting; if the check fails, post anyway
+    final similar = await ApiService.checkSimilarQuestions(
+      _titleController.text.trim(),
+      _contentController.text.trim(),
+    );
+    final duplicates = similar.success
+        ? similar.data!.where((match) => match.likelyDuplicate).toList()
+        : <SimilarQuestion>[];
+    if (duplicates.isNotEmpty && !await _confirmPost(duplicates)) {
+      setState(() {
+        _isLoading = false;
+      });
+      return;
+    }
+
     final response = await ApiService.createQuestion(
       _titleController.text.trim(),
       _contentController.text.trim(),
@@ -296,6 +325,41 @@ class _CreateQuestionDialogState extends State<CreateQuestionDialog> {
     });
   }
 
+  Future<bool> _confirmPost(List<SimilarQuestion> duplicates) async {
+    final post = await showDialog<bool>(
+      context: context,
+      builder: (context) => AlertDialog(
+        title: const Text('Similar questions already asked'),
+        content: Column(
+          mainAxisSize: MainAxisSize.min,
+          crossAxisAlignment: CrossAxisAlignment.start,
+          children: [
+            const Text('These questions may already have the answer you need:'),
+            const SizedBox(height: 8),
+            ...duplicates.map((match) => Padding(
+                  padding: const EdgeInsets.only(top: 6),
+                  child: Text(
+                    '• ${match.question.title} (${match.question.answerCount} answers)',
+                    style: const TextStyle(fontWeight: FontWeight.w600),
+                  ),
+                )),
+          ],
+        ),
+        actions: [
+          TextButton(
+            onPressed: () => Navigator.of(context).pop(false),
+            child: const Text('Cancel'),
+          ),
+          TextButton(
+            onPressed: () => Navigator.of(context).pop(true),
+            child: const Text('Post anyway'),
+          ),
+        ],
+      ),
+    );
+    return post ?? false;
+  }
+
   @override
   Widget build(BuildContext context) {
     return Dialog(
@@ -418,7 +482,7 @@ class _QuestionDetailScreenState extends State<QuestionDetailScreen> {
 
     if (response.success && response.data != null) {
       setState(() {
-        _answers = response.data!;
+        _answers = response.data!.items;
         _isLoading = false;
       });
     } else {
@@ -1,5 +1,6 @@
 // lib/services/api_service.dart
 import 'dart:convert';
+import 'dart:typed_data';
 import 'package:http/http.dart' as http;
 import '../models/user.dart';
 import '../models/question.dart';
@@ -8,6 +9,8 @@ import '../models/vote.dart';
 import '../models/api_response.dart';
 import '../models/login_response.dart';
 import '../models/search_response.dart';
+import '../models/similar_question.dart';
+import '../models/paged_list.dart';
 
 class ApiService {
   static const String baseUrl = 'http://34.58.74.142:8001'; // Android emulator
@@ -19,6 +22,45 @@ class ApiService {
     if (_authToken != null) 'Authorization': 'Bearer $_authToken',
   };
 
+  // Bodies of ETag-tagged GET responses, keyed by URL. The forum API answers
+  // 304 with an empty body when If-None-Match still matches, and the cached
+  // body is served instead, as the original bytes with the original headers:
+  // the 304 carries no Content-Type, and without one the body would be
+  // decoded as Latin-1, which fails on Hindi text.
+  static final Map<String, _CachedResponse> _etagCache = {};
+  static const int _etagCacheSize = 100;
+
+  // package:http lower-cases response header names
+  static const String _nextCursorHeader = 'x-next-cursor';
+
+  static String _pageQuery(int skip, String? cursor) =>
+      cursor != null ? 'cursor=${Uri.encodeQueryComponent(cursor)}' : 'skip=$skip';
+
+  static Future<http.Response> _cachedGet(String url) async {
+    final cached = _etagCache[url];
+    final response = await http.get(
+      Uri.parse(url),
+      headers: {
+        ..._headers,
+        if (cached != null) 'If-None-Match': cached.etag,
+      },
+    );
+
+    if (response.statusCode == 304 && cached != null) {
+      return http.Response.bytes(cached.bodyBytes, 200, headers: cached.headers, request: response.request);
+    }
+
+    final etag = response.headers['etag'];
+    if (response.statusCode == 200 && etag != null) {
+      _etagCache.remove(url);
+      if (_etagCache.length >= _etagCacheSize) {
+        _etagCache.remove(_etagCache.keys.first);
+      }
+      _etagCache[url] = _CachedResponse(etag, response.bodyBytes, response.headers);
+    }
+    return response;
+  }
+
   // Authentication endpoints
   static Future<ApiResponse<LoginResponse>> login(String email, String password) async {
     try {
@@ -69,22 +111,23 @@ class ApiService {
   }
 
   // Question endpoints
-  static Future<ApiResponse<List<Question>>> getQuestions({
+  // Pass the nextCursor of the previous page as cursor to page by key instead
+  // of by offset; skip is ignored when a cursor is given.
+  static Future<ApiResponse<PagedList<Question>>> getQuestions({
     int skip = 0,
     int limit = 20,
     String sortBy = 'created_at',
     String order = 'desc',
+    String? cursor,
   }) async {
     try {
-      final response = await http.get(
-        Uri.parse('$baseUrl/questions?skip=$skip&limit=$limit&sort_by=$sortBy&order=$order'),
-        headers: _headers,
-      );
+      final response = await _cachedGet(
+          '$baseUrl/questions?${_pageQuery(skip, cursor)}&limit=$limit&sort_by=$sortBy&order=$order');
 
       if (response.statusCode == 200) {
         final List<dynamic> data = json.decode(response.body);
         final questions = data.map((json) => Question.fromJson(json)).toList();
-        return ApiResponse.success(questions);
+        return ApiResponse.success(PagedList(questions, response.headers[_nextCursorHeader]));
       } else {
         final error = json.decode(response.body);
         return ApiResponse.error(error['detail'] ?? 'Failed to fetch questions');
@@ -96,10 +139,7 @@ class ApiService {
 
   static Future<ApiResponse<Question>> getQuestion(int questionId) async {
     try {
-      final response = await http.get(
-        Uri.parse('$baseUrl/questions/$questionId'),
-        headers: _headers,
-      );
+      final response = await _cachedGet('$baseUrl/questions/$questionId');
 
       if (response.statusCode == 200) {
         final data = json.decode(response.body);
@@ -139,23 +179,47 @@ class ApiService {
     }
   }
 
+  // Existing questions a draft may duplicate, checked before posting it
+  static Future<ApiResponse<List<SimilarQuestion>>> checkSimilarQuestions(String title, String content) async {
+    try {
+      final response = await http.post(
+        Uri.parse('$baseUrl/questions/similar'),
+        headers: _headers,
+        body: json.encode({
+          'title': title,
+          'content': content,
+        }),
+      );
+
+      if (response.statusCode == 200) {
+        final List<dynamic> data = json.decode(response.body);
+        final similar = data.map((json) => SimilarQuestion.fromJson(json)).toList();
+        return ApiResponse.success(similar);
+      } else {
+        final error = json.decode(response.body);
+        return ApiResponse.error(error['detail'] ?? 'Failed to check similar questions');
+      }
+    } catch (e) {
+      return ApiResponse.error('Network error: $e');
+    }
+  }
+
   // Answer endpoints
-  static Future<ApiResponse<List<Answer>>> getAnswers(int questionId, {
+  static Future<ApiResponse<PagedList<Answer>>> getAnswers(int questionId, {
     int skip = 0,
     int limit = 20,
     String sortBy = 'created_at',
     String order = 'desc',
+    String? cursor,
   }) async {
     try {
-      final response = await http.get(
-        Uri.parse('$baseUrl/questions/$questionId/answers?skip=$skip&limit=$limit&sort_by=$sortBy&order=$order'),
-        headers: _headers,
-      );
+      final response = await _cachedGet(
+          '$baseUrl/questions/$questionId/answers?${_pageQuery(skip, cursor)}&limit=$limit&sort_by=$sortBy&order=$order');
 
       if (response.statusCode == 200) {
         final List<dynamic> data = json.decode(response.body);
         final answers = data.map((json) => Answer.fromJson(json)).toList();
-        return ApiResponse.success(answers);
+        return ApiResponse.success(PagedList(answers, response.headers[_nextCursorHeader]));
       } else {
         final error = json.decode(response.body);
         return ApiResponse.error(error['detail'] ?? 'Failed to fetch answers');
@@ -253,3 +317,11 @@ class ApiService {
     _authToken = null;
   }
 }
+
+class _CachedResponse {
+  final String etag;
+  final Uint8List bodyBytes;
+  final Map<String, String> headers;
+
+  _CachedResponse(this.etag, this.bodyBytes, this.headers);
+}
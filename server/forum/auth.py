@@ -1,19 +1,26 @@
+from dataclasses import dataclass
 from datetime import datetime, timedelta
 from typing import Optional
+import threading
+import time
+from cachetools import TTLCache
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 from fastapi import HTTPException, status, Depends
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
+from sqlalchemy import select, event, inspect
 from sqlalchemy.orm import Session
 from decouple import config
 
-from database import SessionLocal
+from database import SessionLocal, AsyncSessionLocal
 from models import User
 
 # Configuration
 SECRET_KEY = config("SECRET_KEY", default="your-secret-key-change-this-in-production")
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
+AUTH_CACHE_TTL_SECONDS = config("AUTH_CACHE_TTL_SECONDS", default=300, cast=int)
+AUTH_CACHE_SIZE = config("AUTH_CACHE_SIZE", default=10000, cast=int)
 
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 security = HTTPBearer()
@@ -25,6 +32,10 @@ def get_db():
     finally:
         db.close()
 
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     return pwd_context.verify(plain_password, hashed_password)
 
@@ -42,31 +53,155 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
-def verify_token(token: str):
+def decode_token(token: str) -> dict:
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        email: str = payload.get("sub")
-        if email is None:
-            raise HTTPException(
-                status_code=status.HTTP_401_UNAUTHORIZED,
-                detail="Could not validate credentials"
-            )
-        return email
     except JWTError:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Could not validate credentials"
         )
+    if payload.get("sub") is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Could not validate credentials"
+        )
+    return payload
 
-def get_current_user(
-    credentials: HTTPAuthorizationCredentials = Depends(security),
-    db: Session = Depends(get_db)
-):
-    email = verify_token(credentials.credentials)
-    user = db.query(User).filter(User.email == email).first()
+def verify_token(token: str):
+    return decode_token(token)["sub"]
+
+# Authenticated user cache
+#
+# Every authenticated request used to decode the JWT and look the user up by
+# email. The fields the API needs from the user are cached per token until
+# the token expires (or AUTH_CACHE_TTL_SECONDS, whichever comes first), so
+# repeat requests skip both. Entries for a user are dropped once a commit
+# changes their email, is_active or is_moderator.
+
+@dataclass(frozen=True)
+class CurrentUser:
+    id: int
+    username: str
+    email: str
+    is_active: bool
+    is_moderator: bool
+
+    @classmethod
+    def from_user(cls, user: User) -> "CurrentUser":
+        return cls(
+            id=user.id,
+            username=user.username,
+            email=user.email,
+            is_active=bool(user.is_active),
+            is_moderator=bool(user.is_moderator),
+        )
+
+class AuthUserCache:
+    def __init__(self, maxsize: int, ttl: int):
+        self._cache = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def get(self, token: str) -> Optional[CurrentUser]:
+        with self._lock:
+            entry = self._cache.get(token)
+            if entry is not None and entry[1] <= time.time():
+                # The token expired before the cache TTL did
+                del self._cache[token]
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            return entry[0]
+
+    def put(self, token: str, user: CurrentUser, expires_at: float):
+        with self._lock:
+            self._cache[token] = (user, expires_at)
+
+    def invalidate_user(self, user_id: int):
+        with self._lock:
+            stale = [token for token, (user, _) in self._cache.items() if user.id == user_id]
+            for token in stale:
+                del self._cache[token]
+            self.invalidations += len(stale)
+
+    def clear(self):
+        with self._lock:
+            self._cache.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._cache),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "invalidations": self.invalidations,
+            }
+
+auth_cache = AuthUserCache(AUTH_CACHE_SIZE, AUTH_CACHE_TTL_SECONDS)
+
+CACHED_USER_FLAGS = ("email", "is_active", "is_moderator")
+
+@event.listens_for(User, "after_update")
+def _track_changed_user(mapper, connection, target):
+    state = inspect(target)
+    if any(state.attrs[name].history.has_changes() for name in CACHED_USER_FLAGS):
+        state.session.info.setdefault("changed_user_ids", set()).add(target.id)
+
+@event.listens_for(User, "after_delete")
+def _track_deleted_user(mapper, connection, target):
+    inspect(target).session.info.setdefault("changed_user_ids", set()).add(target.id)
+
+# Invalidate only once the change is committed, so a concurrent request can't
+# re-cache the old values in between
+@event.listens_for(Session, "after_commit")
+def _invalidate_changed_users(session):
+    for user_id in session.info.pop("changed_user_ids", ()):
+        auth_cache.invalidate_user(user_id)
+
+@event.listens_for(Session, "after_rollback")
+def _discard_changed_users(session):
+    session.info.pop("changed_user_ids", None)
+
+def _cache_user(token: str, payload: dict, user: Optional[User]) -> CurrentUser:
     if user is None:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="User not found"
         )
-    return user
\ No newline at end of file
+    current_user = CurrentUser.from_user(user)
+    expires_at = payload.get("exp", time.time() + AUTH_CACHE_TTL_SECONDS)
+    auth_cache.put(token, current_user, expires_at)
+    return current_user
+
+def get_current_user(
+    credentials: HTTPAuthorizationCredentials = Depends(security),
+    db: Session = Depends(get_db)
+) -> CurrentUser:
+    token = credentials.credentials
+    cached = auth_cache.get(token)
+    if cached is not None:
+        return cached
+
+    payload = decode_token(token)
+    user = db.query(User).filter(User.email == payload["sub"]).first()
+    return _cache_user(token, payload, user)
+
+async def get_current_user_async(
+    credentials: HTTPAuthorizationCredentials = Depends(security),
+    db = Depends(get_async_db)
+) -> CurrentUser:
+    token = credentials.credentials
+    cached = auth_cache.get(token)
+    if cached is not None:
+        return cached
+
+    payload = decode_token(token)
+    result = await db.execute(select(User).where(User.email == payload["sub"]))
+    return _cache_user(token, payload, result.scalars().first())
@@ -0,0 +1,115 @@
+"""Read/write throughput of the default engine versus create_forum_engine().
+
+Each configuration gets a fresh SQLite file seeded with questions. Reader
+threads page through GET /questions-style queries while writer threads apply
+vote-style counter updates, for a fixed duration.
+
+    python benchmarks/engine_throughput.py --readers 8 --writers 4 --seconds 5
+"""
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+import random
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.exc import OperationalError
+
+from database import create_forum_engine
+from models import Base
+
+SEED_QUESTIONS = 5000
+
+
+def seed(engine):
+    Base.metadata.create_all(bind=engine)
+    with engine.begin() as conn:
+        conn.execute(
+            text("INSERT INTO users (id, username, email, hashed_password) VALUES (1, 'seed', 'seed@example.com', 'x')")
+        )
+        conn.execute(
+            text(
+                "INSERT INTO questions (title, content, tags, author_id, upvotes, downvotes, score, answer_count) "
+                "VALUES (:title, :content, '[]', 1, 0, 0, 0, 0)"
+            ),
+            [{"title": f"Question {i}", "content": "benchmark " * 40} for i in range(SEED_QUESTIONS)],
+        )
+
+
+def run(engine, readers: int, writers: int, seconds: float):
+    stop = threading.Event()
+    counts = {"reads": 0, "writes": 0, "errors": 0}
+    lock = threading.Lock()
+
+    def reader():
+        done = 0
+        while not stop.is_set():
+            offset = random.randint(0, SEED_QUESTIONS - 20)
+            with engine.connect() as conn:
+                conn.execute(
+                    text("SELECT id, title, upvotes FROM questions ORDER BY created_at DESC, id DESC LIMIT 20 OFFSET :o"),
+                    {"o": offset},
+                ).fetchall()
+            done += 1
+        with lock:
+            counts["reads"] += done
+
+    def writer():
+        done = errors = 0
+        while not stop.is_set():
+            try:
+                with engine.begin() as conn:
+                    conn.execute(
+                        text("UPDATE questions SET upvotes = upvotes + 1, score = score + 1 WHERE id = :id"),
+                        {"id": random.randint(1, SEED_QUESTIONS)},
+                    )
+                done += 1
+            except OperationalError:
+                errors += 1
+        with lock:
+            counts["writes"] += done
+            counts["errors"] += errors
+
+    threads = [threading.Thread(target=reader) for _ in range(readers)]
+    threads += [threading.Thread(target=writer) for _ in range(writers)]
+    for thread in threads:
+        thread.start()
+    time.sleep(seconds)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--readers", type=int, default=8)
+    parser.add_argument("--writers", type=int, default=4)
+    parser.add_argument("--seconds", type=float, default=5.0)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="engine_throughput_")
+    configurations = {
+        "default": lambda url: create_engine(url, connect_args={"check_same_thread": False}),
+        "tuned": create_forum_engine,
+    }
+
+    print(f"{'engine':<10}{'reads/s':>12}{'writes/s':>12}{'lock errors':>14}")
+    for name, factory in configurations.items():
+        url = f"sqlite:///{os.path.join(workdir, name + '.db')}"
+        engine = factory(url)
+        seed(engine)
+        counts = run(engine, args.readers, args.writers, args.seconds)
+        engine.dispose()
+        print(
+            f"{name:<10}{counts['reads'] / args.seconds:>12.0f}"
+            f"{counts['writes'] / args.seconds:>12.0f}{counts['errors']:>14}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,460 @@
+"""Forum API load benchmark: per-endpoint latency under the app's workload.
+
+Seeds a scratch database with seed_forum.py, serves the forum API on it and
+has --clients simulated app users hit it for --seconds after a warm-up.
+Each client logs in once and then does what the Flutter app does
+(app/lib/services/api_service.dart, called from forum_screen.dart):
+
+    WORKLOAD action   requests
+    feed              GET /questions (first page, newest first)
+    more              GET /questions?cursor (the next page, from X-Next-Cursor)
+    thread            GET /questions/{id}/answers (top voted first), hot threads most often
+    vote              POST /vote on the thread's question or one of its answers
+    answer            POST /questions/{id}/answers
+    ask               POST /questions/similar, then POST /questions
+    search            GET /search
+    question          GET /questions/{id}
+
+GETs send If-None-Match with the ETag from the client's last response for
+the URL, as the app's ETag cache does, so a 304 counts as a success and
+serves the cached body and headers.
+
+Results are printed per endpoint as requests, errors, requests/sec and
+p50/p95/p99 latency, and can be saved as a JSON baseline and compared
+against one, exiting 1 when an endpoint got slower than --tolerance:
+
+    python benchmarks/load_benchmark.py --clients 32 --seconds 30 --save baseline.json
+    python benchmarks/load_benchmark.py --clients 32 --seconds 30 --compare baseline.json
+
+The database is a temporary file unless --database-url names one, e.g.
+sqlite:///./qa_forum.db to load-test a copy of the real data (seeded rows
+are added to it). --skip-seed serves it as it is.
+
+--mode inprocess calls the ASGI app directly from this process (no
+network, app and clients share a CPU); --mode uvicorn starts uvicorn with
+--workers processes on a local port. Baselines only compare like for like:
+same machine, mode, clients and seeded volumes.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import socket
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from dataclasses import asdict
+from datetime import datetime
+from urllib.parse import quote
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import httpx
+
+from seed_forum import FORUM_DIR, SEED_PASSWORD, WORDS, SeedCounts, migrate, seed, zipf_weights
+
+WORKLOAD = {
+    "feed": 30,
+    "more": 12,
+    "thread": 30,
+    "vote": 12,
+    "answer": 5,
+    "ask": 3,
+    "search": 4,
+    "question": 4,
+}
+PAGE_SIZE = 20
+ETAG_CACHE_SIZE = 100  # same as the app's
+LATENCY_KEYS = ("p50_ms", "p95_ms", "p99_ms")
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return None
+    return sorted_values[min(len(sorted_values) - 1, int(fraction * len(sorted_values)))]
+
+
+class Recorder:
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+        self.samples = []  # a few failed requests, for the report
+        self.measuring = False
+
+    def add(self, endpoint: str, seconds: float, error: str = None):
+        if not self.measuring:
+            return
+        self.latencies[endpoint].append(seconds)
+        if error:
+            self.errors[endpoint] += 1
+            if len(self.samples) < 5:
+                self.samples.append(f"{endpoint}: {error}")
+
+    def summary(self, seconds: float):
+        endpoints = {}
+        for endpoint in sorted(self.latencies):
+            values = sorted(self.latencies[endpoint])
+            endpoints[endpoint] = {
+                "requests": len(values),
+                "errors": self.errors[endpoint],
+                "rps": round(len(values) / seconds, 1),
+                "p50_ms": round(percentile(values, 0.50) * 1000, 2),
+                "p95_ms": round(percentile(values, 0.95) * 1000, 2),
+                "p99_ms": round(percentile(values, 0.99) * 1000, 2),
+                "max_ms": round(values[-1] * 1000, 2),
+            }
+        everything = sorted(value for values in self.latencies.values() for value in values)
+        total = {
+            "requests": len(everything),
+            "errors": sum(self.errors.values()),
+            "rps": round(len(everything) / seconds, 1),
+            "p50_ms": round((percentile(everything, 0.50) or 0) * 1000, 2),
+            "p95_ms": round((percentile(everything, 0.95) or 0) * 1000, 2),
+            "p99_ms": round((percentile(everything, 0.99) or 0) * 1000, 2),
+        }
+        return endpoints, total
+
+
+class AppClient:
+    """One simulated app user: its token, ETag cache and current thread."""
+
+    def __init__(self, http: httpx.AsyncClient, recorder: Recorder, rng: random.Random, email: str, forum):
+        self.http = http
+        self.recorder = recorder
+        self.rng = rng
+        self.email = email
+        self.forum = forum
+        self.headers = {}
+        self.etags = {}
+        self.response_headers = {}  # of the last request, the cached ones after a 304
+        self.next_cursor = None
+        self.thread_id = None
+        self.thread_answers = []
+        self.last_error = None
+
+    async def request(self, endpoint: str, method: str, url: str, **kwargs):
+        headers = dict(self.headers)
+        if method == "GET" and url in self.etags:
+            headers["If-None-Match"] = self.etags[url][0]
+        started = time.perf_counter()
+        try:
+            response = await self.http.request(method, url, headers=headers, **kwargs)
+        except httpx.HTTPError as e:
+            self.last_error = repr(e)
+            self.recorder.add(endpoint, time.perf_counter() - started, self.last_error)
+            return None
+        elapsed = time.perf_counter() - started
+
+        if response.status_code == 304 and url in self.etags:
+            self.recorder.add(endpoint, elapsed)
+            _, body, self.response_headers = self.etags[url]
+            return body
+        if response.status_code >= 400:
+            self.last_error = f"{response.status_code} {response.text[:120]}"
+            self.recorder.add(endpoint, elapsed, self.last_error)
+            return None
+        self.recorder.add(endpoint, elapsed)
+        body = response.json()
+        self.response_headers = response.headers
+        if method == "GET" and response.headers.get("etag"):
+            self.etags.pop(url, None)
+            if len(self.etags) >= ETAG_CACHE_SIZE:
+                self.etags.pop(next(iter(self.etags)))
+            self.etags[url] = (response.headers["etag"], body, response.headers)
+        return body
+
+    async def login(self, attempts: int = 20):
+        # Logins all start at once and the password pool sheds the excess with 429s
+        for _ in range(attempts):
+            body = await self.request(
+                "POST /auth/login", "POST", "/auth/login", data={"email": self.email, "password": SEED_PASSWORD}
+            )
+            if body is not None or not self.last_error.startswith("429"):
+                break
+            await asyncio.sleep(self.rng.uniform(0.1, 0.5))
+        if body is None:
+            raise RuntimeError(f"Could not log in as {self.email}: {self.last_error}")
+        self.headers = {"Authorization": f"Bearer {body['access_token']}"}
+
+    def hot_question(self):
+        return self.rng.choices(self.forum["question_ids"], cum_weights=self.forum["question_weights"])[0]
+
+    def text(self, words):
+        return " ".join(self.rng.choices(WORDS, k=words))
+
+    async def feed(self):
+        await self.questions("GET /questions", f"/questions?skip=0&limit={PAGE_SIZE}&sort_by=created_at&order=desc")
+
+    async def more(self):
+        # Like the app's load-more: the next page by the previous one's cursor
+        if self.next_cursor is None:
+            return await self.feed()
+        await self.questions(
+            "GET /questions?cursor",
+            f"/questions?cursor={quote(self.next_cursor)}&limit={PAGE_SIZE}&sort_by=created_at&order=desc",
+        )
+
+    async def questions(self, endpoint: str, url: str):
+        body = await self.request(endpoint, "GET", url)
+        self.next_cursor = self.response_headers.get("x-next-cursor") if body is not None else None
+
+    async def thread(self):
+        self.thread_id = self.hot_question()
+        answers = await self.request(
+            "GET /questions/{id}/answers", "GET",
+            f"/questions/{self.thread_id}/answers?skip=0&limit={PAGE_SIZE}&sort_by=votes&order=desc",
+        )
+        self.thread_answers = [answer["id"] for answer in answers or []]
+
+    async def vote(self):
+        if self.thread_id is None:
+            await self.thread()
+        vote_type = 1 if self.rng.random() < 0.85 else -1
+        if self.thread_answers and self.rng.random() < 0.6:
+            target = {"answer_id": self.rng.choice(self.thread_answers)}
+        else:
+            target = {"question_id": self.thread_id}
+        await self.request("POST /vote", "POST", "/vote", json={**target, "vote_type": vote_type})
+
+    async def answer(self):
+        if self.thread_id is None:
+            await self.thread()
+        await self.request(
+            "POST /questions/{id}/answers", "POST", f"/questions/{self.thread_id}/answers",
+            json={"content": self.text(self.rng.randint(15, 60))},
+        )
+
+    async def ask(self):
+        draft = {
+            "title": self.text(self.rng.randint(5, 12)).capitalize() + "?",
+            "content": self.text(self.rng.randint(20, 80)),
+            "tags": [self.rng.choice(("maternal-health", "child-health", "immunization"))],
+        }
+        await self.request("POST /questions/similar", "POST", "/questions/similar", json=draft)
+        await self.request("POST /questions", "POST", "/questions", json=draft)
+
+    async def search(self):
+        await self.request("GET /search", "GET", f"/search?q={self.text(2)}&skip=0&limit={PAGE_SIZE}")
+
+    async def question(self):
+        await self.request("GET /questions/{id}", "GET", f"/questions/{self.hot_question()}")
+
+    async def run(self, until: float, think_seconds: float):
+        actions = list(WORKLOAD)
+        weights = list(WORKLOAD.values())
+        while time.perf_counter() < until:
+            await getattr(self, self.rng.choices(actions, weights=weights)[0])()
+            if think_seconds:
+                await asyncio.sleep(self.rng.expovariate(1 / think_seconds))
+
+
+def load_forum(database_path: str, rng: random.Random):
+    """Ids and logins the clients draw from, read from the seeded database."""
+    conn = sqlite3.connect(database_path)
+    try:
+        question_ids = [row[0] for row in conn.execute("SELECT id FROM questions")]
+        emails = [row[0] for row in conn.execute("SELECT email FROM users WHERE email LIKE 'bench%@example.com'")]
+    finally:
+        conn.close()
+    if not question_ids or not emails:
+        raise SystemExit("The database has no seeded questions or users; run without --skip-seed")
+    rng.shuffle(question_ids)
+    return {"question_ids": question_ids, "question_weights": zipf_weights(len(question_ids), 0.8), "emails": emails}
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+async def wait_until_ready(http: httpx.AsyncClient, timeout: float = 600):
+    """Wait for /health and for the similar-question index the API builds at startup."""
+    deadline = time.perf_counter() + timeout
+    while time.perf_counter() < deadline:
+        try:
+            response = await http.get("/health")
+            if response.status_code == 200 and response.json()["similar_questions"]["loaded"]:
+                return
+        except httpx.HTTPError:
+            pass
+        await asyncio.sleep(0.5)
+    raise SystemExit("The forum API did not become ready")
+
+
+async def drive(http: httpx.AsyncClient, args, forum) -> Recorder:
+    recorder = Recorder()
+    await wait_until_ready(http)
+    clients = [
+        AppClient(http, recorder, random.Random(args.seed * 1000 + i), forum["emails"][i % len(forum["emails"])], forum)
+        for i in range(args.clients)
+    ]
+    await asyncio.gather(*(client.login() for client in clients))
+
+    started = time.perf_counter()
+    runs = asyncio.gather(*(client.run(started + args.warmup + args.seconds, args.think_ms / 1000) for client in clients))
+    await asyncio.sleep(args.warmup)
+    recorder.measuring = True
+    await runs
+    return recorder
+
+
+async def run_in_process(args, forum) -> Recorder:
+    # Imported here so the app's engine points at the benchmark database
+    from main import app
+
+    await app.router.startup()
+    try:
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://forum", timeout=60) as http:
+            return await drive(http, args, forum)
+    finally:
+        await app.router.shutdown()
+
+
+async def run_with_uvicorn(args, forum) -> Recorder:
+    port = free_port()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(port),
+         "--workers", str(args.workers), "--log-level", "warning"],
+        cwd=FORUM_DIR, env=dict(os.environ),
+    )
+    try:
+        limits = httpx.Limits(max_connections=args.clients, max_keepalive_connections=args.clients)
+        async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", limits=limits, timeout=60) as http:
+            return await drive(http, args, forum)
+    finally:
+        server.terminate()  # uvicorn shuts down gracefully, flushing buffered views
+        server.wait(timeout=30)
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=FORUM_DIR, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_results(endpoints, total):
+    print(f"{'endpoint':32} {'requests':>8} {'errors':>6} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+    for endpoint, row in list(endpoints.items()) + [("total", total)]:
+        print(f"{endpoint:32} {row['requests']:8} {row['errors']:6} {row['rps']:8.1f} "
+              f"{row['p50_ms']:8.2f} {row['p95_ms']:8.2f} {row['p99_ms']:8.2f}")
+
+
+def compare(results, baseline, tolerance: float) -> int:
+    """Print the change against a baseline; returns the number of regressions."""
+    if baseline["config"] != results["config"]:
+        print("Warning: the baseline was recorded with a different configuration:")
+        for key in sorted(set(baseline["config"]) | set(results["config"])):
+            if baseline["config"].get(key) != results["config"].get(key):
+                print(f"  {key}: {baseline['config'].get(key)} -> {results['config'].get(key)}")
+
+    regressions = 0
+    print(f"\nAgainst {baseline.get('git_commit') or 'the baseline'} ({baseline['created']}):")
+    print(f"{'endpoint':32} {'req/s':>16} {'p50 ms':>18} {'p95 ms':>18} {'p99 ms':>18}")
+    rows = list(results["endpoints"].items()) + [("total", results["total"])]
+    for endpoint, row in rows:
+        before = baseline["total"] if endpoint == "total" else baseline["endpoints"].get(endpoint)
+        if before is None:
+            print(f"{endpoint:32} (not in the baseline)")
+            continue
+        cells = []
+        slower = False
+        for key in ("rps",) + LATENCY_KEYS:
+            change = (row[key] - before[key]) / before[key] if before[key] else 0.0
+            cells.append(f"{before[key]:.1f}->{row[key]:.1f} {change:+.0%}".rjust(18 if key != "rps" else 16))
+            if key in ("p95_ms", "p99_ms") and change > tolerance:
+                slower = True
+            if key == "rps" and change < -tolerance:
+                slower = True
+        regressions += slower and endpoint != "total"
+        print(f"{endpoint:32} {' '.join(cells)}{'  REGRESSION' if slower else ''}")
+    print(f"{regressions} endpoint(s) regressed by more than {tolerance:.0%}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--mode", choices=["inprocess", "uvicorn"], default="inprocess")
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn worker processes (--mode uvicorn)")
+    parser.add_argument("--clients", type=int, default=32, help="Simulated app users making requests at once")
+    parser.add_argument("--seconds", type=float, default=30, help="Measured duration")
+    parser.add_argument("--warmup", type=float, default=5, help="Seconds of load before measuring starts")
+    parser.add_argument("--think-ms", type=float, default=0, help="Mean pause between a client's actions")
+    parser.add_argument("--database-url", default=None, help="SQLite database to seed and serve; defaults to a temporary file")
+    parser.add_argument("--skip-seed", action="store_true", help="Serve the database as it is (seeded by an earlier run)")
+    parser.add_argument("--users", type=int, default=2000)
+    parser.add_argument("--questions", type=int, default=20000)
+    parser.add_argument("--answers", type=int, default=60000)
+    parser.add_argument("--votes", type=int, default=150000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--save", help="Write the results as a JSON baseline to this path")
+    parser.add_argument("--compare", help="Compare against a JSON baseline written by --save")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed p95/p99 increase or req/s drop")
+    args = parser.parse_args()
+
+    database_url = args.database_url or f"sqlite:///{os.path.join(tempfile.mkdtemp(prefix='load_benchmark_'), 'forum.db')}"
+    if not database_url.startswith("sqlite:///"):
+        raise SystemExit("The load benchmark seeds and reads a SQLite database")
+    # Absolute, since uvicorn runs from the forum directory
+    database_path = os.path.abspath(database_url[len("sqlite:///"):])
+    database_url = f"sqlite:///{database_path}"
+    os.environ["DATABASE_URL"] = database_url
+
+    counts = SeedCounts(args.users, args.questions, args.answers, args.votes)
+    rng = random.Random(args.seed)
+    if not args.skip_seed:
+        # Imported after DATABASE_URL is set so the engine points at the benchmark database
+        from counters import ensure_counter_triggers
+        from database import engine
+
+        migrate()
+        result = seed(engine, counts, rng)
+        ensure_counter_triggers(engine)
+        print(f"Seeded {asdict(counts)} in {result.seconds:.1f}s into {database_url}")
+    forum = load_forum(database_path, rng)
+
+    runner = run_in_process if args.mode == "inprocess" else run_with_uvicorn
+    recorder = asyncio.run(runner(args, forum))
+    endpoints, total = recorder.summary(args.seconds)
+    print_results(endpoints, total)
+    for sample in recorder.samples:
+        print(f"  error: {sample}")
+
+    results = {
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "git_commit": git_commit(),
+        "config": {
+            "mode": args.mode,
+            "workers": args.workers if args.mode == "uvicorn" else None,
+            "clients": args.clients,
+            "seconds": args.seconds,
+            "think_ms": args.think_ms,
+            "seeded": None if args.skip_seed else asdict(counts),
+            "python": platform.python_version(),
+            "sqlite": sqlite3.sqlite_version,
+            "machine": platform.node(),
+        },
+        "endpoints": endpoints,
+        "total": total,
+    }
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"Saved the results to {args.save}")
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        sys.exit(1 if compare(results, baseline, args.tolerance) else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,160 @@
+"""Query plan check: no endpoint query may scan a whole table.
+
+Migrates a throwaway SQLite database to head with Alembic, seeds it with
+about a million rows (users, questions, answers, votes), then runs the crud
+functions behind the forum endpoints and the view counter flush, captures
+every statement they send, and runs EXPLAIN QUERY PLAN on each one. Exits
+with status 1 if a plan reads a table with a SCAN that no index serves.
+
+    python benchmarks/plan_check.py --rows 1000000
+
+Plans are checked without ANALYZE statistics, like a database the API
+created. Statements run by triggers are not part of the plan of the
+statement that fires them; the counter triggers only look rows up by key.
+"""
+import argparse
+import os
+import random
+import re
+import sys
+import tempfile
+from dataclasses import asdict
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from seed_forum import SeedCounts, migrate, seed
+
+# A table read without an index is "SCAN <table>"; index scans say USING ... INDEX
+FULL_SCAN_RE = re.compile(r"^SCAN (?!CONSTANT ROW)(\w+)(?!.*USING (?:COVERING |INTEGER PRIMARY KEY|INDEX)|.*VIRTUAL TABLE)")
+CHECKED_STATEMENTS = ("SELECT", "UPDATE", "DELETE", "INSERT", "WITH")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=1_000_000, help="Total rows seeded across the four tables")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--revision", default="head", help="Alembic revision to check the plans at")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="plan_check_")
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(workdir, 'forum.db')}"
+
+    # Imported after DATABASE_URL is set so the engine points at the scratch database
+    from sqlalchemy import event, text
+
+    import crud
+    from auth import CurrentUser
+    from counters import ViewCounter, ensure_counter_triggers
+    from database import SessionLocal, engine
+    from schemas import AnswerCreate, QuestionCreate, QuestionUpdate, VoteCreate
+    from search_index import ensure_search_index
+    from similar_questions import similar_questions
+    from votes import apply_vote
+
+    rng = random.Random(args.seed)
+    migrate(args.revision)
+    # Users, questions, answers and votes in the proportions 1:4:8:7
+    rows = args.rows
+    counts = SeedCounts(users=rows // 20, questions=rows // 5, answers=2 * (rows // 5), votes=rows - 13 * (rows // 20))
+    result = seed(engine, counts, rng)
+    ensure_search_index(engine)
+    ensure_counter_triggers(engine)
+    # Built once at startup by reading every question, not per request
+    with SessionLocal() as db:
+        similar_questions.ensure_loaded(db)
+    print(f"Seeded {asdict(counts)} in {result.seconds:.0f}s")
+
+    captured = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith(CHECKED_STATEMENTS) and not executemany:
+            captured.append((statement, parameters))
+
+    moderator = CurrentUser(id=1, username="bench1", email="bench1@example.com", is_active=True, is_moderator=True)
+    question_id = rng.randint(1, counts.questions)
+    with engine.connect() as conn:
+        answered_question, answer_id = conn.execute(
+            text("SELECT question_id, id FROM answers WHERE question_id = :q"), {"q": question_id}
+        ).first() or (question_id, 1)
+
+    def run(fn):
+        db = SessionLocal()
+        try:
+            fn(db)
+            db.commit()
+        finally:
+            db.close()
+
+    checks = []
+    for sort_by in crud.QUESTION_SORT_COLUMNS:
+        for order in ("desc", "asc"):
+            checks.append((f"GET /questions sort={sort_by} order={order} skip=40",
+                           lambda db, s=sort_by, o=order: crud.get_questions(db, 40, 20, s, o, None)))
+            checks.append((f"GET /questions sort={sort_by} order={order} cursor",
+                           lambda db, s=sort_by, o=order: crud.get_questions(
+                               db, 0, 20, s, o, crud.get_questions(db, 0, 20, s, o, None)[1])))
+    for sort_by in crud.ANSWER_SORT_COLUMNS:
+        for order in ("desc", "asc"):
+            checks.append((f"GET /questions/{{id}}/answers sort={sort_by} order={order}",
+                           lambda db, s=sort_by, o=order: crud.get_answers(db, answered_question, 0, 20, s, o, None)))
+            checks.append((f"GET /questions/{{id}}/answers sort={sort_by} order={order} cursor",
+                           lambda db, s=sort_by, o=order: crud.get_answers(
+                               db, answered_question, 0, 1, s, o,
+                               crud.get_answers(db, answered_question, 0, 1, s, o, None)[1])))
+    checks += [
+        ("GET /questions/{id}", lambda db: crud.get_question(db, question_id)),
+        ("GET /search", lambda db: crud.search(db, "fever newborn", 0, 20)),
+        ("GET /questions/similar", lambda db: (crud.get_unindexed_questions(db), crud.get_similar_questions(
+            db, similar_questions.search("fever in a newborn", limit=5)))),
+        ("POST /auth/login", lambda db: crud.get_login_user(db, f"bench{counts.users}@example.com")),
+        ("POST /votes (question)", lambda db: apply_vote(db, 2, VoteCreate(question_id=question_id, vote_type=1))),
+        ("POST /votes (answer)", lambda db: apply_vote(db, 2, VoteCreate(answer_id=answer_id, vote_type=-1))),
+        ("POST /questions", lambda db: crud.create_question(
+            db, QuestionCreate(title="Plan check", content="Plan check", tags=["tb"]), moderator)),
+        ("POST /questions/{id}/answers", lambda db: crud.create_answer(
+            db, question_id, AnswerCreate(content="Plan check"), moderator)),
+        ("PUT /questions/{id}", lambda db: crud.update_question(
+            db, question_id, QuestionUpdate(title="Plan check, edited"), moderator)),
+        ("PUT /answers/{id}/verify", lambda db: crud.verify_answer(db, answer_id, moderator)),
+        ("DELETE /questions/{id}", lambda db: crud.delete_question(db, answered_question, moderator)),
+    ]
+
+    def flush_views(db):
+        counter = ViewCounter(engine)
+        for _ in range(3):
+            counter.record(question_id)
+        counter.record(question_id + 1)
+        counter.flush()
+
+    checks.append(("view count flush", flush_views))
+
+    event.listen(engine, "before_cursor_execute", capture)
+    failures = 0
+    raw = engine.raw_connection()
+    try:
+        for label, fn in checks:
+            captured.clear()
+            try:
+                run(fn)
+            except Exception as e:
+                # Plans still get checked; the statements were sent before the error
+                print(f"  ({label} raised {e!r})")
+            scans = []
+            for statement, parameters in list(captured):
+                plan = raw.cursor().execute(f"EXPLAIN QUERY PLAN {statement}", parameters or ()).fetchall()
+                scans += [(detail, statement) for _, _, _, detail in plan if FULL_SCAN_RE.match(detail)]
+            status = "FULL SCAN" if scans else "ok"
+            print(f"{status:9} {label} ({len(captured)} statements)")
+            for detail, statement in scans:
+                print(f"          {detail}: {' '.join(statement.split())[:160]}")
+            failures += bool(scans)
+    finally:
+        raw.close()
+        event.remove(engine, "before_cursor_execute", capture)
+
+    print(f"{failures} of {len(checks)} endpoint checks read a table without an index")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
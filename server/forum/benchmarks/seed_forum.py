@@ -0,0 +1,212 @@
+"""Synthetic forum data for the benchmarks.
+
+Seeds a forum database with users, questions, answers and votes. Activity is
+skewed the way a real forum's is: a few tags, questions and users account
+for most of it. Tags, the questions that get answered and voted on, and the
+users who post are all drawn from Zipf-like distributions. Rows are
+inserted with executemany on a raw connection, a few seconds per hundred
+thousand rows.
+
+    python benchmarks/seed_forum.py --database-url sqlite:///./bench.db --questions 20000
+
+Rows are added after any rows already there, so an existing database can be
+topped up; the counter triggers (counters.py) keep the counts right either
+way. Every seeded user can log in with SEED_PASSWORD.
+"""
+import argparse
+import itertools
+import os
+import random
+import sys
+import time
+from dataclasses import asdict, dataclass
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+FORUM_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+SEED_PASSWORD = "benchmark-password"
+SEED_BATCH = 20000
+
+WORDS = (
+    "pregnancy fever newborn vaccine iron tablets anaemia breastfeeding diarrhoea ors zinc malaria "
+    "tuberculosis nutrition referral village household visit register asha anganwadi weight cough "
+    "delivery institutional bleeding danger signs mother child growth chart immunisation schedule"
+).split()
+# Most popular first; Zipf weights make the first few cover most questions
+TAGS = [
+    "maternal-health", "child-health", "immunization", "nutrition", "newborn-care", "family-planning",
+    "malaria", "tb", "diarrhoea", "anaemia", "adolescent-health", "records", "incentives", "training",
+]
+
+
+@dataclass
+class SeedCounts:
+    users: int
+    questions: int
+    answers: int
+    votes: int
+
+
+@dataclass
+class SeedResult:
+    first_user_id: int
+    first_question_id: int
+    first_answer_id: int
+    counts: SeedCounts
+    seconds: float
+
+
+def zipf_weights(n: int, s: float = 1.1):
+    return list(itertools.accumulate(1 / (rank ** s) for rank in range(1, n + 1)))
+
+
+def migrate(revision: str = "head"):
+    """Create or upgrade the schema at DATABASE_URL with the Alembic migrations."""
+    from alembic import command
+    from alembic.config import Config
+
+    config = Config(os.path.join(FORUM_DIR, "alembic.ini"))
+    config.set_main_option("script_location", os.path.join(FORUM_DIR, "migrations"))
+    command.upgrade(config, revision)
+
+
+def seed(engine, counts: SeedCounts, rng: random.Random) -> SeedResult:
+    from sqlalchemy import text
+
+    from auth import get_password_hash
+
+    started = time.perf_counter()
+    with engine.connect() as conn:
+        user_base, question_base, answer_base, vote_base = (
+            conn.execute(text(f"SELECT coalesce(max(id), 0) FROM {table}")).scalar()
+            for table in ("users", "questions", "answers", "votes")
+        )
+
+    hashed_password = get_password_hash(SEED_PASSWORD)
+    first_day = datetime(2024, 1, 1)
+    # Posts are spread over a year; later ids are later posts
+    minutes_per_question = max(1, 365 * 24 * 60 // max(1, counts.questions))
+    tag_weights = zipf_weights(len(TAGS))
+    question_weights = zipf_weights(counts.questions, 0.8)
+    answer_weights = zipf_weights(counts.answers, 0.8) if counts.answers else []
+    user_weights = zipf_weights(counts.users)
+    # The hot questions are scattered over the id range, not all the oldest ones
+    question_order = list(range(question_base + 1, question_base + counts.questions + 1))
+    rng.shuffle(question_order)
+    answer_order = list(range(answer_base + 1, answer_base + counts.answers + 1))
+    rng.shuffle(answer_order)
+
+    def sentence(n):
+        return " ".join(rng.choices(WORDS, k=n))
+
+    def author():
+        return user_base + rng.choices(range(1, counts.users + 1), cum_weights=user_weights)[0]
+
+    def popular_question():
+        return rng.choices(question_order, cum_weights=question_weights)[0]
+
+    def in_batches(insert, rows):
+        conn = engine.raw_connection()
+        try:
+            cursor = conn.cursor()
+            while True:
+                batch = list(itertools.islice(rows, SEED_BATCH))
+                if not batch:
+                    break
+                cursor.executemany(insert, batch)
+            conn.commit()
+        finally:
+            conn.close()
+
+    in_batches(
+        "INSERT INTO users (id, username, email, hashed_password, is_active, is_moderator, reputation) "
+        "VALUES (?, ?, ?, ?, 1, 0, 0)",
+        ((user_base + i, f"bench{user_base + i}", f"bench{user_base + i}@example.com", hashed_password)
+         for i in range(1, counts.users + 1)),
+    )
+
+    def question_rows():
+        for i in range(1, counts.questions + 1):
+            tags = sorted(set(rng.choices(TAGS, cum_weights=tag_weights, k=rng.randint(1, 3))))
+            created = first_day + timedelta(minutes=i * minutes_per_question)
+            yield (
+                question_base + i, sentence(rng.randint(5, 12)).capitalize() + "?", sentence(rng.randint(20, 80)),
+                '["' + '", "'.join(tags) + '"]', author(), created.isoformat(" "),
+            )
+
+    in_batches(
+        "INSERT INTO questions (id, title, content, tags, author_id, upvotes, downvotes, score, answer_count, "
+        "view_count, is_closed, created_at) VALUES (?, ?, ?, ?, ?, 0, 0, 0, 0, 0, 0, ?)",
+        question_rows(),
+    )
+
+    def answer_rows():
+        for i in range(1, counts.answers + 1):
+            question_id = popular_question()
+            created = first_day + timedelta(minutes=(question_id - question_base) * minutes_per_question + i % 1440)
+            yield (
+                answer_base + i, sentence(rng.randint(15, 60)), question_id, author(),
+                int(rng.random() < 0.1), created.isoformat(" "),
+            )
+
+    in_batches(
+        "INSERT INTO answers (id, content, question_id, author_id, upvotes, downvotes, score, is_verified, "
+        "is_ai_generated, created_at) VALUES (?, ?, ?, ?, 0, 0, 0, ?, 0, ?)",
+        answer_rows(),
+    )
+
+    def vote_rows():
+        # One vote per user per post; mostly upvotes, and mostly on the popular posts
+        seen = set()
+        vote_id = vote_base
+        attempts = 0
+        while vote_id - vote_base < counts.votes and attempts < 3 * counts.votes:
+            attempts += 1
+            user_id = author()
+            if answer_order and rng.random() < 0.6:
+                key = (user_id, None, rng.choices(answer_order, cum_weights=answer_weights)[0])
+            else:
+                key = (user_id, popular_question(), None)
+            if key in seen:
+                continue
+            seen.add(key)
+            vote_id += 1
+            yield (vote_id, *key, 1 if rng.random() < 0.85 else -1)
+
+    # Answer votes carry no question_id, like the ones POST /vote stores
+    in_batches("INSERT INTO votes (id, user_id, question_id, answer_id, vote_type) VALUES (?, ?, ?, ?, ?)", vote_rows())
+
+    return SeedResult(
+        first_user_id=user_base + 1,
+        first_question_id=question_base + 1,
+        first_answer_id=answer_base + 1,
+        counts=counts,
+        seconds=time.perf_counter() - started,
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--database-url", required=True)
+    parser.add_argument("--users", type=int, default=2000)
+    parser.add_argument("--questions", type=int, default=20000)
+    parser.add_argument("--answers", type=int, default=60000)
+    parser.add_argument("--votes", type=int, default=150000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    os.environ["DATABASE_URL"] = args.database_url
+    # Imported after DATABASE_URL is set so the engine points at that database
+    from counters import ensure_counter_triggers
+    from database import engine
+
+    migrate()
+    result = seed(engine, SeedCounts(args.users, args.questions, args.answers, args.votes), random.Random(args.seed))
+    # On a new database this installs the triggers and computes the counters in one pass
+    ensure_counter_triggers(engine)
+    print(f"Seeded {asdict(result.counts)} in {result.seconds:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
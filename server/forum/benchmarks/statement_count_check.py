@@ -0,0 +1,90 @@
+"""Statement count check: a page costs the same queries at any page size.
+
+Seeds a throwaway SQLite database, then requests GET /questions,
+GET /questions/{id}/answers and GET /search through the API at several page
+sizes and counts the SQL statements each request sends. A lazy load per row
+(the N+1 the list queries avoid by loading authors in the same statement)
+shows up as a count that grows with the page; the check exits 1 if any
+endpoint's count differs between page sizes or a page comes back short.
+
+    python benchmarks/statement_count_check.py --page-sizes 5 20 50
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from seed_forum import SeedCounts, migrate, seed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--page-sizes", type=int, nargs="+", default=[5, 20, 50])
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="statement_count_")
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(workdir, 'forum.db')}"
+
+    # Imported after DATABASE_URL is set so the engine points at the scratch database
+    from fastapi.testclient import TestClient
+    from sqlalchemy import event, text
+
+    from counters import ensure_counter_triggers
+    from database import engine
+    from search_index import ensure_search_index
+
+    migrate()
+    largest = max(args.page_sizes)
+    seed(engine, SeedCounts(users=200, questions=4 * largest, answers=40 * largest, votes=1000), random.Random(0))
+    ensure_search_index(engine)
+    ensure_counter_triggers(engine)
+    with engine.connect() as conn:
+        question_id = conn.execute(
+            text("SELECT question_id FROM answers GROUP BY question_id ORDER BY count(*) DESC LIMIT 1")
+        ).scalar()
+
+    from main import app
+
+    client = TestClient(app)
+    statements = []
+
+    def count(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    endpoints = {
+        "GET /questions": lambda limit: f"/questions?limit={limit}&sort_by=created_at&order=desc",
+        "GET /questions/{id}/answers": lambda limit: f"/questions/{question_id}/answers?limit={limit}&sort_by=votes",
+        "GET /search": lambda limit: f"/search?q=pregnancy&limit={limit}",
+    }
+
+    def page_rows(body):
+        return len(body) if isinstance(body, list) else min(len(body["questions"]), len(body["answers"]))
+
+    event.listen(engine, "before_cursor_execute", count)
+    failures = 0
+    try:
+        for endpoint, url in endpoints.items():
+            counts = {}
+            for limit in args.page_sizes:
+                statements.clear()
+                response = client.get(url(limit))
+                response.raise_for_status()
+                counts[limit] = len(statements)
+                if page_rows(response.json()) < limit:
+                    print(f"  {endpoint} returned {page_rows(response.json())} rows for limit={limit}")
+                    failures += 1
+            same = len(set(counts.values())) == 1
+            failures += not same
+            per_size = ", ".join(f"limit={limit}: {n}" for limit, n in counts.items())
+            print(f"{'ok' if same else 'GROWS':6} {endpoint:30} statements per request: {per_size}")
+    finally:
+        event.remove(engine, "before_cursor_execute", count)
+
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
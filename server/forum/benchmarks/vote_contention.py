@@ -0,0 +1,86 @@
+"""Concurrent voting load check.
+
+Creates a throwaway SQLite database, has hundreds of distinct users vote on
+the same question and answer at once, and verifies that no vote was lost.
+
+    python benchmarks/vote_contention.py --voters 300 --workers 64
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--voters", type=int, default=300)
+    parser.add_argument("--workers", type=int, default=64)
+    parser.add_argument("--database-url", default=None, help="Defaults to a temporary SQLite file")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="vote_contention_")
+    os.environ["DATABASE_URL"] = args.database_url or f"sqlite:///{os.path.join(workdir, 'votes.db')}"
+
+    # Imported after DATABASE_URL is set so the engine points at the scratch database
+    from database import SessionLocal, engine
+    from models import Base, User, Question, Answer
+    from schema_upgrade import upgrade_schema
+    from schemas import VoteCreate
+    from votes import apply_vote
+
+    Base.metadata.create_all(bind=engine)
+    upgrade_schema(engine)
+
+    db = SessionLocal()
+    users = [
+        User(username=f"voter{i}", email=f"voter{i}@example.com", hashed_password="x")
+        for i in range(args.voters)
+    ]
+    db.add_all(users)
+    db.flush()
+    question = Question(title="Contention target", content="...", tags=[], author_id=users[0].id)
+    db.add(question)
+    db.flush()
+    answer = Answer(content="...", question_id=question.id, author_id=users[0].id)
+    db.add(answer)
+    db.commit()
+    user_ids = [user.id for user in users]
+    question_id, answer_id = question.id, answer.id
+    db.close()
+
+    def cast(user_id, target):
+        session = SessionLocal()
+        try:
+            apply_vote(session, user_id, VoteCreate(vote_type=1, **target))
+        finally:
+            session.close()
+
+    jobs = [(user_id, {"question_id": question_id}) for user_id in user_ids]
+    jobs += [(user_id, {"answer_id": answer_id}) for user_id in user_ids]
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.workers) as pool:
+        list(pool.map(lambda job: cast(*job), jobs))
+    elapsed = time.perf_counter() - start
+
+    db = SessionLocal()
+    question = db.get(Question, question_id)
+    answer = db.get(Answer, answer_id)
+    print(f"{len(jobs)} votes from {args.voters} users in {elapsed:.2f}s ({len(jobs) / elapsed:.0f} votes/s)")
+    print(f"question upvotes={question.upvotes} score={question.score}")
+    print(f"answer upvotes={answer.upvotes} score={answer.score}")
+    db.close()
+
+    expected = args.voters
+    if (question.upvotes, question.score, answer.upvotes, answer.score) != (expected,) * 4:
+        print(f"LOST UPDATES: expected {expected} on each counter")
+        sys.exit(1)
+    print("No lost updates")
+
+
+if __name__ == "__main__":
+    main()
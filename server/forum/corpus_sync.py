@@ -0,0 +1,261 @@
+import hashlib
+import os
+import sys
+from dataclasses import dataclass, field
+from itertools import groupby
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+from decouple import config
+from sqlalchemy import delete as sql_delete, insert, select
+from sqlalchemy.orm import Session
+
+from models import RAGSyncEntry
+
+# The upload engine is shared with the ASHA corpus script
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "rag", "shared_libraries"))
+from ingestion import IngestionEngine
+
+# Incremental sync of forum threads into a RAG corpus.
+#
+# Threads are packed into shard files rather than uploaded one file each:
+# shard n holds every eligible thread with question_id // FORUM_SHARD_SIZE
+# == n, so a shard's membership only changes when one of its own questions
+# does. Inside a shard each thread sits between RECORD_START and RECORD_END
+# marker lines that carry its question id.
+#
+# The ledger (rag_sync_ledger) remembers, per corpus and question, the sha256
+# of the thread's text and the shard file it was uploaded in. A sync run
+# re-uploads only shards with a new, changed or removed thread, deletes the
+# file each of them replaces, and deletes shards whose threads all stopped
+# being eligible (deleted, closed, or left without qualifying answers).
+# Running it twice in a row uploads nothing the second time.
+#
+# The RAG calls are passed in, so this module does not depend on Vertex AI.
+# Uploads run concurrently on an IngestionEngine; ledger writes stay on the
+# calling thread, one commit per finished shard, so the ledger is also the
+# resume point of an interrupted run.
+
+FORUM_SHARD_SIZE = config("FORUM_SHARD_SIZE", default=200, cast=int)  # question ids per shard
+
+RECORD_START = "===== FORUM THREAD Q{question_id} ====="
+RECORD_END = "===== END OF FORUM THREAD Q{question_id} ====="
+
+# (qa_item, formatted text, content hash)
+Record = Tuple[dict, str, str]
+
+
+@dataclass
+class Shard:
+    shard_id: int
+    records: List[Record]
+    removed: Set[int]        # ledger question ids no longer in the shard
+    old_files: Set[str]      # files the new upload replaces
+
+    @property
+    def question_ids(self) -> List[int]:
+        return [qa_item["question_id"] for qa_item, _, _ in self.records]
+
+
+# upload(shard, bundle text) -> RAG file name; delete(rag_file_name) -> None
+Uploader = Callable[[Shard, str], str]
+Deleter = Callable[[str], None]
+
+
+@dataclass
+class SyncReport:
+    corpus_name: str
+    uploaded: int = 0   # threads seen for the first time
+    updated: int = 0    # threads whose text changed
+    unchanged: int = 0
+    deleted: int = 0    # threads no longer eligible
+    deferred: int = 0   # new or changed threads left for a later run by the limit
+    failed: int = 0     # threads in shards that failed to upload or delete
+    files_uploaded: int = 0
+    files_deleted: int = 0
+    errors: List[str] = field(default_factory=list)
+
+
+def content_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def shard_of(question_id: int, shard_size: int = FORUM_SHARD_SIZE) -> int:
+    return question_id // shard_size
+
+
+def shard_question_ids(question_ids: Iterable[int], shard_size: int = FORUM_SHARD_SIZE) -> List[int]:
+    """Every question id sharing a shard with one of question_ids.
+
+    Rebuilding a shard needs all of its threads, so a sync scoped to some
+    questions has to be widened to their whole shards.
+    """
+    shards = {shard_of(question_id, shard_size) for question_id in question_ids}
+    return [
+        question_id
+        for shard_id in sorted(shards)
+        for question_id in range(shard_id * shard_size, (shard_id + 1) * shard_size)
+    ]
+
+
+def pack_shard(shard: Shard) -> str:
+    """One bundle text for all threads of a shard, with a marked boundary around each."""
+    parts = []
+    for qa_item, text, _ in shard.records:
+        question_id = qa_item["question_id"]
+        parts.append(RECORD_START.format(question_id=question_id))
+        parts.append(text.rstrip("\n"))
+        parts.append(RECORD_END.format(question_id=question_id))
+        parts.append("")
+    return "\n".join(parts)
+
+
+def sync_corpus(
+    db: Session,
+    corpus_name: str,
+    qa_items: Iterable[dict],
+    format_text: Callable[[dict], str],
+    upload: Uploader,
+    delete: Deleter,
+    question_ids: Optional[List[int]] = None,
+    limit: Optional[int] = None,
+    engine: Optional[IngestionEngine] = None,
+    shard_size: int = FORUM_SHARD_SIZE,
+) -> SyncReport:
+    """Bring corpus_name in line with qa_items, touching only shards that changed.
+
+    qa_items must be ordered by question id and hold every eligible thread in
+    scope: all of them, or those among question_ids when given (see
+    shard_question_ids). limit caps shard uploads per run; threads in shards
+    left over are reported as deferred and picked up next time.
+    """
+    report = SyncReport(corpus_name=corpus_name)
+
+    # Plain (hash, file) tuples: ORM rows would be expired, and reloaded one
+    # by one, after every per-shard commit
+    ledger_query = select(
+        RAGSyncEntry.question_id, RAGSyncEntry.content_hash, RAGSyncEntry.rag_file_name
+    ).where(RAGSyncEntry.corpus_name == corpus_name)
+    if question_ids is not None:
+        ledger_query = ledger_query.where(RAGSyncEntry.question_id.in_(question_ids))
+    ledger: Dict[int, Tuple[str, str]] = {}
+    ledger_shards: Dict[int, Set[int]] = {}
+    for row in db.execute(ledger_query):
+        ledger[row.question_id] = (row.content_hash, row.rag_file_name)
+        ledger_shards.setdefault(shard_of(row.question_id, shard_size), set()).add(row.question_id)
+
+    seen_shards = set()
+    submitted = 0
+
+    def dirty_shards():
+        # Runs on this thread as the engine asks for more work
+        nonlocal submitted
+        for shard_id, qa_group in groupby(qa_items, key=lambda qa_item: shard_of(qa_item["question_id"], shard_size)):
+            seen_shards.add(shard_id)
+            records = []
+            for qa_item in qa_group:
+                text = format_text(qa_item)
+                records.append((qa_item, text, content_hash(text)))
+
+            members = ledger_shards.get(shard_id, set())
+            current = {qa_item["question_id"] for qa_item, _, _ in records}
+            changed = [
+                qa_item["question_id"] for qa_item, _, digest in records
+                if ledger.get(qa_item["question_id"], (None,))[0] != digest
+            ]
+            old_files = {ledger[question_id][1] for question_id in members}
+            # A shard spread over several files predates packing and is repacked
+            if not changed and members == current and len(old_files) <= 1:
+                report.unchanged += len(records)
+                continue
+            if limit is not None and submitted >= limit:
+                report.deferred += len(changed)
+                continue
+            submitted += 1
+            yield Shard(shard_id, records, members - current, old_files)
+
+    engine = engine or IngestionEngine()
+    outcomes = engine.run(
+        dirty_shards(),
+        work=lambda shard: upload(shard, pack_shard(shard)),
+        key=lambda shard: str(shard.shard_id),
+    )
+    for outcome in outcomes:
+        shard = outcome.item
+        if outcome.error is not None:
+            _record_failure(report, len(shard.records), f"Upload of shard {shard.shard_id} failed: {outcome.error}")
+            continue
+
+        for qa_item, _, digest in shard.records:
+            previous = ledger.get(qa_item["question_id"])
+            if previous is None:
+                report.uploaded += 1
+            elif previous[0] != digest:
+                report.updated += 1
+            else:
+                report.unchanged += 1
+        report.deleted += len(shard.removed)
+        report.files_uploaded += 1
+
+        # Replace the shard's ledger rows wholesale: two statements per shard
+        _delete_ledger_rows(db, corpus_name, set(shard.question_ids) | shard.removed)
+        db.execute(insert(RAGSyncEntry), [
+            {
+                "corpus_name": corpus_name,
+                "question_id": qa_item["question_id"],
+                "content_hash": digest,
+                "rag_file_name": outcome.result,
+            }
+            for qa_item, _, digest in shard.records
+        ])
+        # Commit per shard so an interrupted run keeps what it uploaded
+        db.commit()
+
+        for old_file in shard.old_files - {outcome.result}:
+            _delete_quietly(delete, old_file, report)
+
+    # Shards none of whose threads are eligible any more
+    for shard_id, members in ledger_shards.items():
+        if shard_id in seen_shards:
+            continue
+        try:
+            for old_file in sorted({ledger[question_id][1] for question_id in members}):
+                delete(old_file)
+                report.files_deleted += 1
+        except Exception as e:
+            _record_failure(report, len(members), f"Delete of shard {shard_id} failed: {e}")
+            continue
+        _delete_ledger_rows(db, corpus_name, members)
+        db.commit()
+        report.deleted += len(members)
+
+    print(
+        f"Corpus sync: {report.uploaded} new, {report.updated} updated, {report.unchanged} unchanged, "
+        f"{report.deleted} deleted, {report.deferred} deferred, {report.failed} failed threads; "
+        f"{report.files_uploaded} files uploaded, {report.files_deleted} deleted"
+    )
+    print(f"Uploads: {engine.report.summary()}")
+    return report
+
+
+def _delete_ledger_rows(db: Session, corpus_name: str, question_ids: Set[int]):
+    if question_ids:
+        db.execute(
+            sql_delete(RAGSyncEntry)
+            .where(RAGSyncEntry.corpus_name == corpus_name, RAGSyncEntry.question_id.in_(question_ids))
+        )
+
+
+def _delete_quietly(delete: Deleter, rag_file_name: str, report: SyncReport):
+    # The replacement is already uploaded; a leftover old file is only noise
+    try:
+        delete(rag_file_name)
+        report.files_deleted += 1
+    except Exception as e:
+        report.errors.append(f"Could not delete superseded file {rag_file_name}: {e}")
+        print(report.errors[-1])
+
+
+def _record_failure(report: SyncReport, threads: int, message: str):
+    report.failed += threads
+    report.errors.append(message)
+    print(message)
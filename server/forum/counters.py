@@ -0,0 +1,422 @@
+import argparse
+import atexit
+import threading
+import time
+from collections import deque
+from typing import Dict
+
+from decouple import config
+from sqlalchemy import bindparam, case, func, text, update
+from sqlalchemy.engine import Engine
+
+from models import Question
+
+# Denormalised forum counters.
+#
+#   questions.answer_count   triggers on answers (insert, delete, including
+#                            the cascade when a question is deleted)
+#   users.reputation         triggers on votes (insert, delete, a flipped
+#                            vote, a vote detached from a deleted post) and
+#                            on answers.is_verified
+#   questions.view_count     ViewCounter: a write-behind buffer, flushed in bulk
+#   upvotes/downvotes/score  votes.py, with SQL-side deltas
+#
+# The triggers run inside the writing transaction, so no request code path
+# can forget a counter. reconcile_counters() recomputes every counter from
+# the rows it is derived from with a few set-based UPDATEs, touching only
+# rows that drifted (writes from outside the API, data from before the
+# triggers); it runs once when the triggers are first installed, and on demand:
+#
+#     python counters.py --reconcile
+
+# Reputation earned by the author of the post voted on or verified
+QUESTION_UPVOTE_POINTS = 5
+ANSWER_UPVOTE_POINTS = 10
+DOWNVOTE_POINTS = -2
+VERIFIED_ANSWER_POINTS = 15
+
+# View counts are flushed every VIEW_FLUSH_SECONDS, or sooner once
+# VIEW_FLUSH_EVENTS views are buffered, VIEW_FLUSH_BATCH questions per UPDATE
+VIEW_FLUSH_SECONDS = config("VIEW_FLUSH_SECONDS", default=5, cast=float)
+VIEW_FLUSH_EVENTS = config("VIEW_FLUSH_EVENTS", default=1000, cast=int)
+VIEW_FLUSH_BATCH = config("VIEW_FLUSH_BATCH", default=500, cast=int)
+
+# SQL expressions for the points a vote row is worth and whose they are
+_SQLITE_POINTS = (
+    "(CASE WHEN {row}.answer_id IS NULL "
+    f"THEN (CASE WHEN {{row}}.vote_type = 1 THEN {QUESTION_UPVOTE_POINTS} ELSE {DOWNVOTE_POINTS} END) "
+    f"ELSE (CASE WHEN {{row}}.vote_type = 1 THEN {ANSWER_UPVOTE_POINTS} ELSE {DOWNVOTE_POINTS} END) END)"
+)
+_SQLITE_AUTHOR = (
+    "(CASE WHEN {row}.answer_id IS NULL "
+    "THEN (SELECT author_id FROM questions WHERE id = {row}.question_id) "
+    "ELSE (SELECT author_id FROM answers WHERE id = {row}.answer_id) END)"
+)
+
+
+def _sqlite_reputation(sign: str, row: str) -> str:
+    return (
+        f"UPDATE users SET reputation = coalesce(reputation, 0) {sign} {_SQLITE_POINTS.format(row=row)} "
+        f"WHERE id = {_SQLITE_AUTHOR.format(row=row)};"
+    )
+
+
+_SQLITE_TRIGGERS = {
+    "answers_counters_ai": """
+    CREATE TRIGGER IF NOT EXISTS answers_counters_ai AFTER INSERT ON answers BEGIN
+        UPDATE questions SET answer_count = coalesce(answer_count, 0) + 1 WHERE id = new.question_id;
+    END
+    """,
+    "answers_counters_ad": f"""
+    CREATE TRIGGER IF NOT EXISTS answers_counters_ad AFTER DELETE ON answers BEGIN
+        UPDATE questions SET answer_count = coalesce(answer_count, 0) - 1 WHERE id = old.question_id;
+        UPDATE users SET reputation = coalesce(reputation, 0) - {VERIFIED_ANSWER_POINTS}
+        WHERE id = old.author_id AND old.is_verified;
+    END
+    """,
+    "answers_counters_au": f"""
+    CREATE TRIGGER IF NOT EXISTS answers_counters_au AFTER UPDATE OF is_verified ON answers
+    WHEN coalesce(new.is_verified, 0) != coalesce(old.is_verified, 0) BEGIN
+        UPDATE users SET reputation = coalesce(reputation, 0)
+            + (CASE WHEN new.is_verified THEN {VERIFIED_ANSWER_POINTS} ELSE -{VERIFIED_ANSWER_POINTS} END)
+        WHERE id = new.author_id;
+    END
+    """,
+    "votes_reputation_ai": f"""
+    CREATE TRIGGER IF NOT EXISTS votes_reputation_ai AFTER INSERT ON votes BEGIN
+        {_sqlite_reputation("+", "new")}
+    END
+    """,
+    "votes_reputation_ad": f"""
+    CREATE TRIGGER IF NOT EXISTS votes_reputation_ad AFTER DELETE ON votes BEGIN
+        {_sqlite_reputation("-", "old")}
+    END
+    """,
+    # Also fires when deleting a post detaches its votes (the ORM nulls their
+    # foreign key first), which takes the points back from its author
+    "votes_reputation_au": f"""
+    CREATE TRIGGER IF NOT EXISTS votes_reputation_au AFTER UPDATE OF vote_type, question_id, answer_id ON votes BEGIN
+        {_sqlite_reputation("-", "old")}
+        {_sqlite_reputation("+", "new")}
+    END
+    """,
+}
+
+_POSTGRES_SETUP = [
+    f"""
+    CREATE OR REPLACE FUNCTION forum_vote_points(integer, integer) RETURNS integer AS $$
+        SELECT CASE WHEN $1 IS NULL
+            THEN (CASE WHEN $2 = 1 THEN {QUESTION_UPVOTE_POINTS} ELSE {DOWNVOTE_POINTS} END)
+            ELSE (CASE WHEN $2 = 1 THEN {ANSWER_UPVOTE_POINTS} ELSE {DOWNVOTE_POINTS} END) END
+    $$ LANGUAGE sql IMMUTABLE
+    """,
+    """
+    CREATE OR REPLACE FUNCTION forum_vote_author(integer, integer) RETURNS integer AS $$
+        SELECT CASE WHEN $2 IS NULL
+            THEN (SELECT author_id FROM questions WHERE id = $1)
+            ELSE (SELECT author_id FROM answers WHERE id = $2) END
+    $$ LANGUAGE sql STABLE
+    """,
+    """
+    CREATE OR REPLACE FUNCTION forum_votes_reputation() RETURNS trigger AS $$
+    BEGIN
+        IF TG_OP IN ('UPDATE', 'DELETE') THEN
+            UPDATE users SET reputation = coalesce(reputation, 0) - forum_vote_points(OLD.answer_id, OLD.vote_type)
+            WHERE id = forum_vote_author(OLD.question_id, OLD.answer_id);
+        END IF;
+        IF TG_OP IN ('INSERT', 'UPDATE') THEN
+            UPDATE users SET reputation = coalesce(reputation, 0) + forum_vote_points(NEW.answer_id, NEW.vote_type)
+            WHERE id = forum_vote_author(NEW.question_id, NEW.answer_id);
+        END IF;
+        RETURN NULL;
+    END
+    $$ LANGUAGE plpgsql
+    """,
+    f"""
+    CREATE OR REPLACE FUNCTION forum_answers_counters() RETURNS trigger AS $$
+    BEGIN
+        IF TG_OP = 'INSERT' THEN
+            UPDATE questions SET answer_count = coalesce(answer_count, 0) + 1 WHERE id = NEW.question_id;
+        ELSIF TG_OP = 'DELETE' THEN
+            UPDATE questions SET answer_count = coalesce(answer_count, 0) - 1 WHERE id = OLD.question_id;
+            IF OLD.is_verified THEN
+                UPDATE users SET reputation = coalesce(reputation, 0) - {VERIFIED_ANSWER_POINTS} WHERE id = OLD.author_id;
+            END IF;
+        ELSIF NEW.is_verified IS DISTINCT FROM OLD.is_verified THEN
+            UPDATE users SET reputation = coalesce(reputation, 0)
+                + (CASE WHEN NEW.is_verified THEN {VERIFIED_ANSWER_POINTS} ELSE -{VERIFIED_ANSWER_POINTS} END)
+            WHERE id = NEW.author_id;
+        END IF;
+        RETURN NULL;
+    END
+    $$ LANGUAGE plpgsql
+    """,
+    "DROP TRIGGER IF EXISTS votes_reputation ON votes",
+    """
+    CREATE TRIGGER votes_reputation AFTER INSERT OR DELETE OR UPDATE OF vote_type, question_id, answer_id
+    ON votes FOR EACH ROW EXECUTE FUNCTION forum_votes_reputation()
+    """,
+    "DROP TRIGGER IF EXISTS answers_counters ON answers",
+    """
+    CREATE TRIGGER answers_counters AFTER INSERT OR DELETE OR UPDATE OF is_verified
+    ON answers FOR EACH ROW EXECUTE FUNCTION forum_answers_counters()
+    """,
+]
+
+# Reputation of every user with any, recomputed from votes and verifications
+_EARNED_REPUTATION = f"""
+    SELECT author_id, sum(points) AS points FROM (
+        SELECT questions.author_id,
+            CASE WHEN votes.vote_type = 1 THEN {QUESTION_UPVOTE_POINTS} ELSE {DOWNVOTE_POINTS} END AS points
+        FROM votes JOIN questions ON questions.id = votes.question_id
+        WHERE votes.answer_id IS NULL
+        UNION ALL
+        SELECT answers.author_id,
+            CASE WHEN votes.vote_type = 1 THEN {ANSWER_UPVOTE_POINTS} ELSE {DOWNVOTE_POINTS} END
+        FROM votes JOIN answers ON answers.id = votes.answer_id
+        UNION ALL
+        SELECT author_id, {VERIFIED_ANSWER_POINTS} FROM answers WHERE is_verified
+    ) AS earned_rows GROUP BY author_id
+"""
+
+
+def _vote_tally(key: str) -> str:
+    return (
+        f"SELECT {key} AS target_id, "
+        "sum(CASE WHEN vote_type = 1 THEN 1 ELSE 0 END) AS up, "
+        "sum(CASE WHEN vote_type = -1 THEN 1 ELSE 0 END) AS down "
+        f"FROM votes WHERE {key} IS NOT NULL GROUP BY {key}"
+    )
+
+
+# (counter, statement) pairs; each statement only rewrites rows that drifted.
+# Question counters take every vote naming the question, as votes.py does.
+RECONCILE_STATEMENTS = [
+    (
+        "questions.answer_count",
+        """
+        UPDATE questions SET answer_count = (SELECT count(*) FROM answers WHERE answers.question_id = questions.id)
+        WHERE coalesce(answer_count, -1) != (SELECT count(*) FROM answers WHERE answers.question_id = questions.id)
+        """,
+    ),
+    *[
+        (
+            f"{table}.votes",
+            f"""
+            UPDATE {table} SET upvotes = tally.up, downvotes = tally.down, score = tally.up - tally.down
+            FROM ({_vote_tally(key)}) AS tally
+            WHERE {table}.id = tally.target_id AND (
+                coalesce({table}.upvotes, -1) != tally.up OR coalesce({table}.downvotes, -1) != tally.down
+                OR {table}.score != tally.up - tally.down
+            )
+            """,
+        )
+        for table, key in (("questions", "question_id"), ("answers", "answer_id"))
+    ],
+    *[
+        (
+            f"{table}.votes",
+            f"""
+            UPDATE {table} SET upvotes = 0, downvotes = 0, score = 0
+            WHERE (coalesce(upvotes, -1) != 0 OR coalesce(downvotes, -1) != 0 OR score != 0)
+            AND id NOT IN (SELECT {key} FROM votes WHERE {key} IS NOT NULL)
+            """,
+        )
+        for table, key in (("questions", "question_id"), ("answers", "answer_id"))
+    ],
+    (
+        "users.reputation",
+        f"""
+        UPDATE users SET reputation = earned.points FROM ({_EARNED_REPUTATION}) AS earned
+        WHERE users.id = earned.author_id AND coalesce(users.reputation, 0) != earned.points
+        """,
+    ),
+    (
+        "users.reputation",
+        f"""
+        UPDATE users SET reputation = 0
+        WHERE coalesce(reputation, -1) != 0 AND id NOT IN (SELECT author_id FROM ({_EARNED_REPUTATION}) AS earned)
+        """,
+    ),
+]
+
+
+def ensure_counter_triggers(engine: Engine):
+    """Install the counter triggers for the engine's dialect, reconciling once if they were missing."""
+    dialect = engine.dialect.name
+    with engine.begin() as conn:
+        if dialect == "sqlite":
+            existing = set(conn.execute(
+                text("SELECT name FROM sqlite_master WHERE type = 'trigger' AND name IN :names")
+                .bindparams(bindparam("names", expanding=True)),
+                {"names": list(_SQLITE_TRIGGERS)},
+            ).scalars())
+            for statement in _SQLITE_TRIGGERS.values():
+                conn.execute(text(statement))
+            installed = existing != set(_SQLITE_TRIGGERS)
+        elif dialect == "postgresql":
+            existing = set(conn.execute(
+                text("SELECT tgname FROM pg_trigger WHERE tgname IN ('votes_reputation', 'answers_counters')")
+            ).scalars())
+            for statement in _POSTGRES_SETUP:
+                conn.execute(text(statement))
+            installed = len(existing) < 2
+        else:
+            return
+    # Counters written before the triggers existed are brought in line with them
+    if installed:
+        repaired = reconcile_counters(engine)
+        print(f"Installed counter triggers; reconciled {repaired}")
+
+
+def reconcile_counters(engine: Engine) -> Dict[str, int]:
+    """Recompute every counter from its source rows; returns rows repaired per counter."""
+    repaired: Dict[str, int] = {}
+    with engine.begin() as conn:
+        for counter, statement in RECONCILE_STATEMENTS:
+            rows = conn.execute(text(statement)).rowcount
+            repaired[counter] = repaired.get(counter, 0) + max(rows, 0)
+    return repaired
+
+
+class ViewCounter:
+    """Write-behind buffer for question views.
+
+    GET /questions/{id} only adds one to an in-memory count for the
+    question, so the hottest read never takes SQLite's write lock. A
+    background thread writes the counts of all questions viewed since the
+    last flush with one UPDATE ... CASE per VIEW_FLUSH_BATCH questions, every
+    VIEW_FLUSH_SECONDS or as soon as VIEW_FLUSH_EVENTS views are waiting,
+    and once more on shutdown. A flush that fails puts its counts back for
+    the next one.
+
+    Every worker process has its own buffer; the increments add up in the
+    database, so no shared state is needed between workers. Views still in a
+    buffer are lost only if the process is killed without a shutdown.
+    """
+
+    def __init__(
+        self,
+        engine: Engine,
+        interval: float = VIEW_FLUSH_SECONDS,
+        max_events: int = VIEW_FLUSH_EVENTS,
+        batch_size: int = VIEW_FLUSH_BATCH,
+    ):
+        self.engine = engine
+        self.interval = interval
+        self.max_events = max_events
+        self.batch_size = batch_size
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._pending: Dict[int, int] = {}
+        self._pending_views = 0
+        self._oldest = None  # monotonic time of the oldest unflushed view
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+
+        self.flushes = 0
+        self.failed_flushes = 0
+        self.flushed_views = 0
+        self.flushed_rows = 0
+        self._latencies = deque(maxlen=100)  # seconds, most recent flushes
+
+    def record(self, question_id: int):
+        with self._lock:
+            self._pending[question_id] = self._pending.get(question_id, 0) + 1
+            self._pending_views += 1
+            if self._oldest is None:
+                self._oldest = time.monotonic()
+            full = self._pending_views >= self.max_events
+        if full:
+            self._wake.set()
+
+    def flush(self) -> int:
+        """Write the buffered views; returns the number of questions updated."""
+        with self._flush_lock:
+            with self._lock:
+                pending, self._pending = self._pending, {}
+                views, self._pending_views = self._pending_views, 0
+                oldest, self._oldest = self._oldest, None
+            if not pending:
+                return 0
+
+            started = time.perf_counter()
+            items = sorted(pending.items())
+            try:
+                with self.engine.begin() as conn:
+                    for start in range(0, len(items), self.batch_size):
+                        batch = dict(items[start:start + self.batch_size])
+                        conn.execute(
+                            update(Question)
+                            .where(Question.id.in_(list(batch)))
+                            .values(view_count=func.coalesce(Question.view_count, 0) + case(batch, value=Question.id))
+                            .execution_options(synchronize_session=False)
+                        )
+            except Exception as e:
+                # Keep the views for the next flush rather than losing them
+                with self._lock:
+                    for question_id, count in pending.items():
+                        self._pending[question_id] = self._pending.get(question_id, 0) + count
+                    self._pending_views += views
+                    self._oldest = min(filter(None, (self._oldest, oldest)), default=None)
+                    self.failed_flushes += 1
+                print(f"View count flush failed: {e}")
+                return 0
+
+            with self._lock:
+                self.flushes += 1
+                self.flushed_rows += len(items)
+                self.flushed_views += views
+                self._latencies.append(time.perf_counter() - started)
+            return len(items)
+
+    def start(self):
+        if self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="view-counter", daemon=True)
+            self._thread.start()
+            atexit.register(self.stop)
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self.flush()
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            if not self._stop.is_set():
+                self.flush()
+
+    def stats(self):
+        with self._lock:
+            latencies = sorted(self._latencies)
+            return {
+                "pending_questions": len(self._pending),
+                "pending_views": self._pending_views,
+                "oldest_pending_seconds": round(time.monotonic() - self._oldest, 3) if self._oldest else 0.0,
+                "flushes": self.flushes,
+                "failed_flushes": self.failed_flushes,
+                "flushed_rows": self.flushed_rows,
+                "flushed_views": self.flushed_views,
+                "flush_ms_p50": round(latencies[len(latencies) // 2] * 1000, 2) if latencies else None,
+                "flush_ms_max": round(latencies[-1] * 1000, 2) if latencies else None,
+            }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Forum counter maintenance")
+    parser.add_argument("--reconcile", action="store_true", help="Repair drifted counters in bulk")
+    args = parser.parse_args()
+
+    from database import engine
+
+    if args.reconcile:
+        print(reconcile_counters(engine))
+    else:
+        parser.print_help()
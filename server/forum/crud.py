@@ -0,0 +1,330 @@
+from fastapi import HTTPException
+from sqlalchemy.orm import Session, joinedload
+from sqlalchemy import or_
+from dataclasses import asdict
+from datetime import datetime
+from typing import List
+import os
+
+from models import Question, Answer, User
+from schemas import (
+    QuestionCreate, QuestionResponse, QuestionUpdate,
+    AnswerCreate, AnswerResponse, AnswerUpdate,
+    UserCreate, UserResponse,
+    SearchResponse, QuestionSearchResult, AnswerSearchResult, SimilarQuestion,
+    RAGSyncRequest, RAGSyncResponse
+)
+from auth import CurrentUser, create_access_token
+from search_index import supports_full_text, search_question_ids, search_answer_ids
+from pagination import decode_cursor, next_cursor, paginate
+from response_cache import response_cache
+from similar_questions import similar_questions, SimilarHit, SIMILAR_QUESTIONS_DUPLICATE_THRESHOLD
+
+# Request logic for the forum API, written against a sync Session.
+#
+# main.py runs these either on the threadpool (sync engine) or through
+# AsyncSession.run_sync (async engine), so there is a single implementation
+# of every endpoint. Anything returned to the client is converted to a
+# response schema here, while the session is still open, so nothing is
+# lazy-loaded after the function returns.
+
+# Sort modes map to stored columns so each one can seek through a composite index
+QUESTION_SORT_COLUMNS = {
+    "created_at": "created_at",
+    "votes": "score",
+    "answers": "answer_count",
+}
+
+ANSWER_SORT_COLUMNS = {
+    "created_at": "created_at",
+    "votes": "score",
+}
+
+# Queries whose results are serialized with a nested author load it in the
+# same statement, so a page never falls back to one lazy load per row
+def question_query(db: Session):
+    return db.query(Question).options(joinedload(Question.author))
+
+def answer_query(db: Session):
+    return db.query(Answer).options(joinedload(Answer.author))
+
+# Authentication
+def register_user(db: Session, user: UserCreate, hashed_password: str):
+    # Check if user already exists
+    existing_user = db.query(User).filter(User.email == user.email).first()
+    if existing_user:
+        raise HTTPException(status_code=400, detail="Email already registered")
+
+    # Create new user
+    db_user = User(
+        username=user.username,
+        email=user.email,
+        hashed_password=hashed_password
+    )
+    db.add(db_user)
+    db.commit()
+    db.refresh(db_user)
+
+    return UserResponse.model_validate(db_user)
+
+def get_login_user(db: Session, email: str):
+    """Return (user, hashed_password) for a login attempt, or (None, None)."""
+    user = db.query(User).filter(User.email == email).first()
+    if not user:
+        return None, None
+    return UserResponse.model_validate(user), user.hashed_password
+
+def login_response(user: UserResponse):
+    access_token = create_access_token(data={"sub": user.email})
+    print(f"User {user.username} logged in successfully")
+    return {"access_token": access_token, "token_type": "bearer", "user": user}
+
+# Questions
+def create_question(db: Session, question: QuestionCreate, current_user: CurrentUser):
+    db_question = Question(
+        title=question.title,
+        content=question.content,
+        tags=question.tags,
+        author_id=current_user.id
+    )
+    db.add(db_question)
+    db.commit()
+    response_cache.invalidate_forum()
+    similar_questions.upsert(db_question.id, db_question.title, db_question.content)
+    db.refresh(db_question)
+    return QuestionResponse.model_validate(db_question)
+
+def get_questions(db: Session, skip: int, limit: int, sort_by: str, order: str, cursor):
+    """Return one page of questions and the cursor for the next page, if any."""
+    sort_attr = QUESTION_SORT_COLUMNS[sort_by]
+    cursor_key, cursor_id = decode_cursor(cursor, sort_by, order) if cursor else (None, None)
+
+    query = paginate(
+        question_query(db), db.get_bind().dialect.name,
+        getattr(Question, sort_attr), Question.id, order, cursor_key, cursor_id
+    )
+    if cursor is None:
+        query = query.offset(skip)
+
+    questions = query.limit(limit).all()
+
+    next_page = next_cursor(questions, sort_attr, sort_by, order, limit)
+    return [QuestionResponse.model_validate(question) for question in questions], next_page
+
+def get_unindexed_questions(db: Session):
+    """Questions the similar-question index has not seen yet, when a refresh is due."""
+    return similar_questions.new_questions(db)
+
+def get_similar_questions(db: Session, hits: List[SimilarHit]):
+    """The questions behind similar-question index hits, most similar first."""
+    if not hits:
+        return []
+
+    questions_by_id = {
+        question.id: question
+        for question in question_query(db).filter(Question.id.in_([hit.id for hit in hits]))
+    }
+    return [
+        SimilarQuestion.model_validate(questions_by_id[hit.id]).model_copy(update={
+            "similarity": hit.similarity,
+            "likely_duplicate": hit.similarity >= SIMILAR_QUESTIONS_DUPLICATE_THRESHOLD,
+        })
+        for hit in hits if hit.id in questions_by_id
+    ]
+
+def get_question(db: Session, question_id: int):
+    question = question_query(db).filter(Question.id == question_id).first()
+    if not question:
+        raise HTTPException(status_code=404, detail="Question not found")
+    return QuestionResponse.model_validate(question)
+
+def update_question(db: Session, question_id: int, question_update: QuestionUpdate, current_user: CurrentUser):
+    question = db.query(Question).filter(Question.id == question_id).first()
+    if not question:
+        raise HTTPException(status_code=404, detail="Question not found")
+
+    if question.author_id != current_user.id and not current_user.is_moderator:
+        raise HTTPException(status_code=403, detail="Not authorized to update this question")
+
+    changes = question_update.dict(exclude_unset=True)
+    for field, value in changes.items():
+        setattr(question, field, value)
+
+    question.updated_at = datetime.utcnow()
+    db.commit()
+    response_cache.invalidate_question(question_id)
+    if "title" in changes or "content" in changes:
+        similar_questions.upsert(question_id, question.title, question.content)
+    db.refresh(question)
+    return QuestionResponse.model_validate(question)
+
+def delete_question(db: Session, question_id: int, current_user: CurrentUser):
+    question = db.query(Question).filter(Question.id == question_id).first()
+    if not question:
+        raise HTTPException(status_code=404, detail="Question not found")
+
+    if question.author_id != current_user.id and not current_user.is_moderator:
+        raise HTTPException(status_code=403, detail="Not authorized to delete this question")
+
+    db.delete(question)
+    db.commit()
+    response_cache.invalidate_question(question_id)
+    similar_questions.remove(question_id)
+    return {"message": "Question deleted successfully"}
+
+# Answers
+def create_answer(db: Session, question_id: int, answer: AnswerCreate, current_user: CurrentUser):
+    # Check if question exists
+    question = db.query(Question).filter(Question.id == question_id).first()
+    if not question:
+        raise HTTPException(status_code=404, detail="Question not found")
+
+    db_answer = Answer(
+        content=answer.content,
+        question_id=question_id,
+        author_id=current_user.id
+    )
+    # questions.answer_count is kept by a trigger (counters.py)
+    db.add(db_answer)
+    db.commit()
+    response_cache.invalidate_question(question_id)
+    db.refresh(db_answer)
+    return AnswerResponse.model_validate(db_answer)
+
+def get_answers(db: Session, question_id: int, skip: int, limit: int, sort_by: str, order: str, cursor):
+    """Return one page of a question's answers and the cursor for the next page, if any."""
+    sort_attr = ANSWER_SORT_COLUMNS[sort_by]
+    cursor_key, cursor_id = decode_cursor(cursor, sort_by, order) if cursor else (None, None)
+
+    query = paginate(
+        answer_query(db).filter(Answer.question_id == question_id), db.get_bind().dialect.name,
+        getattr(Answer, sort_attr), Answer.id, order, cursor_key, cursor_id
+    )
+    if cursor is None:
+        query = query.offset(skip)
+
+    answers = query.limit(limit).all()
+
+    next_page = next_cursor(answers, sort_attr, sort_by, order, limit)
+    return [AnswerResponse.model_validate(answer) for answer in answers], next_page
+
+def update_answer(db: Session, answer_id: int, answer_update: AnswerUpdate, current_user: CurrentUser):
+    answer = db.query(Answer).filter(Answer.id == answer_id).first()
+    if not answer:
+        raise HTTPException(status_code=404, detail="Answer not found")
+
+    if answer.author_id != current_user.id and not current_user.is_moderator:
+        raise HTTPException(status_code=403, detail="Not authorized to update this answer")
+
+    for field, value in answer_update.dict(exclude_unset=True).items():
+        setattr(answer, field, value)
+
+    answer.updated_at = datetime.utcnow()
+    db.commit()
+    response_cache.invalidate_question(answer.question_id)
+    db.refresh(answer)
+    return AnswerResponse.model_validate(answer)
+
+def verify_answer(db: Session, answer_id: int, current_user: CurrentUser):
+    answer = db.query(Answer).filter(Answer.id == answer_id).first()
+    if not answer:
+        raise HTTPException(status_code=404, detail="Answer not found")
+
+    # Only question author or moderators can verify answers
+    question = db.query(Question).filter(Question.id == answer.question_id).first()
+    if question.author_id != current_user.id and not current_user.is_moderator:
+        raise HTTPException(status_code=403, detail="Not authorized to verify this answer")
+
+    answer.is_verified = not answer.is_verified
+    db.commit()
+    response_cache.invalidate_question(answer.question_id)
+    return {"message": f"Answer {'verified' if answer.is_verified else 'unverified'} successfully"}
+
+# Search
+def search(db: Session, q: str, skip: int, limit: int):
+    if not supports_full_text(db.get_bind().dialect.name):
+        return _search_by_substring(db, q, skip, limit)
+
+    # Rank against the full-text index, then load the matching page by primary key
+    question_hits = search_question_ids(db, q, skip, limit)
+    answer_hits = search_answer_ids(db, q, skip, limit)
+
+    questions_by_id = {}
+    if question_hits:
+        questions_by_id = {
+            question.id: question
+            for question in question_query(db).filter(Question.id.in_([hit.id for hit in question_hits]))
+        }
+    answers_by_id = {}
+    if answer_hits:
+        answers_by_id = {
+            answer.id: answer
+            for answer in answer_query(db).filter(Answer.id.in_([hit.id for hit in answer_hits]))
+        }
+
+    questions = [
+        QuestionSearchResult.model_validate(questions_by_id[hit.id]).model_copy(
+            update={"rank": hit.rank, "snippet": hit.snippet}
+        )
+        for hit in question_hits if hit.id in questions_by_id
+    ]
+    answers = [
+        AnswerSearchResult.model_validate(answers_by_id[hit.id]).model_copy(
+            update={"rank": hit.rank, "snippet": hit.snippet}
+        )
+        for hit in answer_hits if hit.id in answers_by_id
+    ]
+
+    return SearchResponse(
+        query=q,
+        questions=questions,
+        answers=answers,
+        total_results=len(questions) + len(answers)
+    )
+
+def _search_by_substring(db: Session, q: str, skip: int, limit: int):
+    # Fallback for databases without a full-text index
+    questions = question_query(db).filter(
+        or_(
+            Question.title.contains(q),
+            Question.content.contains(q),
+            Question.tags.contains(q)
+        )
+    ).offset(skip).limit(limit).all()
+
+    answers = answer_query(db).filter(
+        Answer.content.contains(q)
+    ).offset(skip).limit(limit).all()
+
+    return SearchResponse(
+        query=q,
+        questions=[QuestionSearchResult.model_validate(question) for question in questions],
+        answers=[AnswerSearchResult.model_validate(answer) for answer in answers],
+        total_results=len(questions) + len(answers)
+    )
+
+# AI answers
+def get_question_summary(db: Session, question_id: int):
+    question = db.query(Question).filter(Question.id == question_id).first()
+    if not question:
+        raise HTTPException(status_code=404, detail="Question not found")
+    return {"question_id": question.id, "question_title": question.title}
+
+# RAG corpus sync
+def sync_rag_corpus(db: Session, sync_request: RAGSyncRequest):
+    # Imported here: the corpus tooling needs Vertex AI and Google Cloud settings,
+    # which the forum API does not require to start
+    try:
+        import prepare_forum_corpus
+    except (ImportError, ValueError) as e:
+        raise HTTPException(status_code=503, detail=f"RAG corpus sync is not configured: {e}")
+
+    corpus_name = os.getenv("FORUM_RAG_CORPUS")
+    if not corpus_name:
+        raise HTTPException(status_code=503, detail="FORUM_RAG_CORPUS is not set; run prepare_forum_corpus.py first")
+
+    prepare_forum_corpus.initialize_vertex_ai()
+    report = prepare_forum_corpus.sync_forum_corpus(
+        db, corpus_name, sync_request.question_ids, sync_request.limit
+    )
+    return RAGSyncResponse(**asdict(report))
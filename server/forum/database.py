@@ -1,4 +1,4 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 from decouple import config
@@ -6,11 +6,96 @@ from decouple import config
 # Database URL - configure based on your database
 DATABASE_URL = config("DATABASE_URL", default="sqlite:///./qa_forum.db")
 
-engine = create_engine(
-    DATABASE_URL,
-    connect_args={"check_same_thread": False} if "sqlite" in DATABASE_URL else {}
-)
+# Serve requests through an AsyncEngine (aiosqlite/asyncpg) instead of
+# running sync sessions on the threadpool
+USE_ASYNC_DB = config("FORUM_ASYNC_DB", default=False, cast=bool)
+
+# Connection pool settings for client/server databases (Postgres)
+DB_POOL_SIZE = config("DB_POOL_SIZE", default=10, cast=int)
+DB_MAX_OVERFLOW = config("DB_MAX_OVERFLOW", default=20, cast=int)
+DB_POOL_TIMEOUT = config("DB_POOL_TIMEOUT", default=30, cast=int)  # seconds to wait for a free connection
+DB_POOL_RECYCLE = config("DB_POOL_RECYCLE", default=1800, cast=int)  # seconds before a connection is replaced
+
+# SQLite tuning. WAL lets readers proceed while a writer commits, and
+# synchronous=NORMAL is durable in WAL mode except across power loss.
+SQLITE_JOURNAL_MODE = config("SQLITE_JOURNAL_MODE", default="WAL")
+SQLITE_SYNCHRONOUS = config("SQLITE_SYNCHRONOUS", default="NORMAL")
+SQLITE_MMAP_SIZE = config("SQLITE_MMAP_SIZE", default=256 * 1024 * 1024, cast=int)
+SQLITE_CACHE_SIZE_KB = config("SQLITE_CACHE_SIZE_KB", default=64 * 1024, cast=int)
+SQLITE_BUSY_TIMEOUT_MS = config("SQLITE_BUSY_TIMEOUT_MS", default=5000, cast=int)
+
+def is_sqlite(url: str) -> bool:
+    return url.startswith("sqlite")
+
+def sqlite_pragmas():
+    return [
+        ("journal_mode", SQLITE_JOURNAL_MODE),
+        ("synchronous", SQLITE_SYNCHRONOUS),
+        ("mmap_size", SQLITE_MMAP_SIZE),
+        ("cache_size", -SQLITE_CACHE_SIZE_KB),  # negative values are KiB, not pages
+        ("busy_timeout", SQLITE_BUSY_TIMEOUT_MS),
+    ]
+
+def engine_options(url: str) -> dict:
+    """Keyword arguments for create_engine/create_async_engine for this database."""
+    if is_sqlite(url):
+        return {
+            "connect_args": {
+                "check_same_thread": False,
+                "timeout": SQLITE_BUSY_TIMEOUT_MS / 1000,
+            }
+        }
+    return {
+        "pool_size": DB_POOL_SIZE,
+        "max_overflow": DB_MAX_OVERFLOW,
+        "pool_timeout": DB_POOL_TIMEOUT,
+        "pool_recycle": DB_POOL_RECYCLE,
+        "pool_pre_ping": True,
+    }
+
+def install_sqlite_pragmas(sync_engine):
+    """Apply the SQLite pragmas to every new connection the engine opens."""
+    pragmas = sqlite_pragmas()
+
+    @event.listens_for(sync_engine, "connect")
+    def _set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas:
+            cursor.execute(f"PRAGMA {name}={value}")
+        cursor.close()
+
+def create_forum_engine(url: str = DATABASE_URL, **overrides):
+    options = {**engine_options(url), **overrides}
+    forum_engine = create_engine(url, **options)
+    # Votes move the counters with UPDATE ... RETURNING (votes.py); MySQL and
+    # MariaDB have no such statement
+    if not forum_engine.dialect.update_returning:
+        raise ValueError(f"The forum needs UPDATE ... RETURNING, which {forum_engine.dialect.name} does not support")
+    if is_sqlite(url):
+        install_sqlite_pragmas(forum_engine)
+    return forum_engine
+
+engine = create_forum_engine()
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
 
+def async_database_url(url: str) -> str:
+    """Map a sync database URL to the matching async driver."""
+    if url.startswith("sqlite://"):
+        return url.replace("sqlite://", "sqlite+aiosqlite://", 1)
+    if url.startswith("postgresql://"):
+        return url.replace("postgresql://", "postgresql+asyncpg://", 1)
+    return url
+
+async_engine = None
+AsyncSessionLocal = None
+
+if USE_ASYNC_DB:
+    from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+
+    async_engine = create_async_engine(async_database_url(DATABASE_URL), **engine_options(DATABASE_URL))
+    if is_sqlite(DATABASE_URL):
+        install_sqlite_pragmas(async_engine.sync_engine)
+    # Objects stay readable after commit; there is no implicit IO to refresh them
+    AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
@@ -1,25 +1,43 @@
-from fastapi import FastAPI, HTTPException, Depends, Query, status, Form
+from fastapi import FastAPI, HTTPException, Depends, Query, Request, status, Form
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from fastapi.middleware.cors import CORSMiddleware
+from starlette.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
-from sqlalchemy import or_, desc, asc
-from typing import List, Optional
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional, Union
+from pydantic import TypeAdapter
 import uvicorn
 from datetime import datetime
 
-from database import SessionLocal, engine
-from models import Base, Question, Answer, User, Vote
+import crud
+from database import SessionLocal, engine, USE_ASYNC_DB
+from models import Base
 from schemas import (
     QuestionCreate, QuestionResponse, QuestionUpdate,
     AnswerCreate, AnswerResponse, AnswerUpdate,
     UserCreate, UserResponse,
     VoteCreate, VoteResponse,
-    SearchResponse
+    SearchResponse, SimilarQuestion,
+    RAGSyncRequest, RAGSyncResponse
 )
-from auth import get_current_user, create_access_token, verify_password, get_password_hash
+from auth import CurrentUser, auth_cache, get_current_user, get_current_user_async, get_async_db
+from search_index import ensure_search_index
+from counters import ViewCounter, ensure_counter_triggers, reconcile_counters
+from schema_upgrade import upgrade_schema
+from votes import apply_vote
+from pagination import NEXT_CURSOR_HEADER
+from password_pool import password_pool
+from response_cache import response_cache
+from similar_questions import similar_questions, SIMILAR_QUESTIONS_LIMIT
 
 # Create tables
 Base.metadata.create_all(bind=engine)
+upgrade_schema(engine)
+ensure_search_index(engine)
+ensure_counter_triggers(engine)
+
+# Views are counted in memory so GET /questions/{id} never writes
+view_counter = ViewCounter(engine)
 
 app = FastAPI(
     title="Q&A Forum API",
@@ -34,369 +52,278 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    # Browsers hide other response headers from the web app unless listed here
+    expose_headers=["ETag", NEXT_CURSOR_HEADER],
 )
 
 security = HTTPBearer()
 
 # Dependency to get database session
-def get_db():
+def get_sync_db():
     db = SessionLocal()
     try:
         yield db
     finally:
         db.close()
 
+# FORUM_ASYNC_DB selects the session type every endpoint receives
+get_db = get_async_db if USE_ASYNC_DB else get_sync_db
+current_user_dependency = get_current_user_async if USE_ASYNC_DB else get_current_user
+
+DBSession = Union[Session, AsyncSession]
+
+async def run_db(db: DBSession, fn, *args):
+    """Run a crud function without blocking the event loop.
+
+    On the async engine it runs through AsyncSession.run_sync, so database IO
+    is awaited on the loop; on the sync engine it runs on the threadpool.
+    """
+    if isinstance(db, AsyncSession):
+        return await db.run_sync(fn, *args)
+    return await run_in_threadpool(fn, db, *args)
+
 # Authentication endpoints
 @app.post("/auth/register", response_model=UserResponse)
-def register_user(user: UserCreate, db: Session = Depends(get_db)):
-    # Check if user already exists
-    existing_user = db.query(User).filter(User.email == user.email).first()
-    if existing_user:
-        raise HTTPException(status_code=400, detail="Email already registered")
-    
-    # Create new user
-    hashed_password = get_password_hash(user.password)
-    db_user = User(
-        username=user.username,
-        email=user.email,
-        hashed_password=hashed_password
-    )
-    db.add(db_user)
-    db.commit()
-    db.refresh(db_user)
-    
-    return db_user
+async def register_user(user: UserCreate, db: DBSession = Depends(get_db)):
+    hashed_password = await password_pool.hash(user.password)
+    return await run_db(db, crud.register_user, user, hashed_password)
 
 @app.post("/auth/login")
-def login_user(email: str = Form(...), password: str = Form(...), db: Session = Depends(get_db)):
-    print(email, password)
-    user = db.query(User).filter(User.email == email).first()
-    if not user or not verify_password(password, user.hashed_password):
+async def login_user(email: str = Form(...), password: str = Form(...), db: DBSession = Depends(get_db)):
+    user, hashed_password = await run_db(db, crud.get_login_user, email)
+    if not user or not await password_pool.verify(password, hashed_password):
         raise HTTPException(status_code=401, detail="Invalid credentials")
-    
-    access_token = create_access_token(data={"sub": user.email})
-    print(f"User {user.username} logged in successfully")
-    return {"access_token": access_token, "token_type": "bearer", "user": user}
+    return crud.login_response(user)
 
 # Question endpoints
 @app.post("/questions", response_model=QuestionResponse)
-def create_question(
+async def create_question(
     question: QuestionCreate,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: DBSession = Depends(get_db),
+    current_user: CurrentUser = Depends(current_user_dependency)
 ):
-    db_question = Question(
-        title=question.title,
-        content=question.content,
-        tags=question.tags,
-        author_id=current_user.id
-    )
-    db.add(db_question)
-    db.commit()
-    db.refresh(db_question)
-    return db_question
+    return await run_db(db, crud.create_question, question, current_user)
+
+# Hot read endpoints are served through response_cache with ETags
+QuestionList = TypeAdapter(List[QuestionResponse])
+AnswerList = TypeAdapter(List[AnswerResponse])
 
 @app.get("/questions", response_model=List[QuestionResponse])
-def get_questions(
+async def get_questions(
+    request: Request,
     skip: int = 0,
     limit: int = 20,
     sort_by: str = Query("created_at", enum=["created_at", "votes", "answers"]),
     order: str = Query("desc", enum=["asc", "desc"]),
-    db: Session = Depends(get_db)
+    cursor: Optional[str] = Query(None, description=f"Opaque cursor from the {NEXT_CURSOR_HEADER} header; replaces skip"),
+    db: DBSession = Depends(get_db)
 ):
-    query = db.query(Question)
-    
-    # Sorting
-    if sort_by == "votes":
-        if order == "desc":
-            query = query.order_by(desc(Question.upvotes - Question.downvotes))
-        else:
-            query = query.order_by(asc(Question.upvotes - Question.downvotes))
-    elif sort_by == "answers":
-        if order == "desc":
-            query = query.order_by(desc(Question.answer_count))
-        else:
-            query = query.order_by(asc(Question.answer_count))
-    else:  # created_at
-        if order == "desc":
-            query = query.order_by(desc(Question.created_at))
-        else:
-            query = query.order_by(asc(Question.created_at))
-    
-    return query.offset(skip).limit(limit).all()
+    async def render():
+        questions, next_page = await run_db(db, crud.get_questions, skip, limit, sort_by, order, cursor)
+        headers = {NEXT_CURSOR_HEADER: next_page} if next_page else {}
+        return QuestionList.dump_json(questions), headers
+
+    return await response_cache.respond(request, response_cache.forum_version(), render)
+
+async def find_similar_questions(db: DBSession, title: str, content: str, limit: int, exclude_id: Optional[int]):
+    # Joining the startup build would hold the request, and on the async engine
+    # the event loop, until it finishes; drafts go without suggestions meanwhile
+    if not similar_questions.loaded:
+        return []
+    new_questions = await run_db(db, crud.get_unindexed_questions)
+    # Embedding and scoring every row is CPU work, kept off the event loop
+    if new_questions:
+        await run_in_threadpool(similar_questions.catch_up, new_questions)
+    hits = await run_in_threadpool(similar_questions.search, title, content, limit=limit, exclude_id=exclude_id)
+    return await run_db(db, crud.get_similar_questions, hits)
+
+# Declared before /questions/{question_id} so "similar" is not read as an id
+@app.get("/questions/similar", response_model=List[SimilarQuestion])
+async def get_similar_questions(
+    q: str = Query(..., min_length=1, description="Question text to match"),
+    limit: int = Query(SIMILAR_QUESTIONS_LIMIT, ge=1, le=20),
+    exclude_id: Optional[int] = Query(None, description="Leave this question out, e.g. the one being viewed"),
+    db: DBSession = Depends(get_db)
+):
+    return await find_similar_questions(db, q, "", limit, exclude_id)
+
+@app.post("/questions/similar", response_model=List[SimilarQuestion])
+async def check_similar_questions(
+    question: QuestionCreate,
+    limit: int = Query(SIMILAR_QUESTIONS_LIMIT, ge=1, le=20),
+    db: DBSession = Depends(get_db)
+):
+    """Pre-submit check: existing questions a draft may duplicate."""
+    return await find_similar_questions(db, question.title, question.content, limit, None)
 
 @app.get("/questions/{question_id}", response_model=QuestionResponse)
-def get_question(question_id: int, db: Session = Depends(get_db)):
-    question = db.query(Question).filter(Question.id == question_id).first()
-    if not question:
-        raise HTTPException(status_code=404, detail="Question not found")
-    return question
+async def get_question(question_id: int, request: Request, db: DBSession = Depends(get_db)):
+    async def render():
+        question = await run_db(db, crud.get_question, question_id)
+        return question.model_dump_json().encode(), {}
+
+    response = await response_cache.respond(request, response_cache.question_version(question_id), render)
+    # Counted once the question is served from the cache or rendered; a 404 raises out of render
+    view_counter.record(question_id)
+    return response
 
 @app.put("/questions/{question_id}", response_model=QuestionResponse)
-def update_question(
+async def update_question(
     question_id: int,
     question_update: QuestionUpdate,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: DBSession = Depends(get_db),
+    current_user: CurrentUser = Depends(current_user_dependency)
 ):
-    question = db.query(Question).filter(Question.id == question_id).first()
-    if not question:
-        raise HTTPException(status_code=404, detail="Question not found")
-    
-    if question.author_id != current_user.id and not current_user.is_moderator:
-        raise HTTPException(status_code=403, detail="Not authorized to update this question")
-    
-    for field, value in question_update.dict(exclude_unset=True).items():
-        setattr(question, field, value)
-    
-    question.updated_at = datetime.utcnow()
-    db.commit()
-    db.refresh(question)
-    return question
+    return await run_db(db, crud.update_question, question_id, question_update, current_user)
 
 @app.delete("/questions/{question_id}")
-def delete_question(
+async def delete_question(
     question_id: int,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: DBSession = Depends(get_db),
+    current_user: CurrentUser = Depends(current_user_dependency)
 ):
-    question = db.query(Question).filter(Question.id == question_id).first()
-    if not question:
-        raise HTTPException(status_code=404, detail="Question not found")
-    
-    if question.author_id != current_user.id and not current_user.is_moderator:
-        raise HTTPException(status_code=403, detail="Not authorized to delete this question")
-    
-    db.delete(question)
-    db.commit()
-    return {"message": "Question deleted successfully"}
+    return await run_db(db, crud.delete_question, question_id, current_user)
 
 # Answer endpoints
 @app.post("/questions/{question_id}/answers", response_model=AnswerResponse)
-def create_answer(
+async def create_answer(
     question_id: int,
     answer: AnswerCreate,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: DBSession = Depends(get_db),
+    current_user: CurrentUser = Depends(current_user_dependency)
 ):
-    # Check if question exists
-    question = db.query(Question).filter(Question.id == question_id).first()
-    if not question:
-        raise HTTPException(status_code=404, detail="Question not found")
-    
-    db_answer = Answer(
-        content=answer.content,
-        question_id=question_id,
-        author_id=current_user.id
-    )
-    db.add(db_answer)
-    
-    # Update question answer count
-    question.answer_count += 1
-    
-    db.commit()
-    db.refresh(db_answer)
-    return db_answer
+    return await run_db(db, crud.create_answer, question_id, answer, current_user)
 
 @app.get("/questions/{question_id}/answers", response_model=List[AnswerResponse])
-def get_answers(
+async def get_answers(
     question_id: int,
+    request: Request,
     skip: int = 0,
     limit: int = 20,
     sort_by: str = Query("created_at", enum=["created_at", "votes"]),
     order: str = Query("desc", enum=["asc", "desc"]),
-    db: Session = Depends(get_db)
+    cursor: Optional[str] = Query(None, description=f"Opaque cursor from the {NEXT_CURSOR_HEADER} header; replaces skip"),
+    db: DBSession = Depends(get_db)
 ):
-    query = db.query(Answer).filter(Answer.question_id == question_id)
-    
-    # Sorting
-    if sort_by == "votes":
-        if order == "desc":
-            query = query.order_by(desc(Answer.upvotes - Answer.downvotes))
-        else:
-            query = query.order_by(asc(Answer.upvotes - Answer.downvotes))
-    else:  # created_at
-        if order == "desc":
-            query = query.order_by(desc(Answer.created_at))
-        else:
-            query = query.order_by(asc(Answer.created_at))
-    
-    return query.offset(skip).limit(limit).all()
+    async def render():
+        answers, next_page = await run_db(db, crud.get_answers, question_id, skip, limit, sort_by, order, cursor)
+        headers = {NEXT_CURSOR_HEADER: next_page} if next_page else {}
+        return AnswerList.dump_json(answers), headers
+
+    return await response_cache.respond(request, response_cache.question_version(question_id), render)
 
 @app.put("/answers/{answer_id}", response_model=AnswerResponse)
-def update_answer(
+async def update_answer(
     answer_id: int,
     answer_update: AnswerUpdate,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: DBSession = Depends(get_db),
+    current_user: CurrentUser = Depends(current_user_dependency)
 ):
-    answer = db.query(Answer).filter(Answer.id == answer_id).first()
-    if not answer:
-        raise HTTPException(status_code=404, detail="Answer not found")
-    
-    if answer.author_id != current_user.id and not current_user.is_moderator:
-        raise HTTPException(status_code=403, detail="Not authorized to update this answer")
-    
-    for field, value in answer_update.dict(exclude_unset=True).items():
-        setattr(answer, field, value)
-    
-    answer.updated_at = datetime.utcnow()
-    db.commit()
-    db.refresh(answer)
-    return answer
+    return await run_db(db, crud.update_answer, answer_id, answer_update, current_user)
 
 @app.put("/answers/{answer_id}/verify")
-def verify_answer(
+async def verify_answer(
     answer_id: int,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: DBSession = Depends(get_db),
+    current_user: CurrentUser = Depends(current_user_dependency)
 ):
-    answer = db.query(Answer).filter(Answer.id == answer_id).first()
-    if not answer:
-        raise HTTPException(status_code=404, detail="Answer not found")
-    
-    # Only question author or moderators can verify answers
-    question = db.query(Question).filter(Question.id == answer.question_id).first()
-    if question.author_id != current_user.id and not current_user.is_moderator:
-        raise HTTPException(status_code=403, detail="Not authorized to verify this answer")
-    
-    answer.is_verified = not answer.is_verified
-    db.commit()
-    return {"message": f"Answer {'verified' if answer.is_verified else 'unverified'} successfully"}
+    return await run_db(db, crud.verify_answer, answer_id, current_user)
 
 # Voting endpoints
 @app.post("/vote", response_model=VoteResponse)
-def vote(
+async def vote(
     vote: VoteCreate,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: DBSession = Depends(get_db),
+    current_user: CurrentUser = Depends(current_user_dependency)
 ):
-    # Check if user already voted
-    existing_vote = db.query(Vote).filter(
-        Vote.user_id == current_user.id,
-        Vote.question_id == vote.question_id,
-        Vote.answer_id == vote.answer_id
-    ).first()
-    
-    if existing_vote:
-        # Update existing vote
-        old_vote_type = existing_vote.vote_type
-        existing_vote.vote_type = vote.vote_type
-        db.commit()
-        
-        # Update vote counts
-        if vote.question_id:
-            question = db.query(Question).filter(Question.id == vote.question_id).first()
-            if old_vote_type == 1:  # was upvote
-                question.upvotes -= 1
-            elif old_vote_type == -1:  # was downvote
-                question.downvotes -= 1
-            
-            if vote.vote_type == 1:  # new upvote
-                question.upvotes += 1
-            elif vote.vote_type == -1:  # new downvote
-                question.downvotes += 1
-        
-        if vote.answer_id:
-            answer = db.query(Answer).filter(Answer.id == vote.answer_id).first()
-            if old_vote_type == 1:
-                answer.upvotes -= 1
-            elif old_vote_type == -1:
-                answer.downvotes -= 1
-            
-            if vote.vote_type == 1:
-                answer.upvotes += 1
-            elif vote.vote_type == -1:
-                answer.downvotes += 1
-        
-        db.commit()
-        return existing_vote
-    else:
-        # Create new vote
-        db_vote = Vote(
-            user_id=current_user.id,
-            question_id=vote.question_id,
-            answer_id=vote.answer_id,
-            vote_type=vote.vote_type
-        )
-        db.add(db_vote)
-        
-        # Update vote counts
-        if vote.question_id:
-            question = db.query(Question).filter(Question.id == vote.question_id).first()
-            if vote.vote_type == 1:
-                question.upvotes += 1
-            elif vote.vote_type == -1:
-                question.downvotes += 1
-        
-        if vote.answer_id:
-            answer = db.query(Answer).filter(Answer.id == vote.answer_id).first()
-            if vote.vote_type == 1:
-                answer.upvotes += 1
-            elif vote.vote_type == -1:
-                answer.downvotes += 1
-        
-        db.commit()
-        db.refresh(db_vote)
-        return db_vote
+    return await run_db(db, apply_vote, current_user.id, vote)
 
 # Search endpoint
 @app.get("/search", response_model=SearchResponse)
-def search(
+async def search(
     q: str = Query(..., min_length=1, description="Search query"),
     skip: int = 0,
     limit: int = 20,
-    db: Session = Depends(get_db)
+    db: DBSession = Depends(get_db)
+):
+    return await run_db(db, crud.search, q, skip, limit)
+
+# RAG corpus sync
+@app.post("/rag/sync", response_model=RAGSyncResponse)
+async def sync_rag_corpus(
+    sync_request: RAGSyncRequest,
+    current_user: CurrentUser = Depends(current_user_dependency)
 ):
-    # Search in questions
-    questions = db.query(Question).filter(
-        or_(
-            Question.title.contains(q),
-            Question.content.contains(q),
-            Question.tags.contains(q)
-        )
-    ).offset(skip).limit(limit).all()
-    
-    # Search in answers
-    answers = db.query(Answer).filter(
-        Answer.content.contains(q)
-    ).offset(skip).limit(limit).all()
-    
-    return SearchResponse(
-        query=q,
-        questions=questions,
-        answers=answers,
-        total_results=len(questions) + len(answers)
-    )
+    """Upload new and changed threads to the forum corpus and delete stale ones."""
+    if not current_user.is_moderator:
+        raise HTTPException(status_code=403, detail="Only moderators can sync the RAG corpus")
+
+    # Uploads are slow remote calls, so the sync gets its own session on the
+    # threadpool instead of holding the request's session (or the event loop)
+    def run_sync():
+        with SessionLocal() as db:
+            return crud.sync_rag_corpus(db, sync_request)
+
+    return await run_in_threadpool(run_sync)
+
+# Counter repair
+@app.post("/admin/reconcile-counters")
+async def reconcile_forum_counters(current_user: CurrentUser = Depends(current_user_dependency)):
+    """Recompute answer counts, vote counts and reputation, repairing any drift."""
+    if not current_user.is_moderator:
+        raise HTTPException(status_code=403, detail="Only moderators can reconcile counters")
+    repaired = await run_in_threadpool(reconcile_counters, engine)
+    return {"repaired": repaired}
+
+@app.on_event("startup")
+def load_similar_questions():
+    similar_questions.load_in_background(SessionLocal)
+
+@app.on_event("startup")
+def start_view_counter():
+    view_counter.start()
+
+@app.on_event("shutdown")
+def shutdown_password_pool():
+    password_pool.shutdown()
+
+@app.on_event("shutdown")
+def flush_view_counter():
+    view_counter.stop()
 
 # Health check
 @app.get("/health")
 def health_check():
-    return {"status": "healthy", "timestamp": datetime.utcnow()}
+    return {
+        "status": "healthy",
+        "timestamp": datetime.utcnow(),
+        "password_pool": password_pool.stats(),
+        "auth_cache": auth_cache.stats(),
+        "response_cache": response_cache.stats(),
+        "similar_questions": similar_questions.stats(),
+        "view_counter": view_counter.stats()
+    }
 
 # VertexAI RAG integration placeholder
 @app.post("/ai/generate-answer")
 async def generate_ai_answer(
     question_id: int,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: DBSession = Depends(get_db),
+    current_user: CurrentUser = Depends(current_user_dependency)
 ):
     """
     Placeholder for VertexAI RAG integration
     This will generate AI-powered answers based on existing Q&A data
     """
-    question = db.query(Question).filter(Question.id == question_id).first()
-    if not question:
-        raise HTTPException(status_code=404, detail="Question not found")
-    
+    question = await run_db(db, crud.get_question_summary, question_id)
+
     # TODO: Integrate with VertexAI RAG API
     # This is where you'll implement the RAG functionality
-    
+
     return {
         "message": "AI answer generation will be implemented with VertexAI RAG",
-        "question_id": question_id,
-        "question_title": question.title
+        **question
     }
 
 if __name__ == "__main__":
-    uvicorn.run(app, host="0.0.0.0", port=8001)
\ No newline at end of file
+    uvicorn.run(app, host="0.0.0.0", port=8001)
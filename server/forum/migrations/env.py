@@ -0,0 +1,46 @@
+from logging.config import fileConfig
+
+from alembic import context
+
+from database import DATABASE_URL, Base, create_forum_engine, is_sqlite
+import models  # noqa: F401  registers the tables on Base.metadata
+
+# Migrations run against DATABASE_URL, the database the API serves. The
+# full-text tables and counter triggers are not part of them: the API
+# creates those at startup (search_index.py, counters.py).
+
+config = context.config
+if config.config_file_name is not None:
+    fileConfig(config.config_file_name)
+
+target_metadata = Base.metadata
+
+
+def run_migrations_offline():
+    context.configure(
+        url=DATABASE_URL,
+        target_metadata=target_metadata,
+        literal_binds=True,
+        render_as_batch=is_sqlite(DATABASE_URL),
+    )
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+def run_migrations_online():
+    engine = create_forum_engine(DATABASE_URL)
+    with engine.connect() as connection:
+        # SQLite cannot ALTER most things in place; batch mode rebuilds the table
+        context.configure(
+            connection=connection,
+            target_metadata=target_metadata,
+            render_as_batch=is_sqlite(DATABASE_URL),
+        )
+        with context.begin_transaction():
+            context.run_migrations()
+
+
+if context.is_offline_mode():
+    run_migrations_offline()
+else:
+    run_migrations_online()
@@ -0,0 +1,145 @@
+"""Baseline: the forum schema before migrations
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-18
+
+Everything is created only if missing, so a database the API already
+created can run it as well. Databases from before the score columns get
+them here, the way schema_upgrade.py adds them at startup.
+"""
+from alembic import context, op
+import sqlalchemy as sa
+
+revision = "0001"
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+# Columns added to tables an older release may already have created
+ADDED_COLUMNS = [
+    ("questions", "score", "UPDATE questions SET score = coalesce(upvotes, 0) - coalesce(downvotes, 0)"),
+    ("answers", "score", "UPDATE answers SET score = coalesce(upvotes, 0) - coalesce(downvotes, 0)"),
+]
+
+# Duplicate votes from before the unique vote indexes keep only the latest row
+DEDUPLICATE_VOTES = [
+    "DELETE FROM votes WHERE answer_id IS NULL AND id NOT IN "
+    "(SELECT max(id) FROM votes WHERE answer_id IS NULL GROUP BY user_id, question_id)",
+    "DELETE FROM votes WHERE answer_id IS NOT NULL AND id NOT IN "
+    "(SELECT max(id) FROM votes WHERE answer_id IS NOT NULL GROUP BY user_id, answer_id)",
+]
+
+
+def _add_missing_columns():
+    if context.is_offline_mode():
+        return  # Nothing to inspect when only writing out the SQL
+    inspector = sa.inspect(op.get_bind())
+    tables = set(inspector.get_table_names())
+    for table, column, backfill in ADDED_COLUMNS:
+        if table in tables and column not in {c["name"] for c in inspector.get_columns(table)}:
+            op.add_column(table, sa.Column(column, sa.Integer(), nullable=False, server_default="0"))
+            op.execute(backfill)
+
+
+def upgrade():
+    _add_missing_columns()
+
+    op.create_table(
+        "users",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("username", sa.String(50), nullable=False),
+        sa.Column("email", sa.String(100), nullable=False),
+        sa.Column("hashed_password", sa.String(100), nullable=False),
+        sa.Column("is_active", sa.Boolean()),
+        sa.Column("is_moderator", sa.Boolean()),
+        sa.Column("reputation", sa.Integer()),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+        sa.Column("updated_at", sa.DateTime(timezone=True)),
+        if_not_exists=True,
+    )
+    op.create_index("ix_users_id", "users", ["id"], if_not_exists=True)
+    op.create_index("ix_users_username", "users", ["username"], unique=True, if_not_exists=True)
+    op.create_index("ix_users_email", "users", ["email"], unique=True, if_not_exists=True)
+
+    op.create_table(
+        "questions",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("title", sa.String(200), nullable=False),
+        sa.Column("content", sa.Text(), nullable=False),
+        sa.Column("tags", sa.JSON()),
+        sa.Column("author_id", sa.Integer(), sa.ForeignKey("users.id"), nullable=False),
+        sa.Column("upvotes", sa.Integer()),
+        sa.Column("downvotes", sa.Integer()),
+        sa.Column("score", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("answer_count", sa.Integer()),
+        sa.Column("view_count", sa.Integer()),
+        sa.Column("is_closed", sa.Boolean()),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+        sa.Column("updated_at", sa.DateTime(timezone=True)),
+        if_not_exists=True,
+    )
+    op.create_index("ix_questions_id", "questions", ["id"], if_not_exists=True)
+    op.create_index("ix_questions_title", "questions", ["title"], if_not_exists=True)
+    op.create_index("ix_questions_created_at_id", "questions", ["created_at", "id"], if_not_exists=True)
+    op.create_index("ix_questions_score_id", "questions", ["score", "id"], if_not_exists=True)
+    op.create_index("ix_questions_answer_count_id", "questions", ["answer_count", "id"], if_not_exists=True)
+
+    op.create_table(
+        "answers",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("content", sa.Text(), nullable=False),
+        sa.Column("question_id", sa.Integer(), sa.ForeignKey("questions.id"), nullable=False),
+        sa.Column("author_id", sa.Integer(), sa.ForeignKey("users.id"), nullable=False),
+        sa.Column("upvotes", sa.Integer()),
+        sa.Column("downvotes", sa.Integer()),
+        sa.Column("score", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("is_verified", sa.Boolean()),
+        sa.Column("is_ai_generated", sa.Boolean()),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+        sa.Column("updated_at", sa.DateTime(timezone=True)),
+        if_not_exists=True,
+    )
+    op.create_index("ix_answers_id", "answers", ["id"], if_not_exists=True)
+    op.create_index(
+        "ix_answers_question_created_at_id", "answers", ["question_id", "created_at", "id"], if_not_exists=True
+    )
+    op.create_index("ix_answers_question_score_id", "answers", ["question_id", "score", "id"], if_not_exists=True)
+
+    op.create_table(
+        "votes",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id"), nullable=False),
+        sa.Column("question_id", sa.Integer(), sa.ForeignKey("questions.id")),
+        sa.Column("answer_id", sa.Integer(), sa.ForeignKey("answers.id")),
+        sa.Column("vote_type", sa.Integer(), nullable=False),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+        if_not_exists=True,
+    )
+    op.create_index("ix_votes_id", "votes", ["id"], if_not_exists=True)
+    for statement in DEDUPLICATE_VOTES:
+        op.execute(statement)
+    op.create_index(
+        "uq_votes_user_question", "votes", ["user_id", "question_id"], unique=True, if_not_exists=True,
+        sqlite_where=sa.text("answer_id IS NULL"), postgresql_where=sa.text("answer_id IS NULL"),
+    )
+    op.create_index(
+        "uq_votes_user_answer", "votes", ["user_id", "answer_id"], unique=True, if_not_exists=True,
+        sqlite_where=sa.text("answer_id IS NOT NULL"), postgresql_where=sa.text("answer_id IS NOT NULL"),
+    )
+
+    op.create_table(
+        "rag_sync_ledger",
+        sa.Column("corpus_name", sa.String(255), primary_key=True),
+        sa.Column("question_id", sa.Integer(), primary_key=True),
+        sa.Column("content_hash", sa.String(64), nullable=False),
+        sa.Column("rag_file_name", sa.String(255), nullable=False),
+        sa.Column("synced_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+        if_not_exists=True,
+    )
+
+
+def downgrade():
+    for table in ("rag_sync_ledger", "votes", "answers", "questions", "users"):
+        op.drop_table(table)
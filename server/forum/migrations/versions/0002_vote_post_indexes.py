@@ -0,0 +1,32 @@
+"""Index votes by the post they belong to
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-18
+
+Deleting a question or answer detaches its votes (Question.votes,
+Answer.votes), which looked them up with a full scan of votes; the unique
+vote indexes lead with user_id and cannot serve it.
+benchmarks/plan_check.py checks the plans of the endpoint queries.
+"""
+from alembic import op
+
+revision = "0002"
+down_revision = "0001"
+branch_labels = None
+depends_on = None
+
+INDEXES = [
+    ("ix_votes_question_id", "votes", ["question_id"]),
+    ("ix_votes_answer_id", "votes", ["answer_id"]),
+]
+
+
+def upgrade():
+    for name, table, columns in INDEXES:
+        op.create_index(name, table, columns, if_not_exists=True)
+
+
+def downgrade():
+    for name, table, _ in reversed(INDEXES):
+        op.drop_index(name, table_name=table, if_exists=True)
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Text, DateTime, Boolean, ForeignKey, JSON
+from sqlalchemy import Column, Integer, String, Text, DateTime, Boolean, ForeignKey, JSON, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from database import Base
@@ -31,6 +31,7 @@ class Question(Base):
     author_id = Column(Integer, ForeignKey("users.id"), nullable=False)
     upvotes = Column(Integer, default=0)
     downvotes = Column(Integer, default=0)
+    score = Column(Integer, default=0, nullable=False)  # upvotes - downvotes, stored so it can be indexed
     answer_count = Column(Integer, default=0)
     view_count = Column(Integer, default=0)
     is_closed = Column(Boolean, default=False)
@@ -41,6 +42,13 @@ class Question(Base):
     author = relationship("User", back_populates="questions")
     answers = relationship("Answer", back_populates="question", cascade="all, delete-orphan")
     votes = relationship("Vote", back_populates="question")
+    
+    # Keyset pagination indexes, one per sort mode of GET /questions
+    __table_args__ = (
+        Index("ix_questions_created_at_id", "created_at", "id"),
+        Index("ix_questions_score_id", "score", "id"),
+        Index("ix_questions_answer_count_id", "answer_count", "id"),
+    )
 
 class Answer(Base):
     __tablename__ = "answers"
@@ -51,6 +59,7 @@ class Answer(Base):
     author_id = Column(Integer, ForeignKey("users.id"), nullable=False)
     upvotes = Column(Integer, default=0)
     downvotes = Column(Integer, default=0)
+    score = Column(Integer, default=0, nullable=False)  # upvotes - downvotes, stored so it can be indexed
     is_verified = Column(Boolean, default=False)  # Verified by question author or moderator
     is_ai_generated = Column(Boolean, default=False)  # For VertexAI generated answers
     created_at = Column(DateTime(timezone=True), server_default=func.now())
@@ -60,6 +69,12 @@ class Answer(Base):
     question = relationship("Question", back_populates="answers")
     author = relationship("User", back_populates="answers")
     votes = relationship("Vote", back_populates="answer")
+    
+    # Keyset pagination indexes, one per sort mode of GET /questions/{id}/answers
+    __table_args__ = (
+        Index("ix_answers_question_created_at_id", "question_id", "created_at", "id"),
+        Index("ix_answers_question_score_id", "question_id", "score", "id"),
+    )
 
 class Vote(Base):
     __tablename__ = "votes"
@@ -74,4 +89,32 @@ class Vote(Base):
     # Relationships
     user = relationship("User", back_populates="votes")
     question = relationship("Question", back_populates="votes")
-    answer = relationship("Answer", back_populates="votes")
\ No newline at end of file
+    answer = relationship("Answer", back_populates="votes")
+    
+    # One vote per user per target. NULLs never collide in a unique index, so
+    # question votes and answer votes each get their own partial index.
+    __table_args__ = (
+        Index(
+            "uq_votes_user_question", "user_id", "question_id", unique=True,
+            sqlite_where=answer_id.is_(None), postgresql_where=answer_id.is_(None),
+        ),
+        Index(
+            "uq_votes_user_answer", "user_id", "answer_id", unique=True,
+            sqlite_where=answer_id.isnot(None), postgresql_where=answer_id.isnot(None),
+        ),
+        # Votes of one post, detached when the post is deleted
+        Index("ix_votes_question_id", "question_id"),
+        Index("ix_votes_answer_id", "answer_id"),
+    )
+
+class RAGSyncEntry(Base):
+    __tablename__ = "rag_sync_ledger"
+    
+    # One row per forum thread uploaded to a RAG corpus. question_id has no
+    # foreign key: the row has to outlive a deleted question until the sync
+    # removes its file from the corpus.
+    corpus_name = Column(String(255), primary_key=True)
+    question_id = Column(Integer, primary_key=True)
+    content_hash = Column(String(64), nullable=False)  # sha256 of the uploaded text
+    rag_file_name = Column(String(255), nullable=False)
+    synced_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
@@ -0,0 +1,69 @@
+import base64
+import binascii
+import json
+from datetime import datetime
+from typing import Any, Optional, Tuple
+
+from fastapi import HTTPException
+from sqlalchemy import DateTime, Integer, asc, desc, literal, tuple_, type_coerce
+from sqlalchemy.dialects import sqlite
+
+# Keyset (cursor) pagination.
+#
+# A cursor encodes the sort key and id of the last row on a page. The next page
+# seeks past that (sort_key, id) pair through a composite index instead of
+# counting and discarding rows with OFFSET, so every page costs the same.
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+# created_at is filled by CURRENT_TIMESTAMP, which SQLite stores without
+# microseconds; bind cursor values the same way so equal timestamps compare equal
+_SQLITE_SECONDS = sqlite.DATETIME(
+    storage_format="%(year)04d-%(month)02d-%(day)02d %(hour)02d:%(minute)02d:%(second)02d"
+)
+
+
+def encode_cursor(sort_by: str, order: str, key: Any, row_id: int) -> str:
+    if isinstance(key, datetime):
+        key = {"dt": key.isoformat()}
+    payload = json.dumps({"s": sort_by, "o": order, "k": key, "i": row_id}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, sort_by: str, order: str) -> Tuple[Any, int]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        key, row_id = payload["k"], int(payload["i"])
+        if payload["s"] != sort_by or payload["o"] != order:
+            raise ValueError("cursor was issued for a different sort")
+        if isinstance(key, dict):
+            key = datetime.fromisoformat(key["dt"])
+    except (binascii.Error, ValueError, KeyError, TypeError) as e:
+        raise HTTPException(status_code=400, detail=f"Invalid cursor: {e}")
+    return key, row_id
+
+
+def paginate(query, dialect: str, sort_column, id_column, order: str, cursor_key=None, cursor_id: Optional[int] = None):
+    """Order a query by (sort_column, id) and seek past the cursor if one is given."""
+    direction = desc if order == "desc" else asc
+    query = query.order_by(direction(sort_column), direction(id_column))
+    if cursor_id is None:
+        return query
+
+    key_column = sort_column
+    if isinstance(sort_column.type, DateTime) and dialect == "sqlite":
+        key_column = type_coerce(sort_column, _SQLITE_SECONDS)
+
+    # Row-value comparison lets both SQLite and Postgres turn the seek into an
+    # index range scan on (sort_column, id)
+    row = tuple_(key_column, id_column)
+    boundary = tuple_(literal(cursor_key, key_column.type), literal(cursor_id, Integer))
+    return query.filter(row < boundary if order == "desc" else row > boundary)
+
+
+def next_cursor(rows, sort_attr: str, sort_by: str, order: str, limit: int) -> Optional[str]:
+    if len(rows) < limit or not rows:
+        return None
+    last = rows[-1]
+    return encode_cursor(sort_by, order, getattr(last, sort_attr), last.id)
@@ -16,16 +16,24 @@ from google.auth import default
 import vertexai
 from vertexai.preview import rag
 import os
+import sys
 from dotenv import load_dotenv, set_key
 import tempfile
 import json
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy import create_engine, select
+from sqlalchemy.orm import Session, sessionmaker
 from sqlalchemy import Column, Integer, String, Text, DateTime, Boolean, ForeignKey, JSON
 from sqlalchemy.orm import relationship, declarative_base
 from sqlalchemy.sql import func
 
 from models import User, Question, Answer  # Import your SQLAlchemy models
+from database import Base, create_forum_engine
+from schema_upgrade import upgrade_schema
+from corpus_sync import shard_question_ids, sync_corpus
+
+# Corpus version markers are shared with the agent's caches
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "rag"))
+from corpus_versions import FORUM_CORPUS, bump_corpus_version
 
 # Load environment variables from .env file
 load_dotenv()
@@ -55,6 +63,9 @@ MIN_UPVOTES = int(os.getenv("MIN_UPVOTES", "0"))  # Minimum upvotes for question
 INCLUDE_VERIFIED_ONLY = os.getenv("INCLUDE_VERIFIED_ONLY", "false").lower() == "true"
 EXCLUDE_AI_GENERATED = os.getenv("EXCLUDE_AI_GENERATED", "true").lower() == "true"
 
+# Rows fetched per round trip while streaming the export
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", "1000"))
+
 def initialize_vertex_ai():
     """Initialize Vertex AI with credentials and project settings."""
     credentials, project = default()
@@ -65,7 +76,10 @@ def initialize_vertex_ai():
 
 def create_database_connection():
     """Create database connection and session."""
-    engine = create_engine(DATABASE_URL)
+    engine = create_forum_engine(DATABASE_URL)
+    # Same schema the API brings up at startup, including the sync ledger
+    Base.metadata.create_all(bind=engine)
+    upgrade_schema(engine)
     SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
     return SessionLocal()
 
@@ -94,67 +108,102 @@ def create_or_get_forum_corpus():
     
     return corpus
 
-def fetch_qa_data(db_session):
-    """Fetch questions and answers from the database with filtering."""
-    print("Fetching questions and answers from database...")
+def _question_filters(question_ids=None):
+    """Filters a question must pass for its thread to be exported."""
+    filters = [Question.is_closed == False]  # Don't include closed questions
+    if MIN_UPVOTES > 0:
+        filters.append(Question.upvotes >= MIN_UPVOTES)
+    if question_ids is not None:
+        filters.append(Question.id.in_(question_ids))
+    return filters
+
+def _answer_filters():
+    filters = []
+    if MIN_UPVOTES > 0:
+        filters.append(Answer.upvotes >= MIN_UPVOTES)
+    if INCLUDE_VERIFIED_ONLY:
+        filters.append(Answer.is_verified == True)
+    if EXCLUDE_AI_GENERATED:
+        filters.append(Answer.is_ai_generated == False)
+    return filters
+
+def fetch_qa_data(db_session, question_ids=None):
+    """Stream filtered Q&A threads from the database, one qa_item at a time.
     
-    # Build query with filters
-    query = db_session.query(Question).join(User, Question.author_id == User.id)
+    Questions and their qualifying answers are read by two queries, both
+    ordered by question id and fetched in batches of EXPORT_BATCH_SIZE rows
+    (server-side cursors where the driver supports them), then merged. Only
+    one thread is held in memory at a time, however large the forum is.
+    """
+    print("Fetching questions and answers from database...")
     
-    # Apply filters
-    if MIN_UPVOTES > 0:
-        query = query.filter(Question.upvotes >= MIN_UPVOTES)
+    question_filters = _question_filters(question_ids)
     
-    # Don't include closed questions
-    query = query.filter(Question.is_closed == False)
+    # Questions with their author, as plain rows rather than ORM objects
+    question_rows = db_session.execute(
+        select(
+            Question.id, Question.title, Question.content, Question.tags,
+            Question.upvotes, Question.created_at, User.username,
+        )
+        .join(User, Question.author_id == User.id)
+        .where(*question_filters)
+        .order_by(Question.id)
+        .execution_options(yield_per=EXPORT_BATCH_SIZE)
+    )
     
-    questions = query.all()
+    # Every qualifying answer of those questions, with its author, in question order
+    answer_rows = db_session.execute(
+        select(
+            Answer.question_id, Answer.id, Answer.content, Answer.upvotes,
+            Answer.is_verified, Answer.created_at, User.username,
+        )
+        .join(Question, Answer.question_id == Question.id)
+        .join(User, Answer.author_id == User.id)
+        .where(*question_filters, *_answer_filters())
+        .order_by(Answer.question_id, Answer.id)
+        .execution_options(yield_per=EXPORT_BATCH_SIZE)
+    )
     
-    qa_data = []
+    exported = 0
+    answers = iter(answer_rows)
+    answer = next(answers, None)
     
-    for question in questions:
-        # Get answers for this question
-        answer_query = db_session.query(Answer).filter(Answer.question_id == question.id)
-        
-        # Apply answer filters
-        if MIN_UPVOTES > 0:
-            answer_query = answer_query.filter(Answer.upvotes >= MIN_UPVOTES)
-        
-        if INCLUDE_VERIFIED_ONLY:
-            answer_query = answer_query.filter(Answer.is_verified == True)
-        
-        if EXCLUDE_AI_GENERATED:
-            answer_query = answer_query.filter(Answer.is_ai_generated == False)
-        
-        answers = answer_query.all()
-        
-        # Only include questions that have at least one answer meeting criteria
-        if answers:
-            qa_item = {
-                'question_id': question.id,
-                'question_title': question.title,
-                'question_content': question.content,
-                'question_tags': question.tags or [],
-                'question_upvotes': question.upvotes,
-                'question_author': question.author.username,
-                'question_created_at': question.created_at.isoformat() if question.created_at else None,
-                'answers': []
-            }
+    try:
+        for question in question_rows:
+            # Answers of questions without an author row have nothing to join to
+            while answer is not None and answer.question_id < question.id:
+                answer = next(answers, None)
             
-            for answer in answers:
-                qa_item['answers'].append({
+            qa_answers = []
+            while answer is not None and answer.question_id == question.id:
+                qa_answers.append({
                     'answer_id': answer.id,
                     'answer_content': answer.content,
                     'answer_upvotes': answer.upvotes,
-                    'answer_author': answer.author.username,
+                    'answer_author': answer.username,
                     'is_verified': answer.is_verified,
                     'answer_created_at': answer.created_at.isoformat() if answer.created_at else None
                 })
+                answer = next(answers, None)
             
-            qa_data.append(qa_item)
+            # Only include questions that have at least one answer meeting criteria
+            if qa_answers:
+                exported += 1
+                yield {
+                    'question_id': question.id,
+                    'question_title': question.title,
+                    'question_content': question.content,
+                    'question_tags': question.tags or [],
+                    'question_upvotes': question.upvotes,
+                    'question_author': question.username,
+                    'question_created_at': question.created_at.isoformat() if question.created_at else None,
+                    'answers': qa_answers
+                }
+    finally:
+        question_rows.close()
+        answer_rows.close()
     
-    print(f"Fetched {len(qa_data)} questions with answers")
-    return qa_data
+    print(f"Fetched {exported} questions with answers")
 
 def format_qa_as_text(qa_item):
     """Format a question-answer pair as structured text for RAG."""
@@ -188,51 +237,58 @@ def format_qa_as_text(qa_item):
     
     return text
 
-def upload_qa_to_corpus(corpus_name, qa_data):
-    """Upload question-answer pairs to the corpus as text files."""
-    print(f"Uploading {len(qa_data)} Q&A pairs to corpus...")
+def upload_shard_file(corpus_name, spool_dir, shard, bundle_text):
+    """Upload one packed shard of Q&A threads and return the name of the new RAG file."""
+    question_ids = shard.question_ids
+    shard_path = os.path.join(spool_dir, f"forum-shard-{shard.shard_id}.txt")
+    with open(shard_path, 'w', encoding='utf-8') as shard_file:
+        shard_file.write(bundle_text)
     
-    uploaded_count = 0
-    failed_count = 0
-    
-    for qa_item in qa_data:
-        try:
-            # Format the Q&A as text
-            qa_text = format_qa_as_text(qa_item)
-            
-            # Create a temporary text file
-            with tempfile.NamedTemporaryFile(mode='w', suffix='.txt', delete=False, encoding='utf-8') as temp_file:
-                temp_file.write(qa_text)
-                temp_file_path = temp_file.name
-            
-            try:
-                # Create display name and description
-                display_name = f"Forum: Q{qa_item['question_id']}: {qa_item['question_title'][:50]}..."
-                description = f"Forum Q&A - Question ID: {qa_item['question_id']}, Answers: {len(qa_item['answers'])}"
-                
-                # Upload to corpus
-                rag_file = rag.upload_file(
-                    corpus_name=corpus_name,
-                    path=temp_file_path,
-                    display_name=display_name,
-                    description=description,
-                )
-                
-                uploaded_count += 1
-                if uploaded_count % 10 == 0:
-                    print(f"Uploaded {uploaded_count} Q&A pairs...")
-                
-            finally:
-                # Clean up temporary file
-                os.unlink(temp_file_path)
-                
-        except Exception as e:
-            print(f"Error uploading Q&A {qa_item['question_id']}: {e}")
-            failed_count += 1
-            continue
+    try:
+        # Create display name and description
+        display_name = f"Forum shard {shard.shard_id}: Q{question_ids[0]}-Q{question_ids[-1]}"
+        description = f"Forum Q&A - {len(question_ids)} threads, question IDs {question_ids[0]} to {question_ids[-1]}"
+        
+        # Upload to corpus
+        rag_file = rag.upload_file(
+            corpus_name=corpus_name,
+            path=shard_path,
+            display_name=display_name,
+            description=description,
+        )
+        return rag_file.name
+    finally:
+        os.unlink(shard_path)
+
+def delete_corpus_file(rag_file_name):
+    """Delete one file from its corpus."""
+    rag.delete_file(name=rag_file_name)
+
+def sync_forum_corpus(db_session, corpus_name, question_ids=None, limit=None):
+    """Upload new and changed shards of threads and delete stale ones, using the sync ledger."""
+    # A shard is rebuilt from all of its threads, so widen the scope to whole shards
+    if question_ids is not None:
+        question_ids = shard_question_ids(question_ids)
     
-    print(f"Upload complete. Successfully uploaded: {uploaded_count}, Failed: {failed_count}")
-    return uploaded_count, failed_count
+    # The export streams on its own connection: the sync commits the ledger
+    # after every shard, which would close a cursor shared with it. Shards are
+    # written to one spool directory for the duration of the run.
+    with Session(bind=db_session.get_bind()) as export_session, \
+            tempfile.TemporaryDirectory(prefix="forum_shards_") as spool_dir:
+        report = sync_corpus(
+            db_session,
+            corpus_name,
+            fetch_qa_data(export_session, question_ids),
+            format_text=format_qa_as_text,
+            upload=lambda shard, bundle_text: upload_shard_file(corpus_name, spool_dir, shard, bundle_text),
+            delete=delete_corpus_file,
+            question_ids=question_ids,
+            limit=limit,
+        )
+    # Answers and retrievals cached against the old contents are now stale
+    if report.files_uploaded or report.files_deleted:
+        bump_corpus_version(FORUM_CORPUS)
+    return report
 
 def update_env_file(corpus_name, env_file_path):
     """Updates the .env file with the forum corpus name."""
@@ -269,23 +325,19 @@ def main():
         # Update environment file
         update_env_file(corpus.name, ENV_FILE_PATH)
         
-        # Fetch Q&A data from database
-        qa_data = fetch_qa_data(db_session)
-        
-        if not qa_data:
-            print("No Q&A data found matching the criteria. Exiting.")
-            return
-        
-        # Upload to corpus
-        uploaded_count, failed_count = upload_qa_to_corpus(corpus.name, qa_data)
+        # Upload new and changed Q&A threads, delete stale ones
+        report = sync_forum_corpus(db_session, corpus.name)
         
         # List corpus contents
         list_corpus_files(corpus_name=corpus.name)
         
         print(f"\nProcess completed successfully!")
-        print(f"- Total Q&A pairs processed: {len(qa_data)}")
-        print(f"- Successfully uploaded: {uploaded_count}")
-        print(f"- Failed uploads: {failed_count}")
+        print(f"- New Q&A threads uploaded: {report.uploaded}")
+        print(f"- Changed Q&A threads re-uploaded: {report.updated}")
+        print(f"- Unchanged Q&A threads: {report.unchanged}")
+        print(f"- Stale Q&A threads deleted: {report.deleted}")
+        print(f"- Failed: {report.failed}")
+        print(f"- Shard files uploaded: {report.files_uploaded}, deleted: {report.files_deleted}")
         print(f"- Corpus name: {corpus.name}")
         
     except Exception as e:
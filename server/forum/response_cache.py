@@ -0,0 +1,111 @@
+import hashlib
+import threading
+from typing import Awaitable, Callable, Dict, Optional, Tuple
+
+from cachetools import TTLCache
+from decouple import config
+from fastapi import Request, Response
+
+# Server-side cache for the read endpoints the mobile app polls.
+#
+# Rendered response bodies are cached under (path, query string, version),
+# where the version is a write counter: one for the whole forum, used by the
+# question list, and one per question, used by a question and its answers.
+# Writes bump the counters, so stale entries are simply never looked up again
+# and age out of the LRU. Every body gets a strong ETag, and a request whose
+# If-None-Match matches is answered with an empty 304.
+#
+# Counters live in this process. With several workers, a worker only sees
+# its own writes until RESPONSE_CACHE_TTL_SECONDS expires the entry.
+
+RESPONSE_CACHE_SIZE = config("RESPONSE_CACHE_SIZE", default=2048, cast=int)
+RESPONSE_CACHE_TTL_SECONDS = config("RESPONSE_CACHE_TTL_SECONDS", default=60, cast=int)
+
+CachedBody = Tuple[bytes, str, Dict[str, str]]  # body, etag, extra headers
+
+
+class ResponseCache:
+    def __init__(self, maxsize: int, ttl: int):
+        self._entries = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._lock = threading.Lock()
+        self._forum_version = 0
+        self._question_versions: Dict[int, int] = {}
+        self.hits = 0
+        self.misses = 0
+        self.not_modified = 0
+
+    # Write counters
+    def forum_version(self) -> Tuple:
+        with self._lock:
+            return ("forum", self._forum_version)
+
+    def question_version(self, question_id: int) -> Tuple:
+        with self._lock:
+            return ("question", question_id, self._question_versions.get(question_id, 0))
+
+    def invalidate_forum(self):
+        with self._lock:
+            self._forum_version += 1
+
+    def invalidate_question(self, question_id: int):
+        """A question, its answers or their votes changed; lists change with them."""
+        with self._lock:
+            self._question_versions[question_id] = self._question_versions.get(question_id, 0) + 1
+            self._forum_version += 1
+
+    # Responses
+    async def respond(
+        self,
+        request: Request,
+        version: Tuple,
+        render: Callable[[], Awaitable[Tuple[bytes, Dict[str, str]]]],
+    ) -> Response:
+        """Serve a GET from cache, or render it, cache it and serve it.
+
+        version must be read before rendering, so the cached body is never
+        older than the version it is stored under.
+        """
+        key = (request.url.path, str(request.query_params), version)
+        with self._lock:
+            cached: Optional[CachedBody] = self._entries.get(key)
+            if cached is not None:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+        if cached is None:
+            body, headers = await render()
+            etag = '"%s"' % hashlib.sha256(body).hexdigest()[:32]
+            cached = (body, etag, headers)
+            with self._lock:
+                self._entries[key] = cached
+
+        body, etag, headers = cached
+        headers = {**headers, "ETag": etag, "Cache-Control": "no-cache"}
+        if etag_matches(request.headers.get("if-none-match"), etag):
+            with self._lock:
+                self.not_modified += 1
+            return Response(status_code=304, headers=headers)
+        return Response(content=body, media_type="application/json", headers=headers)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "not_modified": self.not_modified,
+                "forum_version": self._forum_version,
+            }
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    candidates = [value.strip() for value in if_none_match.split(",")]
+    return "*" in candidates or etag in candidates or f"W/{etag}" in candidates
+
+
+response_cache = ResponseCache(RESPONSE_CACHE_SIZE, RESPONSE_CACHE_TTL_SECONDS)
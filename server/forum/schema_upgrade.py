@@ -0,0 +1,53 @@
+from sqlalchemy import inspect, text
+from sqlalchemy.engine import Engine
+
+from database import Base
+
+# create_all() only creates missing tables, so databases created by an older
+# release need the columns and indexes added since then applied in place.
+
+# (table, column, column DDL, backfill statement)
+ADDED_COLUMNS = [
+    (
+        "questions", "score", "INTEGER NOT NULL DEFAULT 0",
+        "UPDATE questions SET score = coalesce(upvotes, 0) - coalesce(downvotes, 0)",
+    ),
+    (
+        "answers", "score", "INTEGER NOT NULL DEFAULT 0",
+        "UPDATE answers SET score = coalesce(upvotes, 0) - coalesce(downvotes, 0)",
+    ),
+]
+
+# Statements that must run before an index can be created on old data:
+# duplicate votes from before the unique vote indexes keep only the latest row
+INDEX_PREREQUISITES = {
+    "uq_votes_user_question": (
+        "DELETE FROM votes WHERE answer_id IS NULL AND id NOT IN "
+        "(SELECT max(id) FROM votes WHERE answer_id IS NULL GROUP BY user_id, question_id)"
+    ),
+    "uq_votes_user_answer": (
+        "DELETE FROM votes WHERE answer_id IS NOT NULL AND id NOT IN "
+        "(SELECT max(id) FROM votes WHERE answer_id IS NOT NULL GROUP BY user_id, answer_id)"
+    ),
+}
+
+
+def upgrade_schema(engine: Engine):
+    """Bring an existing database up to the current models. Safe to run on every start."""
+    inspector = inspect(engine)
+    with engine.begin() as conn:
+        for table, column, ddl, backfill in ADDED_COLUMNS:
+            existing = {c["name"] for c in inspector.get_columns(table)}
+            if column not in existing:
+                conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {column} {ddl}"))
+                conn.execute(text(backfill))
+                print(f"Added column {table}.{column}")
+
+        for table in Base.metadata.sorted_tables:
+            existing_indexes = {i["name"] for i in inspector.get_indexes(table.name)}
+            for index in table.indexes:
+                if index.name in existing_indexes:
+                    continue
+                if index.name in INDEX_PREREQUISITES:
+                    conn.execute(text(INDEX_PREREQUISITES[index.name]))
+                index.create(conn)
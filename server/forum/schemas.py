@@ -94,10 +94,22 @@ class VoteResponse(BaseModel):
         from_attributes = True
 
 # Search schemas
+class QuestionSearchResult(QuestionResponse):
+    rank: float = 0.0
+    snippet: Optional[str] = None
+
+class AnswerSearchResult(AnswerResponse):
+    rank: float = 0.0
+    snippet: Optional[str] = None
+
+class SimilarQuestion(QuestionResponse):
+    similarity: float = 0.0
+    likely_duplicate: bool = False
+
 class SearchResponse(BaseModel):
     query: str
-    questions: List[QuestionResponse]
-    answers: List[AnswerResponse]
+    questions: List[QuestionSearchResult]
+    answers: List[AnswerSearchResult]
     total_results: int
 
 
@@ -113,7 +125,19 @@ class RAGQueryResponse(BaseModel):
 
 class RAGSyncRequest(BaseModel):
     question_ids: Optional[List[int]] = None  # If None, sync all questions
-    limit: Optional[int] = 100
+    limit: Optional[int] = 100  # Most shard files uploaded per run; the rest wait for the next sync
+
+class RAGSyncResponse(BaseModel):
+    corpus_name: str
+    uploaded: int
+    updated: int
+    unchanged: int
+    deleted: int
+    deferred: int
+    failed: int
+    files_uploaded: int
+    files_deleted: int
+    errors: List[str] = []
 
 class RAGStatsResponse(BaseModel):
     total_files: int
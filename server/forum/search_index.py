@@ -0,0 +1,234 @@
+from dataclasses import dataclass
+from typing import List, Optional
+import re
+
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+
+# Full-text search index for the forum.
+#
+# SQLite uses FTS5 external-content tables (questions_fts, answers_fts) kept in
+# sync with the base tables by triggers, ranked with bm25(). Postgres uses a
+# generated tsvector column with a GIN index, ranked with ts_rank_cd(). Any
+# other dialect falls back to the LIKE scan the endpoint used originally.
+
+SNIPPET_OPEN = "<b>"
+SNIPPET_CLOSE = "</b>"
+SNIPPET_ELLIPSIS = "..."
+SNIPPET_TOKENS = 16
+
+# Column weights: a hit in the title counts more than one in the body or tags
+QUESTION_BM25_WEIGHTS = (10.0, 4.0, 2.0)  # title, content, tags
+
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+_SQLITE_SETUP = [
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS questions_fts USING fts5(
+        title, content, tags,
+        content='questions', content_rowid='id',
+        tokenize='porter unicode61'
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS questions_fts_ai AFTER INSERT ON questions BEGIN
+        INSERT INTO questions_fts(rowid, title, content, tags)
+        VALUES (new.id, new.title, new.content, new.tags);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS questions_fts_ad AFTER DELETE ON questions BEGIN
+        INSERT INTO questions_fts(questions_fts, rowid, title, content, tags)
+        VALUES ('delete', old.id, old.title, old.content, old.tags);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS questions_fts_au AFTER UPDATE OF title, content, tags ON questions BEGIN
+        INSERT INTO questions_fts(questions_fts, rowid, title, content, tags)
+        VALUES ('delete', old.id, old.title, old.content, old.tags);
+        INSERT INTO questions_fts(rowid, title, content, tags)
+        VALUES (new.id, new.title, new.content, new.tags);
+    END
+    """,
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS answers_fts USING fts5(
+        content,
+        content='answers', content_rowid='id',
+        tokenize='porter unicode61'
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS answers_fts_ai AFTER INSERT ON answers BEGIN
+        INSERT INTO answers_fts(rowid, content) VALUES (new.id, new.content);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS answers_fts_ad AFTER DELETE ON answers BEGIN
+        INSERT INTO answers_fts(answers_fts, rowid, content) VALUES ('delete', old.id, old.content);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS answers_fts_au AFTER UPDATE OF content ON answers BEGIN
+        INSERT INTO answers_fts(answers_fts, rowid, content) VALUES ('delete', old.id, old.content);
+        INSERT INTO answers_fts(rowid, content) VALUES (new.id, new.content);
+    END
+    """,
+]
+
+# Generated columns keep the vectors current on every insert/update without
+# application code; deletes drop the row and its index entry together.
+_POSTGRES_SETUP = [
+    """
+    ALTER TABLE questions ADD COLUMN IF NOT EXISTS search_vector tsvector
+    GENERATED ALWAYS AS (
+        setweight(to_tsvector('english', coalesce(title, '')), 'A') ||
+        setweight(to_tsvector('english', coalesce(content, '')), 'B') ||
+        setweight(to_tsvector('english', coalesce(tags::text, '')), 'C')
+    ) STORED
+    """,
+    "CREATE INDEX IF NOT EXISTS ix_questions_search_vector ON questions USING GIN (search_vector)",
+    """
+    ALTER TABLE answers ADD COLUMN IF NOT EXISTS search_vector tsvector
+    GENERATED ALWAYS AS (to_tsvector('english', coalesce(content, ''))) STORED
+    """,
+    "CREATE INDEX IF NOT EXISTS ix_answers_search_vector ON answers USING GIN (search_vector)",
+]
+
+
+@dataclass
+class SearchHit:
+    id: int
+    rank: float
+    snippet: Optional[str]
+
+
+def ensure_search_index(engine: Engine):
+    """Create the full-text index for the engine's dialect if it is missing."""
+    dialect = engine.dialect.name
+    with engine.begin() as conn:
+        if dialect == "sqlite":
+            existing = conn.execute(
+                text("SELECT name FROM sqlite_master WHERE name IN ('questions_fts', 'answers_fts')")
+            ).scalars().all()
+            for statement in _SQLITE_SETUP:
+                conn.execute(text(statement))
+            # Index rows that were written before the FTS tables existed
+            if "questions_fts" not in existing:
+                conn.execute(text("INSERT INTO questions_fts(questions_fts) VALUES ('rebuild')"))
+            if "answers_fts" not in existing:
+                conn.execute(text("INSERT INTO answers_fts(answers_fts) VALUES ('rebuild')"))
+        elif dialect == "postgresql":
+            for statement in _POSTGRES_SETUP:
+                conn.execute(text(statement))
+
+
+def supports_full_text(dialect: str) -> bool:
+    return dialect in ("sqlite", "postgresql")
+
+
+def build_fts5_query(q: str) -> Optional[str]:
+    """Turn free text into a safe FTS5 MATCH expression.
+
+    Every word is quoted so user input can never be parsed as FTS5 syntax,
+    and the last word is a prefix match so partially typed queries still hit.
+    """
+    tokens = _TOKEN_RE.findall(q)
+    if not tokens:
+        return None
+    terms = ['"%s"' % token for token in tokens]
+    terms[-1] += "*"
+    return " ".join(terms)
+
+
+def search_question_ids(db, q: str, skip: int, limit: int) -> List[SearchHit]:
+    dialect = db.get_bind().dialect.name
+    if dialect == "sqlite":
+        match = build_fts5_query(q)
+        if match is None:
+            return []
+        # bm25() is lower-is-better; negate it so higher rank means more relevant
+        rows = db.execute(
+            text(
+                "SELECT rowid AS id, -bm25(questions_fts, :w_title, :w_content, :w_tags) AS rank, "
+                "snippet(questions_fts, -1, :open, :close, :ellipsis, :tokens) AS snippet "
+                "FROM questions_fts WHERE questions_fts MATCH :match "
+                "ORDER BY bm25(questions_fts, :w_title, :w_content, :w_tags) "
+                "LIMIT :limit OFFSET :skip"
+            ),
+            {
+                "match": match,
+                "w_title": QUESTION_BM25_WEIGHTS[0],
+                "w_content": QUESTION_BM25_WEIGHTS[1],
+                "w_tags": QUESTION_BM25_WEIGHTS[2],
+                **_snippet_params(),
+                "limit": limit,
+                "skip": skip,
+            },
+        )
+    else:
+        # ts_headline is expensive, so it only runs over the page being returned
+        rows = db.execute(
+            text(
+                "SELECT page.id, page.rank, "
+                "ts_headline('english', page.content, page.query, :headline) AS snippet "
+                "FROM ("
+                "  SELECT questions.id, questions.content, query, "
+                "  ts_rank_cd(questions.search_vector, query) AS rank "
+                "  FROM questions, websearch_to_tsquery('english', :q) AS query "
+                "  WHERE questions.search_vector @@ query "
+                "  ORDER BY rank DESC, questions.id DESC LIMIT :limit OFFSET :skip"
+                ") AS page ORDER BY page.rank DESC, page.id DESC"
+            ),
+            {"q": q, "headline": _headline_options(), "limit": limit, "skip": skip},
+        )
+    return [SearchHit(id=row.id, rank=float(row.rank), snippet=row.snippet) for row in rows]
+
+
+def search_answer_ids(db, q: str, skip: int, limit: int) -> List[SearchHit]:
+    dialect = db.get_bind().dialect.name
+    if dialect == "sqlite":
+        match = build_fts5_query(q)
+        if match is None:
+            return []
+        rows = db.execute(
+            text(
+                "SELECT rowid AS id, -bm25(answers_fts) AS rank, "
+                "snippet(answers_fts, 0, :open, :close, :ellipsis, :tokens) AS snippet "
+                "FROM answers_fts WHERE answers_fts MATCH :match "
+                "ORDER BY bm25(answers_fts) LIMIT :limit OFFSET :skip"
+            ),
+            {"match": match, **_snippet_params(), "limit": limit, "skip": skip},
+        )
+    else:
+        rows = db.execute(
+            text(
+                "SELECT page.id, page.rank, "
+                "ts_headline('english', page.content, page.query, :headline) AS snippet "
+                "FROM ("
+                "  SELECT answers.id, answers.content, query, "
+                "  ts_rank_cd(answers.search_vector, query) AS rank "
+                "  FROM answers, websearch_to_tsquery('english', :q) AS query "
+                "  WHERE answers.search_vector @@ query "
+                "  ORDER BY rank DESC, answers.id DESC LIMIT :limit OFFSET :skip"
+                ") AS page ORDER BY page.rank DESC, page.id DESC"
+            ),
+            {"q": q, "headline": _headline_options(), "limit": limit, "skip": skip},
+        )
+    return [SearchHit(id=row.id, rank=float(row.rank), snippet=row.snippet) for row in rows]
+
+
+def _snippet_params():
+    return {
+        "open": SNIPPET_OPEN,
+        "close": SNIPPET_CLOSE,
+        "ellipsis": SNIPPET_ELLIPSIS,
+        "tokens": SNIPPET_TOKENS,
+    }
+
+
+def _headline_options():
+    return (
+        f"StartSel={SNIPPET_OPEN}, StopSel={SNIPPET_CLOSE}, "
+        f"FragmentDelimiter={SNIPPET_ELLIPSIS}, MaxFragments=1, "
+        f"MaxWords={SNIPPET_TOKENS}, MinWords=5"
+    )
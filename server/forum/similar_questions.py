@@ -0,0 +1,284 @@
+import itertools
+import os
+import sys
+import threading
+import time
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+import numpy as np
+from decouple import config
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from models import Question
+
+# The offline embedder and int8 quantisation are shared with the agent's
+# local retrieval index; server/ goes on the path to import them from rag
+SERVER_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if SERVER_DIR not in sys.path:
+    sys.path.append(SERVER_DIR)
+from rag.embeddings import HashingEmbedder
+from rag.vector_index import quantize
+
+# In-memory index of question embeddings for duplicate detection.
+#
+# Every question is embedded from its title and content with the hashing
+# embedder (no model, no network), the title weighted up since near-duplicate
+# posts mostly share it, and stored as an int8 row with one float32 scale:
+# 256 bytes per question at the default dimension. A lookup scores the query
+# against every row, which takes a few milliseconds for tens of thousands
+# of questions.
+#
+# The index is built from the database once, in the background at startup,
+# with IDF weights fitted on the questions of that moment. Afterwards the
+# question endpoints of this process update it as they commit. Writes made
+# while the build runs are replayed on top of it. With several workers, a
+# worker picks up questions created by the others (ids above the highest it
+# has seen) at most every SIMILAR_QUESTIONS_REFRESH_SECONDS; their edits and
+# deletes reach it on restart, and deleted questions are dropped from results
+# when the page is loaded. Until the build finishes, lookups return nothing
+# rather than wait for it.
+
+SIMILAR_QUESTIONS_DIM = config("SIMILAR_QUESTIONS_DIM", default=256, cast=int)
+SIMILAR_QUESTIONS_LIMIT = config("SIMILAR_QUESTIONS_LIMIT", default=5, cast=int)
+SIMILAR_QUESTIONS_MIN_SIMILARITY = config("SIMILAR_QUESTIONS_MIN_SIMILARITY", default=0.3, cast=float)
+# Matches at or above this are flagged as likely duplicates of a new post
+SIMILAR_QUESTIONS_DUPLICATE_THRESHOLD = config("SIMILAR_QUESTIONS_DUPLICATE_THRESHOLD", default=0.75, cast=float)
+SIMILAR_QUESTIONS_REFRESH_SECONDS = config("SIMILAR_QUESTIONS_REFRESH_SECONDS", default=30, cast=int)
+
+TITLE_WEIGHT = 2.0
+LOAD_BATCH_SIZE = 2000
+SEARCH_BLOCK_ROWS = 1024  # rows dequantised at a time, small enough to stay in cache
+
+
+@dataclass
+class SimilarHit:
+    id: int
+    similarity: float
+
+
+class SimilarQuestionIndex:
+    def __init__(self, dim: int = SIMILAR_QUESTIONS_DIM):
+        self.embedder = HashingEmbedder(dim=dim)
+        self._lock = threading.Lock()
+        self._load_lock = threading.Lock()
+        self._vectors = np.zeros((0, dim), dtype=np.int8)
+        self._scales = np.zeros(0, dtype=np.float32)
+        self._ids = np.zeros(0, dtype=np.int64)
+        self._count = 0
+        self._rows: Dict[int, int] = {}  # question id -> row
+        self._max_id = 0
+        # Writes made while a build runs, as (question id, title, content), or
+        # (question id, None, None) for a removal; None when writes go live
+        self._pending: Optional[list] = None
+        self._refreshed_at = 0.0
+        self.loaded = False
+        self.searches = 0
+        self.load_seconds = 0.0
+
+    def embed(self, titles: List[str], contents: List[str]) -> np.ndarray:
+        vectors = TITLE_WEIGHT * self.embedder.embed(titles) + self.embedder.embed(contents)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return vectors / norms
+
+    # Building
+    def ensure_loaded(self, db: Session):
+        if self.loaded:
+            return
+        with self._load_lock:
+            if not self.loaded:
+                self._load(db)
+
+    def _load(self, db: Session):
+        started = time.perf_counter()
+        with self._lock:
+            self._pending = []
+        # Two streamed passes, LOAD_BATCH_SIZE questions in memory at a time:
+        # fit the IDF weights on every question, then embed them batch by batch
+        self.embedder.fit_idf(f"{title} {content}" for _, title, content in self._all_questions(db))
+
+        capacity = db.query(func.count(Question.id)).scalar()
+        vectors = np.zeros((capacity, self.embedder.dim), dtype=np.int8)
+        scales = np.zeros(capacity, dtype=np.float32)
+        ids = np.zeros(capacity, dtype=np.int64)
+        count = 0
+        rows = iter(self._all_questions(db))
+        while True:
+            batch = list(itertools.islice(rows, LOAD_BATCH_SIZE))
+            if not batch:
+                break
+            if count + len(batch) > len(ids):
+                # Questions posted since the count; they are also queued in _pending
+                extra = count + len(batch) - len(ids)
+                vectors = np.concatenate([vectors, np.zeros((extra, self.embedder.dim), dtype=np.int8)])
+                scales = np.concatenate([scales, np.zeros(extra, dtype=np.float32)])
+                ids = np.concatenate([ids, np.zeros(extra, dtype=np.int64)])
+            embedded = self.embed([title for _, title, _ in batch], [content for _, _, content in batch])
+            vectors[count:count + len(batch)], scales[count:count + len(batch)] = quantize(embedded)
+            ids[count:count + len(batch)] = [question_id for question_id, _, _ in batch]
+            count += len(batch)
+
+        with self._lock:
+            self._vectors, self._scales, self._ids = vectors, scales, ids
+            self._count = count
+            self._rows = {int(question_id): row for row, question_id in enumerate(ids[:count])}
+            self._max_id = int(ids[count - 1]) if count else 0
+            queued, self._pending = self._pending, []
+        self._replay(queued)
+
+        self._refreshed_at = time.monotonic()
+        self.loaded = True
+        self.load_seconds = time.perf_counter() - started
+        print(f"Similar-question index: {count} questions in {self.load_seconds:.1f}s")
+
+    def _all_questions(self, db: Session):
+        return (
+            db.query(Question.id, Question.title, Question.content)
+            .order_by(Question.id)
+            .yield_per(LOAD_BATCH_SIZE)
+        )
+
+    def _replay(self, queued: list):
+        # Queued writes are embedded outside the lock and applied in order under
+        # it. Writes keep queueing until the queue is found empty under the lock,
+        # so a live write never lands before an older queued one.
+        while True:
+            embedded = [
+                (question_id, quantize(self.embed([title], [content])) if title is not None else None)
+                for question_id, title, content in queued
+            ]
+            with self._lock:
+                for question_id, quantized in embedded:
+                    if quantized is None:
+                        self._drop_row(question_id)
+                    else:
+                        self._set_row(question_id, quantized[0][0], quantized[1][0])
+                if not self._pending:
+                    self._pending = None
+                    return
+                queued, self._pending = self._pending, []
+
+    def load_in_background(self, session_factory):
+        def load():
+            with session_factory() as db:
+                self.ensure_loaded(db)
+
+        threading.Thread(target=load, daemon=True).start()
+
+    def new_questions(self, db: Session) -> list:
+        """Questions other workers created since the last refresh, once a refresh is due."""
+        if time.monotonic() - self._refreshed_at < SIMILAR_QUESTIONS_REFRESH_SECONDS:
+            return []
+        self._refreshed_at = time.monotonic()
+        return db.query(Question.id, Question.title, Question.content).filter(Question.id > self._max_id).all()
+
+    def catch_up(self, rows: list):
+        """Add the questions new_questions returned; needs no database session."""
+        for question_id, title, content in rows:
+            self.upsert(question_id, title, content)
+
+    # Incremental updates
+    def upsert(self, question_id: int, title: str, content: str):
+        with self._lock:
+            if self._pending is not None:
+                self._pending.append((question_id, title, content))
+                return
+        vector, scale = quantize(self.embed([title], [content]))
+        with self._lock:
+            if self._pending is not None:
+                self._pending.append((question_id, title, content))
+                return
+            self._set_row(question_id, vector[0], scale[0])
+
+    def remove(self, question_id: int):
+        with self._lock:
+            if self._pending is not None:
+                self._pending.append((question_id, None, None))
+                return
+            self._drop_row(question_id)
+
+    # Row changes; the caller holds _lock
+    def _set_row(self, question_id: int, vector: np.ndarray, scale: float):
+        row = self._rows.get(question_id)
+        if row is None:
+            row = self._count
+            self._grow(row + 1)
+            self._rows[question_id] = row
+            self._ids[row] = question_id
+            self._count += 1
+        self._vectors[row] = vector
+        self._scales[row] = scale
+        self._max_id = max(self._max_id, question_id)
+
+    def _drop_row(self, question_id: int):
+        row = self._rows.pop(question_id, None)
+        if row is None:
+            return
+        # Move the last row into the hole so rows stay contiguous
+        last = self._count - 1
+        if row != last:
+            moved_id = int(self._ids[last])
+            self._vectors[row] = self._vectors[last]
+            self._scales[row] = self._scales[last]
+            self._ids[row] = moved_id
+            self._rows[moved_id] = row
+        self._count = last
+
+    def _grow(self, size: int):
+        if size <= len(self._ids):
+            return
+        capacity = max(size, 2 * len(self._ids), 64)
+        vectors = np.zeros((capacity, self.embedder.dim), dtype=np.int8)
+        scales = np.zeros(capacity, dtype=np.float32)
+        ids = np.zeros(capacity, dtype=np.int64)
+        vectors[:self._count] = self._vectors[:self._count]
+        scales[:self._count] = self._scales[:self._count]
+        ids[:self._count] = self._ids[:self._count]
+        self._vectors, self._scales, self._ids = vectors, scales, ids
+
+    # Lookups
+    def search(
+        self,
+        title: str,
+        content: str = "",
+        limit: int = SIMILAR_QUESTIONS_LIMIT,
+        min_similarity: float = SIMILAR_QUESTIONS_MIN_SIMILARITY,
+        exclude_id: Optional[int] = None,
+    ) -> List[SimilarHit]:
+        query = self.embed([title], [content])[0].astype(np.float32)
+        with self._lock:
+            self.searches += 1
+            count = self._count
+            if count == 0:
+                return []
+            scores = np.empty(count, dtype=np.float32)
+            for start in range(0, count, SEARCH_BLOCK_ROWS):
+                block = self._vectors[start:min(count, start + SEARCH_BLOCK_ROWS)]
+                scores[start:start + len(block)] = block.astype(np.float32) @ query
+            scores *= self._scales[:count]
+            ids = self._ids[:count].copy()
+
+        if exclude_id is not None:
+            scores[ids == exclude_id] = -1.0
+        take = min(limit, count)
+        best = np.argpartition(-scores, take - 1)[:take]
+        best = best[np.argsort(-scores[best])]
+        return [
+            SimilarHit(id=int(ids[row]), similarity=round(float(scores[row]), 4))
+            for row in best if scores[row] >= min_similarity
+        ]
+
+    def stats(self):
+        with self._lock:
+            return {
+                "loaded": self.loaded,
+                "questions": self._count,
+                "bytes": self._count * (self.embedder.dim + 4 + 8),
+                "searches": self.searches,
+                "load_seconds": round(self.load_seconds, 3),
+            }
+
+
+similar_questions = SimilarQuestionIndex()
@@ -0,0 +1,120 @@
+from fastapi import HTTPException
+from sqlalchemy import insert, select, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from models import Question, Answer, Vote
+from schemas import VoteCreate
+from response_cache import response_cache
+
+# Votes are applied without reading and rewriting counters in Python:
+#
+#   1. flip an existing opposite vote with one conditional UPDATE, or
+#   2. insert a new vote with INSERT ... ON CONFLICT DO NOTHING against the
+#      partial unique indexes on votes (other databases run a plain INSERT in
+#      a savepoint and read a unique violation the same way), then
+#   3. move the target's counters with UPDATE ... SET upvotes = upvotes + :d
+#
+# all in a single transaction. Concurrent voters never overwrite each other's
+# counts because the arithmetic happens inside the database.
+
+VOTE_COLUMNS = tuple(Vote.__table__.c)
+UPSERT_INSERTS = {"postgresql": postgresql.insert, "sqlite": sqlite.insert}
+
+
+def _vote_key(user_id: int, vote: VoteCreate):
+    # Answer votes are unique per (user, answer); question votes per (user, question)
+    if vote.answer_id is not None:
+        return [Vote.user_id == user_id, Vote.answer_id == vote.answer_id]
+    return [Vote.user_id == user_id, Vote.question_id == vote.question_id, Vote.answer_id.is_(None)]
+
+
+def _conflict_target(vote: VoteCreate):
+    if vote.answer_id is not None:
+        return dict(index_elements=[Vote.user_id, Vote.answer_id], index_where=Vote.answer_id.isnot(None))
+    return dict(index_elements=[Vote.user_id, Vote.question_id], index_where=Vote.answer_id.is_(None))
+
+
+def _insert_vote(db: Session, user_id: int, vote: VoteCreate):
+    """Insert a new vote; returns None if the same vote is already recorded."""
+    values = dict(user_id=user_id, question_id=vote.question_id, answer_id=vote.answer_id, vote_type=vote.vote_type)
+    upsert = UPSERT_INSERTS.get(db.get_bind().dialect.name)
+    if upsert is not None:
+        return db.execute(
+            upsert(Vote).values(**values).on_conflict_do_nothing(**_conflict_target(vote)).returning(*VOTE_COLUMNS)
+        ).first()
+    try:
+        with db.begin_nested():
+            return db.execute(insert(Vote).values(**values).returning(*VOTE_COLUMNS)).first()
+    except IntegrityError:
+        # Only a concurrent insert of the same vote counts as a duplicate
+        if db.execute(select(Vote.id).where(*_vote_key(user_id, vote))).first() is None:
+            raise
+        return None
+
+
+def _apply_counts(db: Session, model, target_id: int, up: int, down: int) -> int:
+    """Move a question's or answer's counters; returns the id of the question it belongs to."""
+    question_id = db.execute(
+        update(model)
+        .where(model.id == target_id)
+        .values(
+            upvotes=model.upvotes + up,
+            downvotes=model.downvotes + down,
+            score=model.score + (up - down),
+        )
+        .returning(model.question_id if model is Answer else model.id)
+        .execution_options(synchronize_session=False)
+    ).scalar()
+    if question_id is None:
+        raise HTTPException(status_code=404, detail=f"{model.__name__} not found")
+    return question_id
+
+
+def apply_vote(db: Session, user_id: int, vote: VoteCreate):
+    """Record a vote and move the target's counters in one transaction."""
+    if vote.vote_type not in (1, -1):
+        raise HTTPException(status_code=400, detail="vote_type must be 1 or -1")
+    if vote.question_id is None and vote.answer_id is None:
+        raise HTTPException(status_code=400, detail="question_id or answer_id is required")
+
+    key = _vote_key(user_id, vote)
+    old_vote_type = 0
+
+    try:
+        # A vote is either 1 or -1, so a row that changed held the opposite vote
+        row = db.execute(
+            update(Vote)
+            .where(*key, Vote.vote_type != vote.vote_type)
+            .values(vote_type=vote.vote_type)
+            .returning(*VOTE_COLUMNS)
+            .execution_options(synchronize_session=False)
+        ).first()
+        if row is not None:
+            old_vote_type = -vote.vote_type
+        else:
+            row = _insert_vote(db, user_id, vote)
+            if row is None:
+                # Same vote already recorded: nothing to count
+                row = db.execute(select(*VOTE_COLUMNS).where(*key)).first()
+                db.commit()
+                return row._mapping
+
+        up = (vote.vote_type == 1) - (old_vote_type == 1)
+        down = (vote.vote_type == -1) - (old_vote_type == -1)
+        touched_questions = set()
+        if vote.question_id is not None:
+            touched_questions.add(_apply_counts(db, Question, vote.question_id, up, down))
+        if vote.answer_id is not None:
+            touched_questions.add(_apply_counts(db, Answer, vote.answer_id, up, down))
+
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+
+    for question_id in touched_questions:
+        response_cache.invalidate_question(question_id)
+
+    return row._mapping
@@ -1 +1,12 @@
-from . import agent
\ No newline at end of file
+# ADK finds the agent as rag.agent.root_agent. It is imported on first use
+# rather than with the package, so the forum API can import the standalone
+# modules (rag.embeddings, rag.vector_index, rag.corpus_versions) without
+# loading ADK and building the agent tree.
+
+import importlib
+
+
+def __getattr__(name):
+    if name == "agent":
+        return importlib.import_module(f"{__name__}.agent")
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
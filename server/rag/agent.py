@@ -2,44 +2,54 @@ import os
 from typing import Optional, List
 
 from google.adk.agents import Agent
-from google.adk.tools.retrieval.vertex_ai_rag_retrieval import VertexAiRagRetrieval
 from google.adk.tools import google_search
 # from google.adk.tools.vision import ImageAnalysisTool  # Uncomment if available for diagnostic reports
 
-from vertexai.preview import rag
-
 from dotenv import load_dotenv
+from .answer_cache import AnswerCache
+from .orchestrator import FanOutOrchestrator, parse_deadlines
+from .retrieval import retrieval_tool
+from .reranker import Reranker
+from .retrieval_cache import RetrievalCache
 from .prompts import (
     return_instructions_root, 
     return_instructions_training, 
     return_instructions_forum, 
     return_instructions_web_search, 
-    return_instructions_diagnostic
+    return_instructions_diagnostic,
+    return_instructions_synthesis
 )
 load_dotenv()
 
-training_rag_tool = VertexAiRagRetrieval(
+# Backend chosen by RAG_RETRIEVAL_BACKEND: Vertex AI RAG corpora called as a
+# function tool (vertex-tool, the default), Gemini's built-in retrieval over
+# the same corpora (vertex), or local indexes built by
+# shared_libraries/build_local_index.py. The function-tool backends share one
+# cache of recent retrieval results, and rerank the 20 candidates down to the
+# few that fit the prompt budget.
+retrieval_cache = RetrievalCache.from_env()
+reranker = Reranker.from_env()
+
+training_rag_tool = retrieval_tool(
     name='asha_training_retrieval',
     description='Retrieves information from ASHA workers training modules',
-    rag_resources=[
-        rag.RagResource(
-            rag_corpus=os.environ.get("RAG_CORPUS")
-        )
-    ],
+    rag_corpus=os.environ.get("RAG_CORPUS"),
+    index_name='asha_training',
     similarity_top_k=20,
     vector_distance_threshold=1.0,
+    cache=retrieval_cache,
+    reranker=reranker,
 )
 
-forum_rag_tool = VertexAiRagRetrieval(
+forum_rag_tool = retrieval_tool(
     name='forum_retrieval',
     description='Retrieves information from forum discussions',
-    rag_resources=[
-        rag.RagResource(
-            rag_corpus=os.environ.get("FORUM_CORPUS")
-        )
-    ],
+    rag_corpus=os.environ.get("FORUM_CORPUS"),
+    index_name='forum',
     similarity_top_k=20,
     vector_distance_threshold=0.4,
+    cache=retrieval_cache,
+    reranker=reranker,
 )
 
 # ============================================================================
@@ -90,19 +100,50 @@ diagnostic_sub_agent = Agent(
 # ROOT ORCHESTRATOR AGENT WITH SUB-AGENTS
 # ============================================================================
 
-root_agent = Agent(
-    model='gemini-2.5-flash',
-    name='asha_root_orchestrator',
-    instruction=return_instructions_root(),
-    description=(
-        'Main ASHA assistant orchestrator that coordinates between specialized sub-agents '
-        'for training modules, forum discussions, web search, and diagnostic analysis.'
-    ),
-    tools=[],  # Root agent has no direct tools, only orchestrates sub-agents
-    sub_agents=[
-        training_sub_agent,
-        forum_sub_agent, 
-        web_search_sub_agent,
-        diagnostic_sub_agent
-    ]
-)
\ No newline at end of file
+# RAG_ORCHESTRATION=delegate (default): the root LLM delegates to one
+# sub-agent at a time. fanout: the relevant sub-agents run concurrently under
+# deadlines and a synthesizer combines what returned in time.
+if os.environ.get("RAG_ORCHESTRATION", "delegate") == "fanout":
+    root_agent = FanOutOrchestrator(
+        name='asha_root_orchestrator',
+        description=(
+            'Main ASHA assistant orchestrator that consults the training module, forum, web search '
+            'and diagnostic sub-agents in parallel and synthesizes their answers.'
+        ),
+        sub_agents=[
+            training_sub_agent,
+            forum_sub_agent,
+            web_search_sub_agent,
+            diagnostic_sub_agent
+        ],
+        synthesizer=Agent(
+            model='gemini-2.5-flash',
+            name='synthesis_agent',
+            instruction=return_instructions_synthesis(),
+            description='Combines the parallel sub-agent answers into one response',
+        ),
+        default_deadline=float(os.environ.get("FANOUT_DEADLINE", "25")),
+        deadlines=parse_deadlines(os.environ.get("FANOUT_DEADLINES", "")),
+        synthesis_deadline=float(os.environ.get("FANOUT_SYNTHESIS_DEADLINE", "20")),
+    )
+else:
+    root_agent = Agent(
+        model='gemini-2.5-flash',
+        name='asha_root_orchestrator',
+        instruction=return_instructions_root(),
+        description=(
+            'Main ASHA assistant orchestrator that coordinates between specialized sub-agents '
+            'for training modules, forum discussions, web search, and diagnostic analysis.'
+        ),
+        tools=[],  # Root agent has no direct tools, only orchestrates sub-agents
+        sub_agents=[
+            training_sub_agent,
+            forum_sub_agent, 
+            web_search_sub_agent,
+            diagnostic_sub_agent
+        ]
+    )
+
+# Repeated questions are answered from the cache instead of the sub-agents
+answer_cache = AnswerCache.from_env()
+answer_cache.install(root_agent)
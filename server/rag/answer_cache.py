@@ -0,0 +1,321 @@
+"""Semantic answer cache in front of the agent tree.
+
+Many ASHAs ask the same question ("danger signs in pregnancy") within a
+day, and each one otherwise costs several Gemini and retrieval hops. The
+cache keeps finished answers keyed by the normalised question text and by
+its embedding: a new question is answered from the cache when it matches an
+earlier one exactly after normalisation, or when their embeddings have a
+cosine similarity of at least `threshold`.
+
+Questions are embedded with their negations, question words and numbers
+(embeddings.question_tokens), which the retrieval embedding drops. Even so,
+a semantic match is refused when the two questions differ in a negation, a
+question word or a number: "should I give iron tablets" and "should I not give iron
+tablets" must never share an answer, however close their vectors are.
+
+Entries are evicted least-recently-used beyond `max_entries`, expire after
+`ttl` seconds, and are dropped when a corpus they were answered from is
+re-synced (see corpus_versions.py). Each entry keeps the citations of its
+answer, from the "Citations:" section and from retrieval grounding metadata.
+
+Only self-contained questions are cached: the first text-only message of a
+session. Follow-ups depend on the conversation and attachments (diagnostic
+reports) on the patient, so both always go to the agents.
+
+install() hooks the cache into every agent of the tree as before/after
+agent callbacks. Whichever agent starts an invocation (the root, or the
+sub-agent a session was transferred to) looks the question up and, once it
+has finished, stores the answer; agents it hands over to are left alone.
+"""
+
+import logging
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+import numpy as np
+from google.genai import types
+
+from .corpus_versions import corpus_versions
+from .embeddings import NEGATIONS, QUESTION_WORDS, HashingEmbedder, normalize_query, question_tokens
+
+logger = logging.getLogger(__name__)
+
+CITATIONS_RE = re.compile(r"^\s*Citations:\s*$(.*?)(?=^\s*Related Questions:|\Z)", re.MULTILINE | re.DOTALL)
+CITATION_LINE_RE = re.compile(r"^\s*(?:\d+[.)]|[-*])\s*(.+?)\s*$", re.MULTILINE)
+
+# Invocations still running, so the after callback can find its lookup
+PENDING_TTL = 600
+
+
+def _meaning_words(query: str) -> frozenset:
+    """Negations, question words and numbers of a query, which a cached match must share."""
+    return frozenset(
+        token for token in question_tokens(query)
+        if token in NEGATIONS or token in QUESTION_WORDS or token.isdigit()
+    )
+
+
+def extract_citations(answer: str) -> List[str]:
+    match = CITATIONS_RE.search(answer)
+    if not match:
+        return []
+    return CITATION_LINE_RE.findall(match.group(1))
+
+
+@dataclass
+class CachedAnswer:
+    query: str
+    text: str
+    citations: List[str]
+    corpus_versions: Dict[str, str]
+    created_at: float
+    latency: float          # seconds the agents took to produce it
+    hits: int = 0
+
+
+@dataclass
+class _Pending:
+    agent_name: str
+    key: Optional[str]      # None: not cacheable
+    corpus_versions: Dict[str, str]
+    started_at: float = field(default_factory=time.monotonic)
+
+
+class AnswerCache:
+
+    def __init__(
+        self,
+        max_entries: int = 1000,
+        ttl: float = 6 * 3600,
+        threshold: float = 0.92,
+        embedder=None,
+        versions=corpus_versions,
+    ):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.threshold = threshold
+        self.embedder = embedder or HashingEmbedder(question_words=True)
+        self.versions = versions
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, CachedAnswer]" = OrderedDict()
+        # Embeddings of the cached queries, one row per slot
+        self._matrix = np.zeros((max_entries, self.embedder.dim), dtype=np.float32)
+        self._slots: Dict[str, int] = {}
+        self._free = list(range(max_entries - 1, -1, -1))
+        self._pending: Dict[str, _Pending] = {}
+
+        self.exact_hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+        self.refused = 0        # semantic matches refused for a differing negation, question word or number
+        self.bypassed = 0
+        self.stores = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self.saved_seconds = 0.0
+
+    @classmethod
+    def from_env(cls) -> "AnswerCache":
+        return cls(
+            max_entries=int(os.environ.get("ANSWER_CACHE_SIZE", "1000")),
+            ttl=float(os.environ.get("ANSWER_CACHE_TTL", str(6 * 3600))),
+            threshold=float(os.environ.get("ANSWER_CACHE_THRESHOLD", "0.92")),
+        )
+
+    # Lookup and store
+    def lookup(self, query: str) -> Optional[CachedAnswer]:
+        key = normalize_query(query)
+        vector = self.embedder.embed([key])[0]
+        current = self.versions()
+        with self._lock:
+            self._purge(current)
+            entry = self._entries.get(key)
+            if entry is not None:
+                self.exact_hits += 1
+            else:
+                entry = self._nearest(vector, _meaning_words(query))
+                if entry is None:
+                    self.misses += 1
+                    return None
+                self.semantic_hits += 1
+            self._entries.move_to_end(normalize_query(entry.query))
+            entry.hits += 1
+            self.saved_seconds += entry.latency
+            return entry
+
+    def store(self, query: str, text: str, citations: List[str], versions: Dict[str, str], latency: float):
+        key = normalize_query(query)
+        vector = self.embedder.embed([key])[0]
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            while len(self._entries) >= self.max_entries:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+            slot = self._free.pop()
+            self._matrix[slot] = vector
+            self._slots[key] = slot
+            self._entries[key] = CachedAnswer(query, text, citations, versions, time.time(), latency)
+            self.stores += 1
+
+    def clear(self):
+        with self._lock:
+            for key in list(self._entries):
+                self._remove(key)
+
+    def _nearest(self, vector: np.ndarray, meaning_words: frozenset) -> Optional[CachedAnswer]:
+        if not self._slots:
+            return None
+        keys = list(self._slots)
+        slots = np.fromiter(self._slots.values(), dtype=np.int64, count=len(keys))
+        scores = self._matrix[slots] @ vector
+        for row in np.argsort(-scores):
+            if scores[row] < self.threshold:
+                break
+            entry = self._entries[keys[row]]
+            if _meaning_words(entry.query) == meaning_words:
+                return entry
+            self.refused += 1
+        return None
+
+    def _purge(self, current: Dict[str, str]):
+        # Expired entries, and entries answered from an older corpus version
+        cutoff = time.time() - self.ttl
+        for key, entry in list(self._entries.items()):
+            if entry.created_at < cutoff or entry.corpus_versions != current:
+                self._remove(key)
+                self.invalidations += 1
+
+    def _remove(self, key: str):
+        del self._entries[key]
+        slot = self._slots.pop(key)
+        self._matrix[slot] = 0
+        self._free.append(slot)
+
+    def stats(self) -> dict:
+        with self._lock:
+            hits = self.exact_hits + self.semantic_hits
+            lookups = hits + self.misses
+            return {
+                "size": len(self._entries),
+                "hits": hits,
+                "exact_hits": self.exact_hits,
+                "semantic_hits": self.semantic_hits,
+                "misses": self.misses,
+                "refused": self.refused,
+                "bypassed": self.bypassed,
+                "hit_rate": hits / lookups if lookups else 0.0,
+                "saved_seconds": round(self.saved_seconds, 3),
+                "stores": self.stores,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+            }
+
+    # Agent callbacks
+    def install(self, agent):
+        """Add the cache callbacks to agent and all of its sub-agents."""
+        agent.before_agent_callback = _with_callback(agent.before_agent_callback, self.before_agent_callback)
+        agent.after_agent_callback = _with_callback(agent.after_agent_callback, self.after_agent_callback)
+        for sub_agent in agent.sub_agents:
+            self.install(sub_agent)
+
+    def before_agent_callback(self, callback_context) -> Optional[types.Content]:
+        invocation_id = callback_context.invocation_id
+        with self._lock:
+            if invocation_id in self._pending:
+                return None  # Handed over to by the agent that owns the lookup
+            self._prune_pending()
+
+        query = _cacheable_query(callback_context)
+        pending = _Pending(callback_context.agent_name, None, self.versions())
+        with self._lock:
+            self._pending[invocation_id] = pending
+        if query is None:
+            with self._lock:
+                self.bypassed += 1
+            return None
+
+        pending.key = query
+        entry = self.lookup(query)
+        if entry is None:
+            return None
+        with self._lock:
+            self._pending.pop(invocation_id, None)
+        stats = self.stats()
+        logger.info(
+            "Answer cache hit for %r (cached %r); hit rate %.2f, %.1fs saved so far",
+            query, entry.query, stats["hit_rate"], stats["saved_seconds"],
+        )
+        return types.Content(role="model", parts=[types.Part(text=entry.text)])
+
+    def after_agent_callback(self, callback_context) -> Optional[types.Content]:
+        invocation_id = callback_context.invocation_id
+        with self._lock:
+            pending = self._pending.get(invocation_id)
+            if pending is None or pending.agent_name != callback_context.agent_name:
+                return None
+            del self._pending[invocation_id]
+        if pending.key is None:
+            return None
+
+        answer, grounding = _final_answer(callback_context)
+        if answer:
+            citations = extract_citations(answer)
+            citations += [source for source in grounding if source not in citations]
+            self.store(pending.key, answer, citations, pending.corpus_versions, time.monotonic() - pending.started_at)
+        return None
+
+    def _prune_pending(self):
+        cutoff = time.monotonic() - PENDING_TTL
+        for invocation_id, pending in list(self._pending.items()):
+            if pending.started_at < cutoff:
+                del self._pending[invocation_id]
+
+
+def _with_callback(existing, callback):
+    if existing is None:
+        return callback
+    if isinstance(existing, list):
+        return existing + [callback]
+    return [existing, callback]
+
+
+def _cacheable_query(callback_context) -> Optional[str]:
+    """The question text if it stands on its own, else None."""
+    content = callback_context.user_content
+    if content is None or not content.parts:
+        return None
+    if any(part.text is None for part in content.parts):
+        return None  # Attachments
+    session = callback_context._invocation_context.session
+    for event in session.events:
+        if event.author == "user" and event.invocation_id != callback_context.invocation_id:
+            return None  # Not the first question of the session
+    query = " ".join(part.text for part in content.parts).strip()
+    return query or None
+
+
+def _final_answer(callback_context):
+    """Last text the agents produced in this invocation, and its grounding sources."""
+    invocation_id = callback_context.invocation_id
+    answer = None
+    grounding = []
+    for event in callback_context._invocation_context.session.events:
+        if event.invocation_id != invocation_id or event.author == "user" or event.partial:
+            continue
+        if event.content and event.content.parts:
+            text = "".join(part.text for part in event.content.parts if part.text and not part.thought).strip()
+            if text:
+                answer = text
+        metadata = event.grounding_metadata
+        for chunk in (metadata.grounding_chunks or []) if metadata else []:
+            context = chunk.retrieved_context or chunk.web
+            source = context and (context.title or context.uri)
+            if source and source not in grounding:
+                grounding.append(source)
+    return answer, grounding
@@ -0,0 +1,68 @@
+"""Answer cache check: questions with different meanings never share an answer.
+
+Stores an answer for the first question of each pair and looks up the
+second. Pairs that differ in a negation, a question word or a number must
+miss, also with the threshold lowered to GUARD_THRESHOLD so that only the
+cache's guard stands between them; rewordings of the same question should
+still hit. Prints the cosine similarity of each pair under the retrieval
+embedding and under the cache's, and exits 1 if any pair comes out the
+wrong way.
+
+    python rag/benchmarks/answer_cache_check.py
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+
+from rag.answer_cache import AnswerCache
+from rag.embeddings import HashingEmbedder
+
+# (cached question, new question)
+MUST_MISS = [
+    ("Should I give iron tablets during pregnancy", "Should I not give iron tablets during pregnancy"),
+    ("Is it safe to give ORS to a newborn", "Is it not safe to give ORS to a newborn"),
+    ("When should I give iron tablets during pregnancy", "Why should I give iron tablets during pregnancy"),
+    ("How many iron tablets per day", "Why iron tablets per day"),
+    ("Can a mother breastfeed during fever", "Can't a mother breastfeed during fever"),
+    ("Give 2 ORS packets for diarrhoea", "Give 5 ORS packets for diarrhoea"),
+    ("क्या गर्भावस्था में आयरन की गोली देनी चाहिए", "क्या गर्भावस्था में आयरन की गोली नहीं देनी चाहिए"),
+]
+GUARD_THRESHOLD = 0.5
+
+SHOULD_HIT = [
+    ("What are the danger signs in pregnancy?", "what are the danger signs in pregnancy"),
+    ("What are the danger signs in pregnancy", "What are danger signs of a pregnancy?"),
+    ("When should the newborn get the BCG vaccine", "When should a newborn get BCG vaccine?"),
+    ("How to give ORS to a child with diarrhoea", "How do I give ORS to the child with diarrhoea"),
+]
+
+
+def main():
+    retrieval = HashingEmbedder()
+    failures = 0
+    runs = [
+        ("Must miss:", False, MUST_MISS, AnswerCache().threshold),
+        (f"Must miss at threshold {GUARD_THRESHOLD}:", False, MUST_MISS, GUARD_THRESHOLD),
+        ("Should hit:", True, SHOULD_HIT, AnswerCache().threshold),
+    ]
+    for title, expected_hit, pairs, threshold in runs:
+        print(title)
+        for cached, asked in pairs:
+            cache = AnswerCache(threshold=threshold, versions=lambda: {})
+            cache.store(cached, "cached answer", [], {}, latency=1.0)
+            hit = cache.lookup(asked) is not None
+            before, after = (
+                float(embedder.embed([cached])[0] @ embedder.embed([asked])[0])
+                for embedder in (retrieval, cache.embedder)
+            )
+            wrong = hit != expected_hit
+            failures += wrong
+            print(f"  {'WRONG' if wrong else 'ok':5} {'hit ' if hit else 'miss'} cosine {before:.2f} -> {after:.2f}"
+                  f"{' (refused)' if cache.refused else ''}  {cached!r} / {asked!r}")
+    print(f"{failures} pair(s) came out the wrong way")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
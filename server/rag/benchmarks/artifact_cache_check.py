@@ -0,0 +1,150 @@
+"""Artifact cache check for the ASHA module downloads.
+
+Serves generated "PDFs" from a local HTTP stand-in that supports ETag,
+Last-Modified, 304 revalidation and Range/If-Range, and can drop a
+connection halfway through a body. Then:
+
+  1. downloads every file concurrently into an empty cache; some connections
+     are dropped mid-transfer and resumed with Range requests (206),
+  2. fetches again: everything is answered 304,
+  3. changes one file on the server: only that one is downloaded.
+
+    python rag/benchmarks/artifact_cache_check.py --files 14 --size-mb 4
+"""
+import argparse
+import hashlib
+import os
+import sys
+import tempfile
+import threading
+import time
+from email.utils import formatdate
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+
+from rag.shared_libraries.artifact_cache import ArtifactCache
+
+
+class StandIn:
+    def __init__(self, files, drop_first):
+        self.files = files              # path -> bytes
+        self.drop_first = set(drop_first)  # paths whose first full download is cut off
+        self.versions = {path: time.time() for path in files}
+        self.bytes_sent = 0
+        self.requests = []
+        self.lock = threading.Lock()
+
+    def etag(self, path):
+        return '"%s"' % hashlib.sha256(self.files[path]).hexdigest()[:16]
+
+
+def make_handler(stand_in):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, *args):
+            pass
+
+        def do_GET(self):
+            body = stand_in.files.get(self.path)
+            if body is None:
+                self.send_error(404)
+                return
+            etag = stand_in.etag(self.path)
+            last_modified = formatdate(stand_in.versions[self.path], usegmt=True)
+
+            if self.headers.get("If-None-Match") == etag:
+                self._record(304)
+                self.send_response(304)
+                self.send_header("ETag", etag)
+                self.end_headers()
+                return
+
+            start = 0
+            range_header = self.headers.get("Range")
+            if range_header and self.headers.get("If-Range") in (etag, last_modified):
+                start = int(range_header.split("=")[1].split("-")[0])
+            status = 206 if start else 200
+            payload = body[start:]
+            self._record(status)
+
+            self.send_response(status)
+            self.send_header("ETag", etag)
+            self.send_header("Last-Modified", last_modified)
+            self.send_header("Content-Length", str(len(payload)))
+            if start:
+                self.send_header("Content-Range", f"bytes {start}-{len(body) - 1}/{len(body)}")
+            self.end_headers()
+
+            with stand_in.lock:
+                drop = status == 200 and self.path in stand_in.drop_first
+                stand_in.drop_first.discard(self.path)
+            if drop:
+                # Send half, then hang up
+                self.wfile.write(payload[: len(payload) // 2])
+                self._count(len(payload) // 2)
+                self.close_connection = True
+                self.connection.shutdown(2)
+                return
+            self.wfile.write(payload)
+            self._count(len(payload))
+
+        def _record(self, status):
+            with stand_in.lock:
+                stand_in.requests.append(status)
+
+        def _count(self, sent):
+            with stand_in.lock:
+                stand_in.bytes_sent += sent
+
+    return Handler
+
+
+def run_round(name, cache, stand_in, urls):
+    stand_in.requests.clear()
+    sent_before = stand_in.bytes_sent
+    started = time.perf_counter()
+    artifacts = cache.fetch_many(urls)
+    elapsed = time.perf_counter() - started
+    statuses = {status: stand_in.requests.count(status) for status in sorted(set(stand_in.requests))}
+    failed = sum(artifact is None for artifact in artifacts)
+    changed = sum(bool(artifact and artifact.changed) for artifact in artifacts)
+    mb = (stand_in.bytes_sent - sent_before) / 1e6
+    print(f"{name:<10} {elapsed:6.2f}s  {mb:7.1f} MB sent  statuses {statuses}  changed {changed}  failed {failed}")
+    return artifacts
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--files", type=int, default=14)
+    parser.add_argument("--size-mb", type=float, default=4)
+    parser.add_argument("--workers", type=int, default=4)
+    args = parser.parse_args()
+
+    size = int(args.size_mb * 1e6)
+    files = {f"/book-no-{i}.pdf": os.urandom(size) for i in range(args.files)}
+    stand_in = StandIn(files, drop_first=list(files)[::3])
+    server = ThreadingHTTPServer(("127.0.0.1", 0), make_handler(stand_in))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    urls = [f"http://127.0.0.1:{server.server_port}{path}" for path in files]
+
+    cache = ArtifactCache(tempfile.mkdtemp(prefix="artifact_cache_"), workers=args.workers)
+    run_round("cold", cache, stand_in, urls)
+    run_round("warm", cache, stand_in, urls)
+
+    changed_path = list(files)[1]
+    stand_in.files[changed_path] = os.urandom(size)
+    stand_in.versions[changed_path] = time.time() + 1
+    after = run_round("one edit", cache, stand_in, urls)
+
+    intact = all(
+        artifact is not None and open(artifact.path, "rb").read() == stand_in.files[path]
+        for artifact, path in zip(after, files)
+    )
+    print(f"cached files match the server: {intact}")
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
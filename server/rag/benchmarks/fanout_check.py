@@ -0,0 +1,109 @@
+"""Fan-out orchestration check with stub sub-agents.
+
+Each stub answers after a fixed delay, with no model calls. The same
+question is run through FanOutOrchestrator and, for comparison, through the
+sub-agents one after another:
+
+  - the fan-out should take about as long as the slowest branch that makes
+    its deadline, not the sum of all of them,
+  - a branch slower than its deadline is cancelled and left out,
+  - the synthesizer sees the answers in priority order (training > forum > web),
+  - if the synthesizer misses its deadline, the findings are returned as they are.
+
+    python rag/benchmarks/fanout_check.py
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+
+from google.adk.agents import BaseAgent
+from google.adk.events import Event
+from google.adk.runners import InMemoryRunner
+from google.genai import types
+
+from rag.orchestrator import FINDINGS_KEY, FanOutOrchestrator
+
+
+class StubAgent(BaseAgent):
+    delay: float = 0.0
+    answer: str = ""
+
+    async def _run_async_impl(self, ctx):
+        await asyncio.sleep(self.delay)
+        text = self.answer or ctx.session.state.get(FINDINGS_KEY, "")
+        yield Event(
+            invocation_id=ctx.invocation_id,
+            author=self.name,
+            branch=ctx.branch,
+            content=types.Content(role="model", parts=[types.Part(text=text)]),
+        )
+
+
+def stubs(delays):
+    return [
+        StubAgent(name=name, description=name, delay=delay, answer=f"[{name} answer]")
+        for name, delay in delays.items()
+    ]
+
+
+async def ask(agent, question):
+    runner = InMemoryRunner(agent=agent, app_name="fanout_check")
+    session = await runner.session_service.create_session(app_name="fanout_check", user_id="check")
+    started = time.perf_counter()
+    final = None
+    async for event in runner.run_async(
+        user_id="check",
+        session_id=session.id,
+        new_message=types.Content(role="user", parts=[types.Part(text=question)]),
+    ):
+        if event.content and event.content.parts and event.content.parts[0].text:
+            final = event
+    return time.perf_counter() - started, final
+
+
+async def main(args):
+    delays = {
+        "training_module_agent": args.training,
+        "forum_agent": args.forum,
+        "web_search_agent": args.web,
+        "diagnostic_agent": 0.1,
+    }
+    question = "What is the latest guidance on danger signs in pregnancy?"
+    print(f"branch delays: {delays}, web deadline {args.web_deadline}s")
+
+    sequential = sum(delay for name, delay in delays.items() if name != "diagnostic_agent")
+    print(f"sequential delegation would take ~{sequential:.2f}s plus synthesis")
+
+    orchestrator = FanOutOrchestrator(
+        name="asha_root_orchestrator",
+        sub_agents=stubs(delays),
+        synthesizer=StubAgent(name="synthesis_agent", delay=0.05),
+        deadlines={"web_search_agent": args.web_deadline},
+    )
+    elapsed, final = await ask(orchestrator, question)
+    print(f"fan-out: {elapsed:.2f}s, answered by {final.author}:")
+    print("  " + final.content.parts[0].text.replace("\n", "\n  "))
+
+    slow_synthesis = FanOutOrchestrator(
+        name="asha_root_orchestrator",
+        sub_agents=stubs(delays),
+        synthesizer=StubAgent(name="synthesis_agent", delay=5),
+        deadlines={"web_search_agent": args.web_deadline},
+        synthesis_deadline=0.2,
+    )
+    elapsed, final = await ask(slow_synthesis, question)
+    print(f"fan-out with a stuck synthesizer: {elapsed:.2f}s, answered by {final.author}:")
+    print("  " + final.content.parts[0].text.replace("\n", "\n  "))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--training", type=float, default=0.6)
+    parser.add_argument("--forum", type=float, default=0.8)
+    parser.add_argument("--web", type=float, default=3.0)
+    parser.add_argument("--web-deadline", type=float, default=1.0)
+    asyncio.run(main(parser.parse_args()))
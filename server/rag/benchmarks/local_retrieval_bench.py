@@ -0,0 +1,101 @@
+"""Offline latency and recall benchmark for the local retrieval index.
+
+Builds a VectorIndex over a synthetic corpus of health-topic passages (or
+loads one written by build_local_index.py with --index-dir), then times
+query embedding + IVF search and compares the hits against an exact float32
+scan of every vector.
+
+    python rag/benchmarks/local_retrieval_bench.py --chunks 50000
+    python rag/benchmarks/local_retrieval_bench.py --index-dir rag/local_index/forum
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+
+from rag.embeddings import HashingEmbedder, embedder_from_config
+from rag.vector_index import VectorIndex
+
+TOPICS = [
+    "pregnancy antenatal checkup iron folic acid tablets anaemia haemoglobin",
+    "newborn care breastfeeding warmth cord care low birth weight kangaroo",
+    "immunisation vaccine schedule measles polio bcg hepatitis due list",
+    "diarrhoea dehydration ors zinc handwashing safe drinking water",
+    "malaria fever rapid diagnostic test mosquito net chloroquine",
+    "tuberculosis cough sputum dots treatment adherence referral",
+    "family planning contraception spacing condoms pills iud counselling",
+    "nutrition growth monitoring stunting wasting anganwadi take home ration",
+    "postpartum haemorrhage danger signs institutional delivery transport",
+    "hypertension diabetes screening blood pressure sugar test camp",
+]
+FILLER = "village household visit asha worker health record register community meeting monthly".split()
+
+
+def synthetic_corpus(count, seed=0):
+    rng = random.Random(seed)
+    chunks = []
+    for i in range(count):
+        topic = TOPICS[i % len(TOPICS)].split()
+        words = rng.choices(topic, k=40) + rng.choices(FILLER, k=40)
+        rng.shuffle(words)
+        chunks.append({"id": f"c{i}", "text": " ".join(words), "source": f"synthetic/{i % 97}"})
+    queries = [" ".join(rng.sample(TOPICS[i % len(TOPICS)].split(), 4)) for i in range(200)]
+    return chunks, queries
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--chunks", type=int, default=50000)
+    parser.add_argument("--index-dir", help="benchmark an index built by build_local_index.py")
+    parser.add_argument("--top-k", type=int, default=20)
+    parser.add_argument("--nprobe", type=int)
+    args = parser.parse_args()
+
+    if args.index_dir:
+        index = VectorIndex.load(args.index_dir)
+        embedder = embedder_from_config(index.meta["embedder"])
+        rng = random.Random(0)
+        queries = [" ".join(rng.choice(index.chunks)["text"].split()[:8]) for _ in range(200)]
+    else:
+        chunks, queries = synthetic_corpus(args.chunks)
+        started = time.perf_counter()
+        embedder = HashingEmbedder().fit_idf(chunk["text"] for chunk in chunks)
+        vectors = embedder.embed(chunk["text"] for chunk in chunks)
+        built = VectorIndex.build(vectors, chunks, embedder.to_config())
+        directory = tempfile.mkdtemp(prefix="local_index_")
+        built.save(directory)
+        index = VectorIndex.load(directory)
+        print(f"built {len(chunks)} chunks into {index.nlist} lists in {time.perf_counter() - started:.1f}s")
+
+    size_mb = os.path.getsize(os.path.join(args.index_dir or directory, "vectors.npy")) / 1e6
+    print(f"index: {len(index.chunks)} chunks, dim {index.meta['dim']}, vectors {size_mb:.1f} MB int8 (mmap)")
+
+    # Exact reference: every vector dequantised to float32
+    exact = np.asarray(index.vectors, dtype=np.float32) * index.scales[:, None]
+
+    latencies, recalls = [], []
+    for query in queries:
+        started = time.perf_counter()
+        query_vector = embedder.embed([query])[0]
+        hits = index.search(query_vector, top_k=args.top_k, nprobe=args.nprobe)
+        latencies.append((time.perf_counter() - started) * 1000)
+
+        best = np.argsort(-(exact @ query_vector))[:args.top_k]
+        expected = {index.chunks[index.ids[row]]["id"] for row in best}
+        recalls.append(len(expected & {hit.chunk["id"] for hit in hits}) / len(expected))
+
+    latencies.sort()
+    p50 = latencies[len(latencies) // 2]
+    p99 = latencies[int(len(latencies) * 0.99) - 1]
+    print(f"embed + search: p50 {p50:.2f} ms, p99 {p99:.2f} ms over {len(queries)} queries")
+    print(f"recall@{args.top_k} vs exact scan: {np.mean(recalls):.3f}")
+
+
+if __name__ == "__main__":
+    main()
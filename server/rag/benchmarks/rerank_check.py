@@ -0,0 +1,108 @@
+"""Reranker check: prompt tokens and duplicates before and after reranking.
+
+Builds a local index from synthetic module pages, each split into
+overlapping word windows the way build_local_index.py splits the ASHA PDFs,
+then for a set of questions compares the similarity_top_k=20 chunks the
+retrieval returns with what the reranker keeps: estimated prompt tokens,
+chunks that repeat a page already included, whether the page the question
+was written from survives, and the time the reranking takes.
+
+    python rag/benchmarks/rerank_check.py --pages 400
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+
+from rag.embeddings import HashingEmbedder
+from rag.reranker import Reranker, estimate_tokens
+from rag.retrieval import LocalIndexBackend
+from rag.vector_index import VectorIndex
+
+TOPICS = [
+    "pregnancy antenatal checkup iron folic acid tablets anaemia haemoglobin weight gain",
+    "newborn care breastfeeding warmth cord care low birth weight kangaroo mother care",
+    "immunisation vaccine schedule measles polio bcg hepatitis due list cold chain",
+    "diarrhoea dehydration ors zinc handwashing safe drinking water sanitation",
+    "malaria fever rapid diagnostic test mosquito net chloroquine artesunate",
+    "tuberculosis cough sputum dots treatment adherence referral nikshay",
+    "family planning contraception spacing condoms pills iud counselling sterilisation",
+    "nutrition growth monitoring stunting wasting anganwadi take home ration",
+]
+FILLER = "village household visit asha worker health record register community meeting monthly support".split()
+
+
+def windows(words, size, overlap):
+    for start in range(0, max(1, len(words) - overlap), size - overlap):
+        yield words[start:start + size]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--pages", type=int, default=400)
+    parser.add_argument("--queries", type=int, default=100)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    chunks = []
+    for page in range(args.pages):
+        topic = TOPICS[page % len(TOPICS)].split()
+        # A few terms only this page uses, like the drug or scheme names of a real page
+        own_terms = [f"term{page}x{i}" for i in range(4)] * 3
+        words = rng.choices(topic, k=150) + rng.choices(FILLER, k=238) + own_terms
+        rng.shuffle(words)
+        for part, window in enumerate(windows(words, 250, 50)):
+            chunks.append({
+                "id": f"p{page}:{part}",
+                "text": " ".join(window),
+                "source": f"module-{page // 40}.pdf",
+                "page": page,
+            })
+
+    embedder = HashingEmbedder().fit_idf(chunk["text"] for chunk in chunks)
+    index = VectorIndex.build(embedder.embed(chunk["text"] for chunk in chunks), chunks, embedder.to_config())
+    directory = tempfile.mkdtemp(prefix="rerank_index_")
+    index.save(directory)
+    backend = LocalIndexBackend(directory)
+    reranker = Reranker.from_env() or Reranker()
+    print(f"{len(chunks)} chunks from {args.pages} pages; reranker keeps up to {reranker.top_k} "
+          f"within {reranker.token_budget} tokens")
+
+    before_tokens = after_tokens = before_repeats = after_repeats = kept_source = found_source = 0
+    rerank_ms = []
+    for _ in range(args.queries):
+        page = rng.randrange(args.pages)
+        query = " ".join(rng.sample(TOPICS[page % len(TOPICS)].split(), 3) + [f"term{page}x0", f"term{page}x1"])
+        candidates = backend.retrieve(query, 20, None)
+        started = time.perf_counter()
+        kept = reranker.rerank(query, candidates)
+        rerank_ms.append((time.perf_counter() - started) * 1000)
+
+        for selection, is_before in ((candidates, True), (kept, False)):
+            tokens = sum(estimate_tokens(chunk.text) for chunk in selection)
+            pages = [chunk.metadata["page"] for chunk in selection]
+            repeats = len(pages) - len(set(pages))
+            if is_before:
+                before_tokens += tokens
+                before_repeats += repeats
+                found_source += page in pages
+            else:
+                after_tokens += tokens
+                after_repeats += repeats
+                kept_source += page in pages
+
+    n = args.queries
+    rerank_ms.sort()
+    print(f"prompt tokens per lookup: {before_tokens / n:.0f} -> {after_tokens / n:.0f} "
+          f"({1 - after_tokens / before_tokens:.0%} fewer)")
+    print(f"repeated pages per lookup: {before_repeats / n:.1f} -> {after_repeats / n:.1f}")
+    print(f"source page retrieved in {found_source}/{n} lookups, still kept after reranking in {kept_source}/{n}")
+    print(f"rerank time: p50 {rerank_ms[n // 2]:.2f} ms, max {rerank_ms[-1]:.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""Agent API server with a streaming chat endpoint for the app.
+
+Serves everything `adk api_server` does (sessions, /run, /run_sse, on the
+same port 8000) and adds POST /chat_sse. It takes the same request as
+/run_sse, runs the agent in streaming mode through ADK's own handler, so
+sessions are shared with the other endpoints, and streams chat frames
+(chat_stream.py) instead of raw events. GET /health reports the answer and
+retrieval cache statistics (hit rate, model time saved):
+
+    cd server && python -m rag.chat_server
+
+SESSION_DB_URL, if set, is passed on like `adk api_server --session_db_url`.
+"""
+
+import json
+import os
+
+import uvicorn
+from fastapi.responses import StreamingResponse
+from google.adk.cli.fast_api import AgentRunRequest, get_fast_api_app
+from google.adk.events import Event
+
+from .chat_stream import ChatStream, sse_frame
+
+AGENTS_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# ADK writes a failed run as f'data: {{"error": "{e}"}}', unescaped, so a
+# message with a quote, backslash or newline in it is not valid JSON
+ADK_ERROR_PREFIX = '{"error": "'
+
+
+def _parse_data(payload: str) -> dict:
+    try:
+        return json.loads(payload)
+    except ValueError:
+        message = payload.strip()
+        if message.startswith(ADK_ERROR_PREFIX) and message.endswith('"}'):
+            message = message[len(ADK_ERROR_PREFIX):-len('"}')]
+        return {"error": message}
+
+
+def create_app(agents_dir: str = AGENTS_DIR):
+    app = get_fast_api_app(
+        agents_dir=agents_dir,
+        session_db_url=os.environ.get("SESSION_DB_URL", ""),
+        web=False,
+    )
+    run_sse = next(route.endpoint for route in app.routes if getattr(route, "path", None) == "/run_sse")
+
+    @app.post("/chat_sse")
+    async def chat_sse(req: AgentRunRequest) -> StreamingResponse:
+        response = await run_sse(req.model_copy(update={"streaming": True}))
+
+        async def frames():
+            stream = ChatStream()
+            try:
+                async for chunk in response.body_iterator:
+                    for message in chunk.split("\n\n"):
+                        if not message.startswith("data: "):
+                            continue
+                        data = _parse_data(message[len("data: "):])
+                        if "error" in data:
+                            yield sse_frame({"type": "error", "message": data["error"]})
+                            continue
+                        for frame in stream.feed(Event.model_validate(data)):
+                            yield sse_frame(frame)
+            except Exception as e:
+                # The app is always told how the stream ended, never left waiting
+                yield sse_frame({"type": "error", "message": str(e)})
+            yield sse_frame(stream.done())
+
+        return StreamingResponse(frames(), media_type="text/event-stream")
+
+    @app.get("/health")
+    def health_check():
+        # Imported here, not with this module: ADK loads the agent, and its .env, itself
+        from .agent import answer_cache, retrieval_cache
+
+        return {
+            "status": "healthy",
+            "answer_cache": answer_cache.stats(),
+            "retrieval_cache": retrieval_cache.stats(),
+        }
+
+    return app
+
+
+if __name__ == "__main__":
+    uvicorn.run(create_app(), host="0.0.0.0", port=int(os.environ.get("PORT", "8000")))
@@ -0,0 +1,156 @@
+"""Chat frames for streaming an agent run to the app.
+
+The app used to wait for the whole run and then split the final text into
+answer, "Citations:" and "Related Questions:" itself. ChatStream turns the
+ADK events of a run, as they arrive, into small JSON frames instead:
+
+    {"type": "agent", "agent": "forum_agent"}            a sub-agent started
+    {"type": "token", "agent": ..., "text": "..."}       more answer text
+    {"type": "citation", "index": 1, "text": "..."}      one line of Citations:
+    {"type": "related_questions", "questions": [...]}    the Related Questions:
+    {"type": "error", "message": "..."}
+    {"type": "done", "answer": ..., "citations": [...], "related_questions": [...]}
+
+Answer text is passed on token by token (with partial events, i.e.
+streaming mode SSE) except for the line being written when it could still
+turn into a section header, which is held back until it is complete. The
+sections themselves never reach the app as text, only as frames.
+
+Only events on the main branch are answer text; the sub-agents of the
+fan-out orchestrator run in branches of their own, and their answers are
+findings for the synthesizer.
+"""
+
+import json
+import re
+from typing import List, Optional
+
+HEADERS = {"citations": "citations", "references": "citations", "related questions": "related"}
+HEADER_RE = re.compile(r"^[ \t#*]*(citations|references|related questions)[ \t*]*:[ \t*]*(.*?)\s*$", re.IGNORECASE)
+ITEM_RE = re.compile(r"^\s*(?:\d+[.)]|[-*•])?\s*(.+?)\s*$")
+# Agents quoted by another agent come back prefixed with their name
+AGENT_PREFIX_RE = re.compile(r"^\s*\[[\w-]+\]:\s*")
+
+
+def sse_frame(frame: dict) -> str:
+    return f"data: {json.dumps(frame, ensure_ascii=False)}\n\n"
+
+
+def _could_be_header(fragment: str) -> bool:
+    start = fragment.lstrip(" \t#*").lower()
+    return any(header.startswith(start) or start.startswith(header) for header in HEADERS)
+
+
+def _item(line: str) -> Optional[str]:
+    match = ITEM_RE.match(line)
+    text = match.group(1).strip('"') if match else ""
+    return text or None
+
+
+class ChatStream:
+    """Frames for the events of one run, fed in order."""
+
+    def __init__(self):
+        self.agents_seen = set()
+        self.answer = ""
+        self.citations: List[str] = []
+        self.related_questions: List[str] = []
+        self._start_message()
+
+    def _start_message(self):
+        self._text = ""
+        self._handled = 0  # Characters of _text already sent on or parsed
+        self._line_start = True
+        self._section = None  # None while in the answer, then "citations" or "related"
+        self._body = ""
+        self._citations: List[str] = []
+        self._related: List[str] = []
+
+    def feed(self, event) -> List[dict]:
+        frames = []
+        for name in self._started_agents(event):
+            if name not in self.agents_seen:
+                self.agents_seen.add(name)
+                frames.append({"type": "agent", "agent": name})
+        if event.branch:
+            return frames
+
+        parts = event.content.parts if event.content and event.content.parts else []
+        text = "".join(part.text for part in parts if part.text and not part.thought)
+        if event.partial:
+            self._text += text
+            frames += self._advance(event.author, final=False)
+        elif text:
+            # The final event repeats the whole message the partial ones streamed
+            self._text = text if text.startswith(self._text[:self._handled]) else self._text[:self._handled] + text
+            frames += self._advance(event.author, final=True)
+            frames += self._end_message()
+        return frames
+
+    def done(self) -> dict:
+        return {
+            "type": "done",
+            "answer": self.answer,
+            "citations": self.citations,
+            "related_questions": self.related_questions,
+        }
+
+    def _started_agents(self, event) -> List[str]:
+        names = [event.author] if event.author and event.author != "user" else []
+        for call in event.get_function_calls():
+            if call.name == "transfer_to_agent" and call.args and call.args.get("agent_name"):
+                names.append(call.args["agent_name"])
+        return names
+
+    def _advance(self, agent: str, final: bool) -> List[dict]:
+        tokens = []
+        frames = []
+        if self._handled == 0:
+            prefix = AGENT_PREFIX_RE.match(self._text)
+            if prefix:
+                self._handled = prefix.end()
+            elif not final and self._text.lstrip().startswith("[") and "]" not in self._text:
+                return frames  # Possibly a prefix still being written
+
+        while self._handled < len(self._text):
+            rest = self._text[self._handled:]
+            newline = rest.find("\n")
+            line = rest if newline < 0 else rest[:newline + 1]
+            if newline < 0 and not final and (self._section or (self._line_start and _could_be_header(line))):
+                break  # Wait for the rest of the line
+
+            header = HEADER_RE.match(line) if self._line_start else None
+            if header:
+                self._section = HEADERS[header.group(1).lower()]
+                line = header.group(2)
+            if self._section:
+                item = _item(line)
+                if item and self._section == "citations":
+                    self._citations.append(item)
+                    index = len(self.citations) + len(self._citations)
+                    frames.append({"type": "citation", "index": index, "text": item})
+                elif item:
+                    self._related.append(item)
+            else:
+                tokens.append(line)
+            self._handled += len(rest) if newline < 0 else newline + 1
+            self._line_start = newline >= 0
+
+        if tokens:
+            text = "".join(tokens)
+            if not self._body and self.answer:
+                text = "\n\n" + text  # A second message of the run
+            self._body += text
+            frames.insert(0, {"type": "token", "agent": agent, "text": text})
+        return frames
+
+    def _end_message(self) -> List[dict]:
+        frames = []
+        if self._body.strip():
+            self.answer = (self.answer + self._body).strip()
+        self.citations += self._citations
+        if self._related:
+            self.related_questions = self._related
+            frames.append({"type": "related_questions", "questions": self._related})
+        self._start_message()
+        return frames
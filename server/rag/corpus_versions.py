@@ -0,0 +1,62 @@
+"""Version markers for the retrieval corpora.
+
+A small JSON file maps each corpus name (asha_training, forum) to an opaque
+version string. The ingestion scripts bump a corpus' version after they
+change its contents; caches in front of retrieval or the agents compare the
+versions they were filled under with the current ones and drop anything
+stale. The file is shared between processes, so readers re-read it when its
+modification time changes.
+"""
+
+import json
+import os
+import threading
+import time
+import uuid
+from typing import Dict, Optional
+
+CORPUS_VERSION_FILE = os.environ.get(
+    "RAG_CORPUS_VERSION_FILE",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), ".corpus_versions.json"),
+)
+
+TRAINING_CORPUS = "asha_training"
+FORUM_CORPUS = "forum"
+
+_lock = threading.Lock()
+_cached: Dict[str, str] = {}
+_cached_mtime: Optional[float] = None
+
+
+def corpus_versions(path: str = CORPUS_VERSION_FILE) -> Dict[str, str]:
+    """Current version of every corpus; empty if nothing was ever synced."""
+    global _cached, _cached_mtime
+    try:
+        mtime = os.stat(path).st_mtime_ns
+    except FileNotFoundError:
+        return {}
+    with _lock:
+        if mtime != _cached_mtime:
+            try:
+                with open(path, encoding="utf-8") as f:
+                    _cached = json.load(f)
+            except ValueError:
+                _cached = {}
+            _cached_mtime = mtime
+        return dict(_cached)
+
+
+def bump_corpus_version(corpus: str, version: Optional[str] = None, path: str = CORPUS_VERSION_FILE) -> str:
+    """Record that corpus changed; returns the new version."""
+    version = version or f"{int(time.time())}-{uuid.uuid4().hex[:8]}"
+    try:
+        with open(path, encoding="utf-8") as f:
+            versions = json.load(f)
+    except (FileNotFoundError, ValueError):
+        versions = {}
+    versions[corpus] = version
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(versions, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, path)
+    return version
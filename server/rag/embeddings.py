@@ -0,0 +1,137 @@
+"""Offline text embeddings for the local retrieval index.
+
+HashingEmbedder maps text to a fixed-size vector without a model download or
+a network call: word unigrams and bigrams are hashed into `dim` signed
+buckets, weighted by sublinear term frequency and, once fitted on the corpus,
+by per-bucket inverse document frequency, then L2-normalised. Cosine
+similarity between these vectors is a TF-IDF similarity, which is a good
+match for short, keyword-heavy health questions and runs in well under a
+millisecond per query on a CPU.
+
+Any object with `dim`, `embed(texts)` and `to_config()` can stand in for it,
+e.g. a wrapper around a sentence-transformer; the index records which
+embedder built it.
+"""
+
+import math
+import re
+import zlib
+from collections import Counter
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+
+TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+# \w alone splits Indic words at their vowel signs ("नहीं" -> "नह"), so
+# anything that must tell such words apart also takes the combining marks
+WORD_RE = re.compile(r"[\w\u0300-\u036f\u0900-\u0dff]+")
+
+STOPWORDS = frozenset(
+    "a an and are as at be but by can do does for from has have how i if in into is it its "
+    "me my no not of on or our should so than that the their them then there these they this "
+    "to was we what when where which who why will with you your".split()
+)
+
+
+# Words a retrieval query can drop but a question cannot: "should I not
+# give", "when should" and "why should" ask different things. "t" is what
+# is left of "don't", "can't" and "shouldn't".
+NEGATIONS = frozenset("no not never nor without cannot t नहीं मत ना न".split())
+QUESTION_WORDS = frozenset("how what when where which who whom whose why should can could must may".split())
+
+
+def tokenize(text: str) -> List[str]:
+    return [token for token in TOKEN_RE.findall(text.lower()) if token not in STOPWORDS]
+
+
+def question_tokens(text: str) -> List[str]:
+    """Tokens of a question, keeping negations, question words and numbers."""
+    return [
+        token for token in WORD_RE.findall(text.lower())
+        if token not in STOPWORDS or token in NEGATIONS or token in QUESTION_WORDS
+    ]
+
+
+def normalize_query(text: str) -> str:
+    """Lower-cased words without punctuation, single-spaced: the cache key of a query."""
+    return " ".join(WORD_RE.findall(text.lower()))
+
+
+class HashingEmbedder:
+    kind = "hashing"
+
+    def __init__(
+        self,
+        dim: int = 768,
+        bigram_weight: float = 0.5,
+        idf: Optional[np.ndarray] = None,
+        question_words: bool = False,
+    ):
+        self.dim = dim
+        self.bigram_weight = bigram_weight
+        self.idf = idf
+        # Embed with question_tokens() instead of tokenize(), for matching questions to questions
+        self.question_words = question_words
+
+    def _features(self, text: str) -> Dict[str, float]:
+        tokens = question_tokens(text) if self.question_words else tokenize(text)
+        counts = Counter(tokens)
+        features = {token: 1.0 + math.log(count) for token, count in counts.items()}
+        bigrams = Counter(f"{a} {b}" for a, b in zip(tokens, tokens[1:]))
+        for bigram, count in bigrams.items():
+            features[bigram] = self.bigram_weight * (1.0 + math.log(count))
+        return features
+
+    def _bucket(self, feature: str):
+        h = zlib.crc32(feature.encode("utf-8"))
+        return h % self.dim, (1.0 if (h >> 31) & 1 else -1.0)
+
+    def embed(self, texts: Iterable[str]) -> np.ndarray:
+        texts = list(texts)
+        vectors = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for feature, weight in self._features(text).items():
+                bucket, sign = self._bucket(feature)
+                vectors[row, bucket] += sign * weight
+        if self.idf is not None:
+            vectors *= self.idf
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return vectors / norms
+
+    def fit_idf(self, texts: Iterable[str]):
+        """Learn per-bucket inverse document frequencies from the corpus."""
+        document_frequency = np.zeros(self.dim, dtype=np.float64)
+        documents = 0
+        for text in texts:
+            documents += 1
+            buckets = {self._bucket(feature)[0] for feature in self._features(text)}
+            document_frequency[list(buckets)] += 1
+        self.idf = (np.log((documents + 1) / (document_frequency + 1)) + 1).astype(np.float32)
+        return self
+
+    def to_config(self) -> dict:
+        return {
+            "kind": self.kind,
+            "dim": self.dim,
+            "bigram_weight": self.bigram_weight,
+            "idf": self.idf.tolist() if self.idf is not None else None,
+            "question_words": self.question_words,
+        }
+
+    @classmethod
+    def from_config(cls, config: dict) -> "HashingEmbedder":
+        idf = np.asarray(config["idf"], dtype=np.float32) if config.get("idf") is not None else None
+        return cls(
+            dim=config["dim"],
+            bigram_weight=config.get("bigram_weight", 0.5),
+            idf=idf,
+            question_words=config.get("question_words", False),
+        )
+
+
+EMBEDDERS = {HashingEmbedder.kind: HashingEmbedder}
+
+
+def embedder_from_config(config: dict):
+    return EMBEDDERS[config["kind"]].from_config(config)
@@ -0,0 +1,212 @@
+"""Parallel fan-out orchestration of the sub-agents.
+
+The default root agent delegates one sub-agent at a time (training first,
+then forum "if insufficient", then web search), so a question costs the sum
+of those LLM and retrieval hops. FanOutOrchestrator instead routes a
+question to every relevant sub-agent at once and runs them concurrently,
+each in its own branch so they do not see one another's events.
+
+Each branch has a deadline counted from the start of the fan-out; a branch
+still running at its deadline is cancelled and left out. The answers that
+did arrive are put, in sub-agent order (training > forum > web >
+diagnostic), into the `fanout_findings` state key and handed to the
+synthesizer agent, which writes the final answer. If the synthesizer fails
+or misses its own deadline, the findings are returned as they are, highest
+priority first.
+
+Sub-agents and the synthesizer can be any BaseAgent, so the orchestration
+can be exercised with stub agents and no model calls.
+"""
+
+import asyncio
+import logging
+import re
+import time
+from typing import AsyncGenerator, Callable, Dict, List, Optional
+
+from google.adk.agents import BaseAgent
+from google.adk.agents.invocation_context import InvocationContext
+from google.adk.events import Event, EventActions
+from google.genai import types
+
+logger = logging.getLogger(__name__)
+
+FINDINGS_KEY = "fanout_findings"
+
+WEB_RE = re.compile(r"\b(latest|recent|current|new|news|research|study|studies|update[sd]?|20\d\d)\b", re.IGNORECASE)
+DIAGNOSTIC_RE = re.compile(
+    r"\b(report|lab|test results?|blood pressure log|readings?|haemoglobin|hemoglobin|hb level|scan|ultrasound)\b",
+    re.IGNORECASE,
+)
+
+
+def default_router(query: str, has_attachments: bool) -> List[str]:
+    """Sub-agents to consult for a question."""
+    agents = ["training_module_agent", "forum_agent"]
+    if WEB_RE.search(query):
+        agents.append("web_search_agent")
+    if has_attachments or DIAGNOSTIC_RE.search(query):
+        agents.append("diagnostic_agent")
+    return agents
+
+
+def parse_deadlines(spec: str) -> Dict[str, float]:
+    """"web_search_agent=12,forum_agent=8" -> {"web_search_agent": 12.0, "forum_agent": 8.0}"""
+    deadlines = {}
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        name, _, seconds = item.partition("=")
+        deadlines[name.strip()] = float(seconds)
+    return deadlines
+
+
+class FanOutOrchestrator(BaseAgent):
+    """Runs the routed sub-agents concurrently and synthesises what returns in time.
+
+    sub_agents are listed in priority order; the synthesizer is appended to
+    them so its events belong to the agent tree.
+    """
+
+    synthesizer: Optional[BaseAgent] = None
+    router: Callable[[str, bool], List[str]] = default_router
+    default_deadline: float = 25.0
+    deadlines: Dict[str, float] = {}
+    synthesis_deadline: float = 20.0
+
+    def model_post_init(self, __context) -> None:
+        if self.synthesizer is not None and self.synthesizer not in self.sub_agents:
+            self.sub_agents.append(self.synthesizer)
+        super().model_post_init(__context)
+
+    @property
+    def branch_agents(self) -> List[BaseAgent]:
+        return [agent for agent in self.sub_agents if agent is not self.synthesizer]
+
+    async def _run_async_impl(self, ctx: InvocationContext) -> AsyncGenerator[Event, None]:
+        query, has_attachments = _question(ctx.user_content)
+        routed = set(self.router(query, has_attachments))
+        agents = [agent for agent in self.branch_agents if agent.name in routed] or self.branch_agents[:1]
+
+        answers: Dict[str, str] = {}
+        async for event in self._fan_out(ctx, agents, answers):
+            yield event
+
+        findings = _format_findings(agents, answers)
+        yield Event(
+            invocation_id=ctx.invocation_id,
+            author=self.name,
+            branch=ctx.branch,
+            actions=EventActions(state_delta={FINDINGS_KEY: findings}),
+        )
+
+        if self.synthesizer is not None and answers:
+            synthesized = False
+            runs = {self.synthesizer.name: self.synthesizer.run_async(ctx)}
+            deadline_at = {self.synthesizer.name: time.monotonic() + self.synthesis_deadline}
+            async for _, event in _merge_until(runs, deadline_at):
+                synthesized = synthesized or _text(event) is not None
+                yield event
+            if synthesized:
+                return
+            logger.warning("Synthesis did not finish within %.1fs; returning findings", self.synthesis_deadline)
+
+        yield Event(
+            invocation_id=ctx.invocation_id,
+            author=self.name,
+            branch=ctx.branch,
+            content=types.Content(role="model", parts=[types.Part(text=_fallback_answer(agents, answers))]),
+        )
+
+    async def _fan_out(self, ctx: InvocationContext, agents: List[BaseAgent], answers: Dict[str, str]):
+        started = time.monotonic()
+        runs, deadline_at = {}, {}
+        for agent in agents:
+            branch = f"{ctx.branch}.{agent.name}" if ctx.branch else f"{self.name}.{agent.name}"
+            runs[agent.name] = agent.run_async(ctx.model_copy(update={"branch": branch}))
+            deadline_at[agent.name] = started + self.deadlines.get(agent.name, self.default_deadline)
+
+        async for name, event in _merge_until(runs, deadline_at):
+            text = _text(event)
+            if text is not None and event.author == name:
+                answers[name] = text
+            yield event
+
+
+async def _merge_until(runs: Dict[str, AsyncGenerator], deadline_at: Dict[str, float]):
+    """Merge event generators, cancelling each one still running at its deadline.
+
+    Each generator is driven by its own task from start to end, so its
+    tracing spans open and close in one context. Like ParallelAgent, a
+    generator only moves on once its previous event has been taken by the
+    runner, so every event is in the session before the next model call of
+    that branch reads it.
+    """
+    queue: asyncio.Queue = asyncio.Queue()
+
+    async def drive(name, run):
+        try:
+            async for event in run:
+                taken = asyncio.Event()
+                await queue.put((name, event, taken))
+                await taken.wait()
+        except Exception as e:
+            logger.warning("Sub-agent %s failed: %s", name, e)
+        finally:
+            await queue.put((name, None, None))
+
+    tasks = {name: asyncio.create_task(drive(name, run)) for name, run in runs.items()}
+    try:
+        while tasks:
+            timeout = min(deadline_at[name] for name in tasks) - time.monotonic()
+            try:
+                name, event, taken = await asyncio.wait_for(queue.get(), max(0.0, timeout))
+            except asyncio.TimeoutError:
+                now = time.monotonic()
+                for name in [name for name in tasks if deadline_at[name] <= now]:
+                    logger.warning("Sub-agent %s missed its deadline; cancelled", name)
+                    tasks.pop(name).cancel()
+                continue
+            if name not in tasks:
+                continue  # Cancelled branch unwinding
+            if event is None:
+                del tasks[name]
+                continue
+            try:
+                yield name, event
+            finally:
+                taken.set()
+    finally:
+        for task in tasks.values():
+            task.cancel()
+
+
+def _question(content: Optional[types.Content]):
+    if content is None or not content.parts:
+        return "", False
+    text = " ".join(part.text for part in content.parts if part.text)
+    return text, any(part.text is None for part in content.parts)
+
+
+def _text(event: Event) -> Optional[str]:
+    """Final, non-thought text of an event, if it has any."""
+    if event.partial or not event.content or not event.content.parts:
+        return None
+    text = "".join(part.text for part in event.content.parts if part.text and not part.thought).strip()
+    return text or None
+
+
+def _format_findings(agents: List[BaseAgent], answers: Dict[str, str]) -> str:
+    sections = []
+    for priority, agent in enumerate(agents, 1):
+        answer = answers.get(agent.name, "(no answer in time)")
+        sections.append(f"{priority}. {agent.name} ({agent.description}):\n{answer}")
+    return "\n\n".join(sections)
+
+
+def _fallback_answer(agents: List[BaseAgent], answers: Dict[str, str]) -> str:
+    ordered = [answers[agent.name] for agent in agents if agent.name in answers]
+    if not ordered:
+        return (
+            "Sorry, I could not find an answer in time. Please try again, or ask a senior ASHA "
+            "or ANM for guidance."
+        )
+    return "\n\n".join(ordered)
@@ -0,0 +1,161 @@
+"""Reranking of retrieved chunks before they reach a sub-agent.
+
+Both RAG tools retrieve similarity_top_k=20 chunks, and every one of them
+ends up in the sub-agent's prompt. The reranker keeps only the few that are
+worth the tokens:
+
+1. Fusion: each candidate gets a weighted sum of its vector similarity
+   (1 - distance) and a BM25 score of the query against the candidate set,
+   both min-max normalised; `alpha` weighs the vector side.
+2. Cross-encoder (optional): with RERANK_CROSS_ENCODER naming a
+   sentence-transformers cross-encoder, the best fused candidates are
+   re-ordered by its query/chunk relevance scores, on the CPU.
+3. Dedupe: a chunk from the same source and page as one already kept, whose
+   words largely overlap it (the overlapping windows of a module page), is
+   dropped.
+4. Budget: chunks are kept best first until `top_k` of them, or the next
+   one would take the total past `token_budget` estimated tokens; lower
+   ranked chunks are not used to fill what is left. The best chunk is kept
+   whatever its size.
+"""
+
+import logging
+import math
+import os
+from collections import Counter
+from typing import List, Optional
+
+from .embeddings import tokenize
+
+logger = logging.getLogger(__name__)
+
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+
+def estimate_tokens(text: str) -> int:
+    # About four characters per token for Gemini on English text
+    return max(1, len(text) // 4)
+
+
+def bm25_scores(query: str, documents: List[str]) -> List[float]:
+    """BM25 of query against each document, with statistics from documents alone."""
+    return _bm25(set(tokenize(query)), [tokenize(document) for document in documents])
+
+
+def _bm25(query_terms: set, tokenized: List[List[str]]) -> List[float]:
+    if not tokenized:
+        return []
+    average_length = sum(len(tokens) for tokens in tokenized) / len(tokenized) or 1.0
+    document_frequency = Counter(token for tokens in tokenized for token in set(tokens))
+    count = len(tokenized)
+
+    scores = []
+    for tokens in tokenized:
+        frequencies = Counter(tokens)
+        length_norm = BM25_K1 * (1 - BM25_B + BM25_B * len(tokens) / average_length)
+        score = 0.0
+        for term in query_terms:
+            frequency = frequencies.get(term)
+            if frequency:
+                idf = math.log(1 + (count - document_frequency[term] + 0.5) / (document_frequency[term] + 0.5))
+                score += idf * frequency * (BM25_K1 + 1) / (frequency + length_norm)
+        scores.append(score)
+    return scores
+
+
+def _min_max(values: List[float]) -> List[float]:
+    low, high = min(values), max(values)
+    if high - low < 1e-9:
+        return [1.0 if high > 0 else 0.0 for _ in values]
+    return [(value - low) / (high - low) for value in values]
+
+
+def _overlap(a: set, b: set) -> float:
+    # Share of the smaller chunk's words found in the other
+    if not a or not b:
+        return 0.0
+    return len(a & b) / min(len(a), len(b))
+
+
+def load_cross_encoder(model_name: str):
+    """A CPU sentence-transformers cross-encoder, or None if it is not installed."""
+    try:
+        from sentence_transformers import CrossEncoder
+    except ImportError:
+        logger.warning("sentence-transformers is not installed; reranking without %s", model_name)
+        return None
+    return CrossEncoder(model_name, device="cpu")
+
+
+class Reranker:
+
+    def __init__(
+        self,
+        top_k: int = 6,
+        token_budget: int = 2000,
+        alpha: float = 0.5,
+        dedupe_overlap: float = 0.5,
+        cross_encoder=None,
+        cross_encoder_candidates: int = 12,
+    ):
+        self.top_k = top_k
+        self.token_budget = token_budget
+        self.alpha = alpha
+        self.dedupe_overlap = dedupe_overlap
+        self.cross_encoder = cross_encoder
+        self.cross_encoder_candidates = cross_encoder_candidates
+
+    @classmethod
+    def from_env(cls) -> Optional["Reranker"]:
+        """The configured reranker, or None with RERANK_TOP_K=0."""
+        top_k = int(os.environ.get("RERANK_TOP_K", "6"))
+        if top_k <= 0:
+            return None
+        model_name = os.environ.get("RERANK_CROSS_ENCODER")
+        return cls(
+            top_k=top_k,
+            token_budget=int(os.environ.get("RERANK_TOKEN_BUDGET", "2000")),
+            alpha=float(os.environ.get("RERANK_ALPHA", "0.5")),
+            cross_encoder=load_cross_encoder(model_name) if model_name else None,
+        )
+
+    def rerank(self, query: str, chunks: List) -> List:
+        """The chunks worth passing on, best first.
+
+        chunks are RetrievedChunk-like: text, distance, source and metadata.
+        """
+        if not chunks:
+            return []
+        tokenized = [tokenize(chunk.text) for chunk in chunks]
+        words = {id(chunk): set(tokens) for chunk, tokens in zip(chunks, tokenized)}
+        similarity = _min_max([1.0 - chunk.distance for chunk in chunks])
+        lexical = _min_max(_bm25(set(tokenize(query)), tokenized))
+        fused = [self.alpha * v + (1 - self.alpha) * l for v, l in zip(similarity, lexical)]
+        order = sorted(range(len(chunks)), key=lambda i: -fused[i])
+        ranked = [chunks[i] for i in order]
+
+        if self.cross_encoder is not None:
+            head = ranked[:self.cross_encoder_candidates]
+            scores = self.cross_encoder.predict([(query, chunk.text) for chunk in head])
+            head = [chunk for _, chunk in sorted(zip(scores, head), key=lambda pair: -pair[0])]
+            ranked = head + ranked[self.cross_encoder_candidates:]
+
+        kept = []
+        used = 0
+        for chunk in ranked:
+            page = (chunk.source, chunk.metadata.get("page"))
+            if any(
+                page == (other.source, other.metadata.get("page"))
+                and _overlap(words[id(chunk)], words[id(other)]) >= self.dedupe_overlap
+                for other in kept
+            ):
+                continue
+            tokens = estimate_tokens(chunk.text)
+            if kept and used + tokens > self.token_budget:
+                break
+            kept.append(chunk)
+            used += tokens
+            if len(kept) >= self.top_k:
+                break
+        return kept
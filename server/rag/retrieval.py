@@ -0,0 +1,220 @@
+"""Corpus retrieval tools with a pluggable backend.
+
+CorpusRetrieval exposes the same tool interface as VertexAiRagRetrieval: one
+`query` argument, `similarity_top_k` and `vector_distance_threshold`, and a
+list of chunk texts back (or a "No matching result" message). The search
+itself is done by a backend:
+
+    LocalIndexBackend  an on-disk VectorIndex searched in-process, no network
+    VertexRagBackend   rag.retrieval_query against a Vertex AI RAG corpus
+
+retrieval_tool() picks one from RAG_RETRIEVAL_BACKEND:
+
+    vertex-tool (default)  CorpusRetrieval over VertexRagBackend: the Vertex AI
+                           RAG corpus called as a function tool
+    vertex                 VertexAiRagRetrieval, i.e. Gemini's built-in retrieval
+    local                  CorpusRetrieval over RAG_LOCAL_INDEX_DIR/<index name>,
+                           built by shared_libraries/build_local_index.py
+
+Distances are comparable only within one embedder, so a local index usually
+needs its own threshold; RAG_LOCAL_DISTANCE_THRESHOLD overrides the one the
+tool is declared with.
+
+CorpusRetrieval results can be kept in a RetrievalCache and cut down by a
+Reranker before they are returned. The vertex backend retrieves inside the
+Gemini request, out of the tool layer's reach, so its lookups are neither
+cached nor reranked; it is kept as an opt-out.
+"""
+
+import asyncio
+import logging
+import os
+from dataclasses import dataclass, field
+from typing import Any, List, Optional
+
+from google.adk.tools.retrieval.base_retrieval_tool import BaseRetrievalTool
+from google.adk.tools.tool_context import ToolContext
+
+from .embeddings import embedder_from_config
+from .reranker import Reranker
+from .retrieval_cache import RetrievalCache
+from .vector_index import VectorIndex
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_LOCAL_INDEX_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "local_index")
+
+
+@dataclass
+class RetrievedChunk:
+    text: str
+    distance: float
+    chunk_id: str = ""
+    source: str = ""
+    metadata: dict = field(default_factory=dict)
+
+
+class LocalIndexBackend:
+
+    def __init__(self, index_dir: str):
+        self.index_dir = index_dir
+        self.index = VectorIndex.load(index_dir)
+        self.embedder = embedder_from_config(self.index.meta["embedder"])
+
+    @property
+    def version(self) -> str:
+        return self.index.version
+
+    def retrieve(self, query: str, top_k: int, max_distance: Optional[float]) -> List[RetrievedChunk]:
+        query_vector = self.embedder.embed([query])[0]
+        return [
+            RetrievedChunk(
+                text=hit.chunk["text"],
+                distance=hit.distance,
+                chunk_id=hit.chunk["id"],
+                source=hit.chunk.get("source", ""),
+                metadata={key: value for key, value in hit.chunk.items() if key not in ("id", "text", "source")},
+            )
+            for hit in self.index.search(query_vector, top_k=top_k, max_distance=max_distance)
+        ]
+
+
+class VertexRagBackend:
+
+    def __init__(self, rag_corpus: str):
+        self.rag_corpus = rag_corpus
+
+    @property
+    def version(self) -> str:
+        # The managed corpus does not expose a content version
+        return self.rag_corpus
+
+    def retrieve(self, query: str, top_k: int, max_distance: Optional[float]) -> List[RetrievedChunk]:
+        from vertexai.preview import rag
+
+        response = rag.retrieval_query(
+            text=query,
+            rag_resources=[rag.RagResource(rag_corpus=self.rag_corpus)],
+            similarity_top_k=top_k,
+            vector_distance_threshold=max_distance,
+        )
+        return [
+            RetrievedChunk(
+                text=context.text,
+                distance=context.distance,
+                chunk_id=context.source_uri,
+                source=context.source_uri,
+            )
+            for context in response.contexts.contexts
+        ]
+
+
+class CorpusRetrieval(BaseRetrievalTool):
+    """Retrieval tool backed by any object with retrieve(query, top_k, max_distance).
+
+    With a cache, repeated lookups of the same corpus, query, top_k and
+    threshold are served from memory until the corpus version changes. With
+    a reranker, the similarity_top_k candidates are narrowed down to the few
+    best within its token budget.
+    """
+
+    def __init__(
+        self,
+        *,
+        name: str,
+        description: str,
+        backend,
+        corpus: str = "",
+        similarity_top_k: int = 10,
+        vector_distance_threshold: Optional[float] = None,
+        cache: Optional[RetrievalCache] = None,
+        reranker: Optional[Reranker] = None,
+    ):
+        super().__init__(name=name, description=description)
+        self.backend = backend
+        self.corpus = corpus or name
+        self.similarity_top_k = similarity_top_k
+        self.vector_distance_threshold = vector_distance_threshold
+        self.cache = cache
+        self.reranker = reranker
+
+    def retrieve(self, query: str) -> List[RetrievedChunk]:
+        return self.backend.retrieve(query, self.similarity_top_k, self.vector_distance_threshold)
+
+    async def run_async(self, *, args: dict[str, Any], tool_context: ToolContext) -> Any:
+        query = args["query"]
+        key = None
+        chunks = None
+        if self.cache is not None:
+            key = self.cache.key(self.corpus, query, self.similarity_top_k, self.vector_distance_threshold)
+            chunks = self.cache.get(key, self.backend.version)
+
+        if chunks is None:
+            if isinstance(self.backend, LocalIndexBackend):
+                chunks = self.retrieve(query)
+            else:
+                # Keep the event loop free while a remote backend is called
+                chunks = await asyncio.to_thread(self.retrieve, query)
+            if key is not None:
+                self.cache.put(key, self.backend.version, chunks)
+        if self.reranker is not None:
+            chunks = self.reranker.rerank(query, chunks)
+        logger.debug("%s retrieved %d chunks", self.name, len(chunks))
+
+        if not chunks:
+            return (
+                f"No matching result found with the config: similarity_top_k={self.similarity_top_k}, "
+                f"vector_distance_threshold={self.vector_distance_threshold}"
+            )
+        return [chunk.text for chunk in chunks]
+
+
+def retrieval_tool(
+    *,
+    name: str,
+    description: str,
+    rag_corpus: Optional[str],
+    index_name: str,
+    similarity_top_k: int,
+    vector_distance_threshold: float,
+    backend: Optional[str] = None,
+    cache: Optional[RetrievalCache] = None,
+    reranker: Optional[Reranker] = None,
+):
+    """Build the retrieval tool for one corpus with the configured backend."""
+    # Read at call time: agent.py loads .env after importing this module
+    backend = backend or os.environ.get("RAG_RETRIEVAL_BACKEND", "vertex-tool")
+    if backend == "vertex":
+        from google.adk.tools.retrieval.vertex_ai_rag_retrieval import VertexAiRagRetrieval
+        from vertexai.preview import rag
+
+        return VertexAiRagRetrieval(
+            name=name,
+            description=description,
+            rag_resources=[rag.RagResource(rag_corpus=rag_corpus)],
+            similarity_top_k=similarity_top_k,
+            vector_distance_threshold=vector_distance_threshold,
+        )
+    if backend == "vertex-tool":
+        # Vertex AI RAG called as a function tool instead of built-in retrieval
+        retrieval_backend = VertexRagBackend(rag_corpus)
+    elif backend == "local":
+        retrieval_backend = LocalIndexBackend(
+            os.path.join(os.environ.get("RAG_LOCAL_INDEX_DIR", DEFAULT_LOCAL_INDEX_DIR), index_name)
+        )
+        local_threshold = os.environ.get("RAG_LOCAL_DISTANCE_THRESHOLD")
+        if local_threshold:
+            vector_distance_threshold = float(local_threshold)
+    else:
+        raise ValueError(f"Unknown RAG_RETRIEVAL_BACKEND {backend!r}: expected vertex, vertex-tool or local")
+
+    return CorpusRetrieval(
+        name=name,
+        description=description,
+        backend=retrieval_backend,
+        corpus=index_name,
+        similarity_top_k=similarity_top_k,
+        vector_distance_threshold=vector_distance_threshold,
+        cache=cache,
+        reranker=reranker,
+    )
@@ -0,0 +1,105 @@
+"""In-memory cache of retrieval results.
+
+The same lookups reach the RAG tools again and again, within a session and
+across users. This cache sits in the tool layer, below the answer cache:
+it stores the ranked chunks (id, distance, text, source) of one retrieval,
+keyed by corpus, normalised query, similarity_top_k and
+vector_distance_threshold, so a repeated lookup is served from memory
+instead of the corpus.
+
+Entries are evicted least-recently-used beyond `max_entries` and expire
+after `ttl` seconds. Each entry records the corpus version it was filled
+under, from the backend (a local index's content hash) and from the version
+marker the sync scripts bump (corpus_versions.py); when either changes, all
+entries of that corpus are dropped.
+"""
+
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Hashable, List, Optional, Tuple
+
+from .corpus_versions import corpus_versions
+from .embeddings import normalize_query
+
+
+class RetrievalCache:
+
+    def __init__(self, max_entries: int = 2048, ttl: float = 900, versions=corpus_versions):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.versions = versions
+        self._lock = threading.Lock()
+        # key -> (version, created_at, chunks)
+        self._entries: "OrderedDict[tuple, Tuple[Hashable, float, List]]" = OrderedDict()
+        self._current: Dict[str, Hashable] = {}
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    @classmethod
+    def from_env(cls) -> "RetrievalCache":
+        return cls(
+            max_entries=int(os.environ.get("RETRIEVAL_CACHE_SIZE", "2048")),
+            ttl=float(os.environ.get("RETRIEVAL_CACHE_TTL", "900")),
+        )
+
+    def key(self, corpus: str, query: str, top_k: int, threshold: Optional[float]) -> tuple:
+        return corpus, normalize_query(query), top_k, threshold
+
+    def get(self, key: tuple, backend_version: Hashable) -> Optional[List]:
+        version = self._version(key[0], backend_version)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] != version or entry[1] < time.time() - self.ttl:
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[2]
+
+    def put(self, key: tuple, backend_version: Hashable, chunks: List):
+        if self.max_entries <= 0:
+            return
+        version = self._version(key[0], backend_version)
+        with self._lock:
+            self._entries[key] = (version, time.time(), chunks)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, corpus: str):
+        with self._lock:
+            self._drop_corpus(corpus)
+
+    def _version(self, corpus: str, backend_version: Hashable) -> Hashable:
+        version = (backend_version, self.versions().get(corpus))
+        with self._lock:
+            if self._current.get(corpus, version) != version:
+                # The corpus changed: nothing cached for it is valid any more
+                self._drop_corpus(corpus)
+            self._current[corpus] = version
+        return version
+
+    def _drop_corpus(self, corpus: str):
+        for key in [key for key in self._entries if key[0] == corpus]:
+            del self._entries[key]
+            self.invalidations += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+            }
@@ -0,0 +1,189 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Local, content-addressed cache for downloaded source documents.
+
+Files are stored once under objects/<sha256>. index.json maps each URL to
+its current object together with the ETag and Last-Modified the server sent,
+so a later fetch is a conditional GET: a 304 reuses the cached file without
+transferring it again. An interrupted download is kept under partial/ and
+resumed with a Range request, guarded by If-Range so a file that changed in
+the meantime is fetched from the start instead of being spliced together.
+
+Downloads share one pooled requests.Session and run concurrently through
+fetch_many.
+"""
+
+import hashlib
+import json
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+ARTIFACT_CACHE_DIR = os.getenv(
+    "ASHA_ARTIFACT_CACHE",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), ".artifact_cache"),
+)
+DOWNLOAD_WORKERS = int(os.getenv("ASHA_DOWNLOAD_WORKERS", "4"))
+DOWNLOAD_TIMEOUT = float(os.getenv("ASHA_DOWNLOAD_TIMEOUT", "60"))  # seconds between bytes
+DOWNLOAD_ATTEMPTS = int(os.getenv("ASHA_DOWNLOAD_ATTEMPTS", "3"))  # each retry resumes the partial file
+CHUNK_SIZE = 256 * 1024
+
+
+@dataclass
+class Artifact:
+  url: str
+  path: str
+  sha256: str
+  size: int
+  changed: bool        # content differs from what the cache held before
+  downloaded: int      # bytes transferred by this fetch (0 on a 304)
+
+
+class ArtifactCache:
+
+  def __init__(self, root: str = ARTIFACT_CACHE_DIR, workers: int = DOWNLOAD_WORKERS):
+    self.root = root
+    self.workers = max(1, workers)
+    self._index_path = os.path.join(root, "index.json")
+    self._lock = threading.Lock()
+    os.makedirs(os.path.join(root, "objects"), exist_ok=True)
+    os.makedirs(os.path.join(root, "partial"), exist_ok=True)
+    self._index: Dict[str, dict] = {}
+    if os.path.exists(self._index_path):
+      with open(self._index_path, encoding="utf-8") as f:
+        self._index = json.load(f)
+
+    self.session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=self.workers, pool_maxsize=self.workers, max_retries=2)
+    self.session.mount("http://", adapter)
+    self.session.mount("https://", adapter)
+
+  # Layout
+  def _object_path(self, sha256: str) -> str:
+    return os.path.join(self.root, "objects", sha256)
+
+  def _partial_path(self, url: str) -> str:
+    return os.path.join(self.root, "partial", hashlib.sha256(url.encode("utf-8")).hexdigest())
+
+  def _save_index(self):
+    tmp_path = self._index_path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+      json.dump(self._index, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, self._index_path)
+
+  def _read_meta(self, path: str) -> dict:
+    try:
+      with open(path, encoding="utf-8") as f:
+        return json.load(f)
+    except (OSError, ValueError):
+      return {}
+
+  # Fetching
+  def fetch(self, url: str) -> Artifact:
+    """Return the cached file for url, downloading only what is missing or stale."""
+    with self._lock:
+      entry = self._index.get(url)
+    if entry and not os.path.exists(self._object_path(entry["sha256"])):
+      entry = None  # object removed by hand: download again
+
+    headers = {}
+    if entry:
+      if entry.get("etag"):
+        headers["If-None-Match"] = entry["etag"]
+      if entry.get("last_modified"):
+        headers["If-Modified-Since"] = entry["last_modified"]
+
+    partial_path = self._partial_path(url)
+    meta_path = partial_path + ".json"
+    offset = os.path.getsize(partial_path) if os.path.exists(partial_path) else 0
+    partial_meta = self._read_meta(meta_path) if offset else {}
+    validator = partial_meta.get("etag") or partial_meta.get("last_modified")
+    if offset and validator:
+      headers["Range"] = f"bytes={offset}-"
+      headers["If-Range"] = validator
+    else:
+      offset = 0
+
+    with self.session.get(url, headers=headers, stream=True, timeout=DOWNLOAD_TIMEOUT) as response:
+      if response.status_code == 304 and entry:
+        print(f"Not modified: {url}")
+        return Artifact(url, self._object_path(entry["sha256"]), entry["sha256"], entry["size"], False, 0)
+      if response.status_code == 416 and offset:
+        # The partial file is already complete (or bogus): start over
+        os.remove(partial_path)
+        os.remove(meta_path)
+        return self.fetch(url)
+      response.raise_for_status()
+
+      if response.status_code == 206:
+        print(f"Resuming {url} at byte {offset}")
+        mode = "ab"
+      else:
+        offset = 0
+        mode = "wb"
+        # Remember the validators first, so an interruption can be resumed
+        with open(meta_path, "w", encoding="utf-8") as f:
+          json.dump({
+              "etag": response.headers.get("ETag"),
+              "last_modified": response.headers.get("Last-Modified"),
+          }, f)
+        partial_meta = self._read_meta(meta_path)
+
+      downloaded = 0
+      with open(partial_path, mode) as f:
+        for chunk in response.iter_content(chunk_size=CHUNK_SIZE):
+          f.write(chunk)
+          downloaded += len(chunk)
+
+    # Hash the whole file, including a resumed prefix
+    digest = hashlib.sha256()
+    with open(partial_path, "rb") as f:
+      for block in iter(lambda: f.read(CHUNK_SIZE), b""):
+        digest.update(block)
+    sha256 = digest.hexdigest()
+    size = os.path.getsize(partial_path)
+
+    os.replace(partial_path, self._object_path(sha256))
+    os.remove(meta_path)
+    with self._lock:
+      previous = self._index.get(url)
+      self._index[url] = {
+          "sha256": sha256,
+          "size": size,
+          "etag": partial_meta.get("etag"),
+          "last_modified": partial_meta.get("last_modified"),
+      }
+      self._save_index()
+    changed = previous is None or previous["sha256"] != sha256
+    print(f"Downloaded {url} ({downloaded} bytes{'' if changed else ', content unchanged'})")
+    return Artifact(url, self._object_path(sha256), sha256, size, changed, downloaded)
+
+  def fetch_many(self, urls: List[str]) -> List[Optional[Artifact]]:
+    """Fetch urls concurrently; a download that keeps failing is printed and returned as None."""
+    def fetch_or_none(url):
+      for attempt in range(1, DOWNLOAD_ATTEMPTS + 1):
+        try:
+          return self.fetch(url)
+        except (requests.RequestException, OSError) as e:
+          print(f"Error downloading {url} (attempt {attempt} of {DOWNLOAD_ATTEMPTS}): {e}")
+      return None
+
+    with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="artifact-fetch") as executor:
+      return list(executor.map(fetch_or_none, urls))
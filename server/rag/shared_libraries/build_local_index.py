@@ -0,0 +1,160 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Build the local retrieval indexes used with RAG_RETRIEVAL_BACKEND=local.
+
+Reads the same documents the Vertex AI corpora are made of:
+
+  asha_training  the ASHA module PDFs, through the artifact cache, chunked
+                 per page into overlapping word windows
+  forum          the forum threads exported by prepare_forum_corpus, one
+                 chunk per thread (long threads are split)
+
+and writes one VectorIndex per corpus under RAG_LOCAL_INDEX_DIR. The new
+index is written next to the old one and swapped in when complete.
+
+    python build_local_index.py                  # both corpora
+    python build_local_index.py --corpus forum
+"""
+
+import argparse
+import os
+import shutil
+import sys
+import time
+
+import numpy as np
+from dotenv import load_dotenv
+
+RAG_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+FORUM_DIR = os.path.abspath(os.path.join(RAG_DIR, "..", "forum"))
+sys.path.insert(0, RAG_DIR)
+
+from corpus_versions import bump_corpus_version
+from embeddings import HashingEmbedder
+from vector_index import VectorIndex
+
+load_dotenv()
+
+INDEX_DIR = os.getenv("RAG_LOCAL_INDEX_DIR", os.path.join(RAG_DIR, "local_index"))
+CHUNK_WORDS = int(os.getenv("LOCAL_INDEX_CHUNK_WORDS", "250"))
+CHUNK_OVERLAP = int(os.getenv("LOCAL_INDEX_CHUNK_OVERLAP", "50"))
+EMBEDDING_DIM = int(os.getenv("LOCAL_INDEX_DIM", "768"))
+EMBED_BATCH = 512
+
+
+def word_windows(text, size=CHUNK_WORDS, overlap=CHUNK_OVERLAP):
+  words = text.split()
+  step = max(1, size - overlap)
+  for start in range(0, max(1, len(words) - overlap), step):
+    window = words[start:start + size]
+    if window:
+      yield " ".join(window)
+
+
+def asha_chunks():
+  from pypdf import PdfReader
+  from artifact_cache import ArtifactCache
+  from prepare_asha_corpus import ASHA_MODULES, MODULE_TITLES
+
+  artifacts = ArtifactCache().fetch_many(ASHA_MODULES)
+  for file_idx, artifact in enumerate(artifacts):
+    if artifact is None:
+      print(f"Skipping {MODULE_TITLES[file_idx]}: download failed")
+      continue
+    reader = PdfReader(artifact.path)
+    for page_number, page in enumerate(reader.pages, 1):
+      for part, text in enumerate(word_windows(page.extract_text() or "")):
+        yield {
+            "id": f"{artifact.sha256[:12]}:p{page_number}:{part}",
+            "text": text,
+            "source": ASHA_MODULES[file_idx],
+            "title": MODULE_TITLES[file_idx],
+            "page": page_number,
+        }
+
+
+def forum_chunks():
+  sys.path.insert(0, FORUM_DIR)
+  from prepare_forum_corpus import create_database_connection, fetch_qa_data, format_qa_as_text
+
+  db = create_database_connection()
+  try:
+    for qa_item in fetch_qa_data(db):
+      question_id = qa_item["question_id"]
+      for part, text in enumerate(word_windows(format_qa_as_text(qa_item), size=CHUNK_WORDS * 2)):
+        yield {
+            "id": f"q{question_id}:{part}",
+            "text": text,
+            "source": f"forum/questions/{question_id}",
+            "question_id": question_id,
+        }
+  finally:
+    db.close()
+
+
+CORPORA = {
+    "asha_training": asha_chunks,
+    "forum": forum_chunks,
+}
+
+
+def build_index(name, chunks, out_dir):
+  started = time.perf_counter()
+  chunks = list(chunks)
+  if not chunks:
+    print(f"No documents for {name}, index not written")
+    return None
+  texts = [chunk["text"] for chunk in chunks]
+  embedder = HashingEmbedder(dim=EMBEDDING_DIM).fit_idf(texts)
+  vectors = np.concatenate([
+      embedder.embed(texts[start:start + EMBED_BATCH]) for start in range(0, len(texts), EMBED_BATCH)
+  ])
+  index = VectorIndex.build(vectors, chunks, embedder.to_config())
+
+  # Write beside the live index, then swap, so readers never see half an index
+  target = os.path.join(out_dir, name)
+  staging = target + ".new"
+  shutil.rmtree(staging, ignore_errors=True)
+  index.save(staging)
+  if os.path.exists(target):
+    retired = target + ".old"
+    shutil.rmtree(retired, ignore_errors=True)
+    os.replace(target, retired)
+    os.replace(staging, target)
+    shutil.rmtree(retired, ignore_errors=True)
+  else:
+    os.replace(staging, target)
+  bump_corpus_version(name, index.version)
+
+  print(
+      f"Built {name}: {len(chunks)} chunks, {index.nlist} lists, version {index.version} "
+      f"in {time.perf_counter() - started:.1f}s -> {target}"
+  )
+  return index
+
+
+def main():
+  parser = argparse.ArgumentParser(description="Build local retrieval indexes")
+  parser.add_argument("--corpus", choices=sorted(CORPORA) + ["all"], default="all")
+  parser.add_argument("--out", default=INDEX_DIR)
+  args = parser.parse_args()
+
+  names = sorted(CORPORA) if args.corpus == "all" else [args.corpus]
+  for name in names:
+    build_index(name, CORPORA[name](), args.out)
+
+
+if __name__ == "__main__":
+  main()
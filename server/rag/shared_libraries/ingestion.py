@@ -0,0 +1,306 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Concurrent, rate-limited uploads into a RAG corpus.
+
+Both corpus scripts (ASHA training PDFs and forum Q&A) push many files
+through `rag.upload_file`, and each call mostly waits on the network. The
+IngestionEngine runs those calls on a bounded thread pool, paces them with a
+token bucket so a burst stays under the Vertex AI quota, retries transient
+failures (rate limits, server errors, timeouts, dropped connections) with
+jittered exponential backoff, and can record finished items in a checkpoint
+file so an interrupted run resumes where it stopped. Any other error, such
+as a missing corpus or a rejected file, fails the item on the first attempt.
+
+Results come back on the caller's thread, in completion order, so callers
+can write to a database session or print progress without locking. Input is
+consumed lazily: at most `workers * 2` items are in flight at once.
+
+Only the standard library is required, so this module can be imported by
+the forum scripts and benchmarks without the ADK or Vertex AI SDK installed;
+the requests and google.api_core exception types are recognised when present.
+"""
+
+import json
+import os
+import random
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+RAG_UPLOAD_WORKERS = int(os.getenv("RAG_UPLOAD_WORKERS", "4"))
+RAG_UPLOAD_RATE = float(os.getenv("RAG_UPLOAD_RATE", "2.0"))  # uploads started per second
+RAG_UPLOAD_BURST = int(os.getenv("RAG_UPLOAD_BURST", "4"))
+RAG_UPLOAD_MAX_ATTEMPTS = int(os.getenv("RAG_UPLOAD_MAX_ATTEMPTS", "5"))
+RAG_UPLOAD_BACKOFF = float(os.getenv("RAG_UPLOAD_BACKOFF", "1.0"))  # seconds, first retry
+RAG_UPLOAD_MAX_BACKOFF = float(os.getenv("RAG_UPLOAD_MAX_BACKOFF", "30.0"))
+
+# Request timeout, rate limit, and server errors that may pass on their own
+TRANSIENT_STATUS_CODES = frozenset({408, 429, 500, 502, 503, 504})
+TRANSIENT_STATUS_NAMES = frozenset({"RESOURCE_EXHAUSTED", "UNAVAILABLE", "DEADLINE_EXCEEDED", "INTERNAL", "ABORTED"})
+
+TRANSIENT_ERRORS: Tuple[type, ...] = (TimeoutError, ConnectionError)
+try:
+  import requests
+  TRANSIENT_ERRORS += (requests.exceptions.Timeout, requests.exceptions.ConnectionError)
+except ImportError:
+  pass
+try:
+  from google.api_core import exceptions as api_exceptions
+  TRANSIENT_ERRORS += (
+      api_exceptions.TooManyRequests,
+      api_exceptions.ResourceExhausted,
+      api_exceptions.InternalServerError,
+      api_exceptions.BadGateway,
+      api_exceptions.ServiceUnavailable,
+      api_exceptions.GatewayTimeout,
+      api_exceptions.DeadlineExceeded,
+      api_exceptions.Aborted,
+  )
+except ImportError:
+  pass
+
+
+def _statuses(error: BaseException) -> Iterator[Any]:
+  yield getattr(error, "code", None)  # google.api_core, urllib HTTPError
+  yield getattr(error, "status_code", None)
+  yield getattr(getattr(error, "response", None), "status_code", None)  # requests HTTPError
+  for arg in error.args:
+    # rag.upload_file raises RuntimeError(message, error) with the JSON error
+    # body, e.g. {"code": 429, "status": "RESOURCE_EXHAUSTED", ...}
+    if isinstance(arg, dict):
+      yield arg.get("code")
+      yield arg.get("status")
+
+
+def is_transient_error(error: BaseException) -> bool:
+  """Whether retrying the call that raised `error` may succeed.
+
+  Follows the `raise ... from` chain, since rag.upload_file wraps transport
+  errors in a RuntimeError.
+  """
+  seen = set()
+  while error is not None and id(error) not in seen:
+    seen.add(id(error))
+    if isinstance(error, TRANSIENT_ERRORS):
+      return True
+    for status in _statuses(error):
+      if (isinstance(status, int) and status in TRANSIENT_STATUS_CODES) or (
+          isinstance(status, str) and status in TRANSIENT_STATUS_NAMES):
+        return True
+    error = error.__cause__
+  return False
+
+
+class TokenBucket:
+  """Allows `rate` acquisitions per second on average, `burst` at once."""
+
+  def __init__(self, rate: float, burst: int):
+    self.rate = rate
+    self.capacity = max(1, burst)
+    self._tokens = float(self.capacity)
+    self._updated = time.monotonic()
+    self._lock = threading.Lock()
+
+  def acquire(self):
+    if self.rate <= 0:  # unlimited
+      return
+    while True:
+      with self._lock:
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+        if self._tokens >= 1:
+          self._tokens -= 1
+          return
+        wait_for = (1 - self._tokens) / self.rate
+      time.sleep(wait_for)
+
+
+class Checkpoint:
+  """Append-only JSON-lines record of finished items, keyed by item key."""
+
+  def __init__(self, path: str):
+    self.path = path
+    self._lock = threading.Lock()
+    self.done: Dict[str, Any] = {}
+    if os.path.exists(path):
+      with open(path, encoding="utf-8") as f:
+        for line in f:
+          line = line.strip()
+          if not line:
+            continue
+          try:
+            record = json.loads(line)
+          except json.JSONDecodeError:
+            continue  # a line torn by a crash mid-write
+          if record.get("forget"):
+            self.done.pop(record["key"], None)
+          else:
+            self.done[record["key"]] = record.get("result")
+
+  def record(self, key: str, result: Any):
+    self._append(key, {"key": key, "result": result})
+
+  def forget(self, key: str):
+    """Drop a finished item, e.g. once the file it produced has been replaced."""
+    self._append(key, {"key": key, "forget": True})
+
+  def _append(self, key: str, record: dict):
+    with self._lock:
+      if record.get("forget"):
+        self.done.pop(key, None)
+      else:
+        self.done[key] = record["result"]
+      with open(self.path, "a", encoding="utf-8") as f:
+        f.write(json.dumps(record) + "\n")
+        f.flush()
+
+
+@dataclass
+class IngestionReport:
+  succeeded: int = 0
+  failed: int = 0
+  skipped: int = 0  # already in the checkpoint
+  retries: int = 0
+  elapsed: float = 0.0
+  errors: List[str] = field(default_factory=list)
+
+  @property
+  def throughput(self) -> float:
+    """Finished items per second."""
+    finished = self.succeeded + self.failed
+    return finished / self.elapsed if self.elapsed else 0.0
+
+  def summary(self) -> str:
+    return (
+        f"{self.succeeded} uploaded, {self.failed} failed, {self.skipped} skipped, "
+        f"{self.retries} retries in {self.elapsed:.1f}s ({self.throughput:.2f} items/s)"
+    )
+
+
+@dataclass
+class Outcome:
+  item: Any
+  key: str
+  result: Any = None
+  error: Optional[BaseException] = None
+  skipped: bool = False
+
+
+class IngestionEngine:
+  """Runs `work(item)` for many items with bounded concurrency, pacing and retries."""
+
+  def __init__(
+      self,
+      workers: int = RAG_UPLOAD_WORKERS,
+      rate: float = RAG_UPLOAD_RATE,
+      burst: int = RAG_UPLOAD_BURST,
+      max_attempts: int = RAG_UPLOAD_MAX_ATTEMPTS,
+      backoff: float = RAG_UPLOAD_BACKOFF,
+      max_backoff: float = RAG_UPLOAD_MAX_BACKOFF,
+      is_transient: Callable[[BaseException], bool] = is_transient_error,
+      checkpoint_path: Optional[str] = None,
+  ):
+    self.workers = max(1, workers)
+    self.bucket = TokenBucket(rate, burst)
+    self.max_attempts = max(1, max_attempts)
+    self.backoff = backoff
+    self.max_backoff = max_backoff
+    self.is_transient = is_transient
+    self.checkpoint = Checkpoint(checkpoint_path) if checkpoint_path else None
+    self.report = IngestionReport()
+    self._report_lock = threading.Lock()
+
+  def _attempt(self, work: Callable[[Any], Any], item: Any) -> Any:
+    attempt = 1
+    while True:
+      self.bucket.acquire()
+      try:
+        return work(item)
+      except Exception as e:
+        if attempt >= self.max_attempts or not self.is_transient(e):
+          raise
+        # Full jitter: spreads retries from parallel workers apart
+        delay = random.uniform(0, min(self.max_backoff, self.backoff * 2 ** (attempt - 1)))
+        with self._report_lock:
+          self.report.retries += 1
+        time.sleep(delay)
+        attempt += 1
+
+  def run(
+      self,
+      items: Iterable[Any],
+      work: Callable[[Any], Any],
+      key: Callable[[Any], str] = str,
+  ) -> Iterator[Outcome]:
+    """Yield one Outcome per item as work on it finishes.
+
+    Items whose key is already in the checkpoint are yielded as skipped,
+    with the recorded result, without calling work. Successful results are
+    checkpointed, so they must be JSON-serialisable when a checkpoint is used.
+    """
+    started = time.monotonic()
+    max_in_flight = self.workers * 2
+    in_flight = {}
+    source = iter(items)
+    exhausted = False
+
+    executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="rag-ingest")
+    try:
+      while True:
+        # Top up the pool without reading the whole input
+        while not exhausted and len(in_flight) < max_in_flight:
+          try:
+            item = next(source)
+          except StopIteration:
+            exhausted = True
+            break
+          item_key = key(item)
+          if self.checkpoint is not None and item_key in self.checkpoint.done:
+            self.report.skipped += 1
+            yield Outcome(item, item_key, result=self.checkpoint.done[item_key], skipped=True)
+            continue
+          in_flight[executor.submit(self._attempt, work, item)] = (item, item_key)
+
+        if not in_flight:
+          break
+
+        finished, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+        for future in finished:
+          item, item_key = in_flight.pop(future)
+          error = future.exception()
+          if error is None:
+            result = future.result()
+            if self.checkpoint is not None:
+              self.checkpoint.record(item_key, result)
+            self.report.succeeded += 1
+            yield Outcome(item, item_key, result=result)
+          else:
+            self.report.failed += 1
+            self.report.errors.append(f"{item_key}: {error}")
+            yield Outcome(item, item_key, error=error)
+    finally:
+      # Stopped early (or failed): don't start anything still queued, and
+      # checkpoint uploads that were already running so a resume skips them
+      for future in in_flight:
+        future.cancel()
+      executor.shutdown(wait=True)
+      if self.checkpoint is not None:
+        for future, (item, item_key) in in_flight.items():
+          if not future.cancelled() and future.exception() is None:
+            self.checkpoint.record(item_key, future.result())
+      self.report.elapsed += time.monotonic() - started
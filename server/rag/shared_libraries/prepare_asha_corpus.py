@@ -16,9 +16,15 @@ from google.auth import default
 import vertexai
 from vertexai.preview import rag
 import os
+import sys
 from dotenv import load_dotenv, set_key
-import requests
-import tempfile
+
+from artifact_cache import ArtifactCache
+from ingestion import IngestionEngine
+
+# Corpus version markers are shared with the agent's caches
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from corpus_versions import TRAINING_CORPUS, bump_corpus_version
 
 # Load environment variables from .env file
 load_dotenv()
@@ -40,6 +46,11 @@ CORPUS_DESCRIPTION = "Corpus containing ASHA Training Module documents"
 PDF_URL = "https://nhm.gov.in/images/pdf/communitisation/asha/book-no-1.pdf"
 PDF_FILENAME = "book-no-1.pdf"
 ENV_FILE_PATH = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", ".env"))
+# Modules already uploaded, so a rerun after a failure only retries what is missing
+CHECKPOINT_PATH = os.getenv(
+    "ASHA_INGEST_CHECKPOINT",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), ".asha_ingest_checkpoint.jsonl"),
+)
 
 ASHA_MODULES = [
   'https://nhm.gov.in/images/pdf/communitisation/asha/book-no-1.pdf',
@@ -106,35 +117,48 @@ def create_or_get_corpus():
   return corpus
 
 
-def download_pdf_from_url(url, output_path):
-  """Downloads a PDF file from the specified URL."""
-  print(f"Downloading PDF from {url}...")
-  response = requests.get(url, stream=True)
-  response.raise_for_status()  # Raise an exception for HTTP errors
-  
-  with open(output_path, 'wb') as f:
-    for chunk in response.iter_content(chunk_size=8192):
-      f.write(chunk)
-  
-  print(f"PDF downloaded successfully to {output_path}")
-  return output_path
-
-
 def upload_pdf_to_corpus(corpus_name, pdf_path, display_name, description):
-  """Uploads a PDF file to the specified corpus."""
+  """Uploads a PDF file to the specified corpus. Errors propagate so the caller can retry."""
   print(f"Uploading {display_name} to corpus...")
-  try:
-    rag_file = rag.upload_file(
-        corpus_name=corpus_name,
-        path=pdf_path,
-        display_name=display_name,
-        description=description,
-    )
-    print(f"Successfully uploaded {display_name} to corpus")
-    return rag_file
-  except Exception as e:
-    print(f"Error uploading file {display_name}: {e}")
-    return None
+  rag_file = rag.upload_file(
+      corpus_name=corpus_name,
+      path=pdf_path,
+      display_name=display_name,
+      description=description,
+  )
+  print(f"Successfully uploaded {display_name} to corpus")
+  return rag_file
+
+
+def module_key(corpus_name, file_idx, artifact):
+  """Checkpoint key of one version of a module in one corpus."""
+  return f"{corpus_name}|{ASHA_MODULES[file_idx]}|{artifact.sha256}"
+
+
+def ingest_module(corpus_name, file_idx, artifact):
+  """Uploads one cached training module; returns the RAG file name."""
+  filename = f"{MODULE_TITLES[file_idx]}.pdf"
+  rag_file = upload_pdf_to_corpus(
+      corpus_name=corpus_name,
+      pdf_path=artifact.path,
+      display_name=filename,
+      description=f"{MODULE_TITLES[file_idx]}",
+  )
+  return rag_file.name
+
+
+def delete_superseded_versions(engine, corpus_name, file_idx, current_key):
+  """Deletes corpus files uploaded for older contents of a module."""
+  prefix = f"{corpus_name}|{ASHA_MODULES[file_idx]}|"
+  for key, rag_file_name in list(engine.checkpoint.done.items()):
+    if key.startswith(prefix) and key != current_key:
+      try:
+        rag.delete_file(name=rag_file_name)
+        print(f"Deleted superseded version {rag_file_name} of {MODULE_TITLES[file_idx]}")
+      except Exception as e:
+        print(f"Error deleting superseded file {rag_file_name}: {e}")
+        continue
+      engine.checkpoint.forget(key)
 
 def update_env_file(corpus_name, env_file_path):
     """Updates the .env file with the corpus name."""
@@ -159,26 +183,35 @@ def main():
   # Update the .env file with the corpus name
   update_env_file(corpus.name, ENV_FILE_PATH)
 
-  for file_idx, file_url in enumerate(ASHA_MODULES):
-    # filename = f"asha_module_{file_idx + 1}.pdf"
-    filename = f"{MODULE_TITLES[file_idx]}.pdf"
-    print(f"Processing {filename} from {file_url}...")
-    # Create a temporary directory to store the downloaded PDF
-    with tempfile.TemporaryDirectory() as temp_dir:
-      pdf_path = os.path.join(temp_dir, filename)
-      
-      # Download the PDF from the URL
-      download_pdf_from_url(file_url, pdf_path)
-      print(f"Downloading PDF from {file_url} to {pdf_path}...")
-      
-      # Upload the PDF to the corpus
-      upload_pdf_to_corpus(
-          corpus_name=corpus.name,
-          pdf_path=pdf_path,
-          display_name=filename,
-          description=f"{MODULE_TITLES[file_idx]}",
-      )
-    
+  # Download all modules concurrently into the local artifact cache; unchanged
+  # modules are revalidated with a conditional GET instead of re-downloaded
+  artifacts = ArtifactCache().fetch_many(ASHA_MODULES)
+  modules = [(file_idx, artifact) for file_idx, artifact in enumerate(artifacts) if artifact is not None]
+
+  # Upload several modules at once. Uploads are checkpointed per corpus and
+  # content hash, so a module whose content has not changed is skipped
+  engine = IngestionEngine(checkpoint_path=CHECKPOINT_PATH)
+  outcomes = engine.run(
+      modules,
+      work=lambda module: ingest_module(corpus.name, *module),
+      key=lambda module: module_key(corpus.name, *module),
+  )
+  changed = 0
+  for outcome in outcomes:
+    file_idx, _ = outcome.item
+    title = MODULE_TITLES[file_idx]
+    if outcome.skipped:
+      print(f"Skipping {title}: unchanged since it was uploaded as {outcome.result}")
+    elif outcome.error is not None:
+      print(f"Error ingesting {title}: {outcome.error}")
+    else:
+      delete_superseded_versions(engine, corpus.name, file_idx, outcome.key)
+      changed += 1
+  if changed:
+    # Answers and retrievals cached against the old modules are now stale
+    bump_corpus_version(TRAINING_CORPUS)
+  print(f"Ingestion finished: {engine.report.summary()}, {len(ASHA_MODULES) - len(modules)} downloads failed")
+
   # List all files in the corpus
   list_corpus_files(corpus_name=corpus.name)
 
@@ -0,0 +1,202 @@
+"""Memory-mapped int8 IVF vector index for local retrieval.
+
+Vectors are L2-normalised embeddings of corpus chunks. At build time they
+are clustered with spherical k-means into `nlist` inverted lists, stored
+sorted by list so each list is one contiguous slice, and quantised to int8
+with one float32 scale per row (a quarter of the float32 size, with cosine
+scores accurate to about 1%). A search scores the query against the
+centroids, then only against the rows of the `nprobe` closest lists.
+
+On disk an index is a directory:
+
+    vectors.npy    int8 [n, dim]     opened with mmap, never read whole
+    scales.npy     float32 [n]
+    ids.npy        int64 [n]         row -> chunk number
+    centroids.npy  float32 [nlist, dim]
+    offsets.npy    int64 [nlist + 1] list i is rows offsets[i]:offsets[i+1]
+    chunks.jsonl   one chunk per line: {"id", "text", "source", ...}
+    meta.json      dim, nlist, nprobe, embedder config, corpus version
+
+Distances follow Vertex AI RAG's convention for cosine: 1 - similarity, so
+`vector_distance_threshold` keeps hits with a distance at or below it.
+"""
+
+import hashlib
+import json
+import os
+from dataclasses import dataclass
+from typing import List, Optional
+
+import numpy as np
+
+
+@dataclass
+class SearchHit:
+    chunk: dict
+    distance: float
+
+
+def spherical_kmeans(vectors: np.ndarray, nlist: int, iterations: int = 10, seed: int = 0) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    centroids = vectors[rng.choice(len(vectors), size=nlist, replace=False)].copy()
+    for _ in range(iterations):
+        assignment = assign_lists(vectors, centroids)
+        for list_id in range(nlist):
+            members = vectors[assignment == list_id]
+            if len(members):
+                centroid = members.sum(axis=0)
+                norm = np.linalg.norm(centroid)
+                centroids[list_id] = centroid / norm if norm else centroid
+            else:
+                # Reseed an empty list with a random row
+                centroids[list_id] = vectors[rng.integers(len(vectors))]
+    return centroids
+
+
+def assign_lists(vectors: np.ndarray, centroids: np.ndarray, batch: int = 8192) -> np.ndarray:
+    assignment = np.empty(len(vectors), dtype=np.int64)
+    for start in range(0, len(vectors), batch):
+        assignment[start:start + batch] = np.argmax(vectors[start:start + batch] @ centroids.T, axis=1)
+    return assignment
+
+
+def quantize(vectors: np.ndarray):
+    scales = np.abs(vectors).max(axis=1) / 127.0
+    scales[scales == 0] = 1.0
+    quantized = np.round(vectors / scales[:, None]).astype(np.int8)
+    return quantized, scales.astype(np.float32)
+
+
+class VectorIndex:
+
+    def __init__(self, vectors, scales, ids, centroids, offsets, chunks: List[dict], meta: dict):
+        self.vectors = vectors
+        self.scales = scales
+        self.ids = ids
+        self.centroids = centroids
+        self.offsets = offsets
+        self.chunks = chunks
+        self.meta = meta
+
+    @property
+    def version(self) -> str:
+        return self.meta["version"]
+
+    @property
+    def nlist(self) -> int:
+        return len(self.centroids)
+
+    # Building
+    @classmethod
+    def build(
+        cls,
+        vectors: np.ndarray,
+        chunks: List[dict],
+        embedder_config: dict,
+        nlist: Optional[int] = None,
+        nprobe: Optional[int] = None,
+    ) -> "VectorIndex":
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        count = len(vectors)
+        if count == 0:
+            raise ValueError("Cannot build an index without vectors")
+        nlist = nlist or max(1, min(4096, int(np.sqrt(count))))
+        nlist = min(nlist, count)
+
+        centroids = spherical_kmeans(vectors, nlist) if nlist > 1 else _mean_centroid(vectors)
+        assignment = assign_lists(vectors, centroids)
+        order = np.argsort(assignment, kind="stable")
+        counts = np.bincount(assignment, minlength=nlist)
+        offsets = np.concatenate([[0], np.cumsum(counts)]).astype(np.int64)
+        quantized, scales = quantize(vectors[order])
+
+        version = hashlib.sha256()
+        for chunk in chunks:
+            version.update(chunk["id"].encode("utf-8"))
+            version.update(hashlib.sha256(chunk["text"].encode("utf-8")).digest())
+
+        meta = {
+            "dim": int(vectors.shape[1]),
+            "count": count,
+            "nlist": nlist,
+            "nprobe": nprobe or min(nlist, 8),
+            "embedder": embedder_config,
+            "version": version.hexdigest()[:16],
+        }
+        return cls(quantized, scales, order.astype(np.int64), centroids.astype(np.float32), offsets, chunks, meta)
+
+    def save(self, directory: str):
+        os.makedirs(directory, exist_ok=True)
+        np.save(os.path.join(directory, "vectors.npy"), self.vectors)
+        np.save(os.path.join(directory, "scales.npy"), self.scales)
+        np.save(os.path.join(directory, "ids.npy"), self.ids)
+        np.save(os.path.join(directory, "centroids.npy"), self.centroids)
+        np.save(os.path.join(directory, "offsets.npy"), self.offsets)
+        with open(os.path.join(directory, "chunks.jsonl"), "w", encoding="utf-8") as f:
+            for chunk in self.chunks:
+                f.write(json.dumps(chunk, ensure_ascii=False) + "\n")
+        # meta.json last: its presence marks a complete index
+        with open(os.path.join(directory, "meta.json"), "w", encoding="utf-8") as f:
+            json.dump(self.meta, f)
+
+    @classmethod
+    def load(cls, directory: str, mmap: bool = True) -> "VectorIndex":
+        with open(os.path.join(directory, "meta.json"), encoding="utf-8") as f:
+            meta = json.load(f)
+        with open(os.path.join(directory, "chunks.jsonl"), encoding="utf-8") as f:
+            chunks = [json.loads(line) for line in f if line.strip()]
+        return cls(
+            np.load(os.path.join(directory, "vectors.npy"), mmap_mode="r" if mmap else None),
+            np.load(os.path.join(directory, "scales.npy")),
+            np.load(os.path.join(directory, "ids.npy")),
+            np.load(os.path.join(directory, "centroids.npy")),
+            np.load(os.path.join(directory, "offsets.npy")),
+            chunks,
+            meta,
+        )
+
+    # Searching
+    def search(
+        self,
+        query: np.ndarray,
+        top_k: int = 10,
+        max_distance: Optional[float] = None,
+        nprobe: Optional[int] = None,
+    ) -> List[SearchHit]:
+        query = np.asarray(query, dtype=np.float32).reshape(-1)
+        nprobe = min(self.nlist, nprobe or self.meta["nprobe"])
+
+        centroid_scores = self.centroids @ query
+        if nprobe < self.nlist:
+            probe = np.argpartition(-centroid_scores, nprobe - 1)[:nprobe]
+        else:
+            probe = np.arange(self.nlist)
+
+        rows, scores = [], []
+        for list_id in probe:
+            start, end = self.offsets[list_id], self.offsets[list_id + 1]
+            if start == end:
+                continue
+            block = np.asarray(self.vectors[start:end], dtype=np.float32)
+            scores.append((block @ query) * self.scales[start:end])
+            rows.append(np.arange(start, end))
+        if not scores:
+            return []
+        scores = np.concatenate(scores)
+        rows = np.concatenate(rows)
+
+        distances = 1.0 - scores
+        if max_distance is not None:
+            keep = distances <= max_distance
+            distances, rows = distances[keep], rows[keep]
+        if len(distances) > top_k:
+            best = np.argpartition(distances, top_k - 1)[:top_k]
+            distances, rows = distances[best], rows[best]
+        order = np.argsort(distances, kind="stable")
+        return [SearchHit(self.chunks[self.ids[rows[i]]], float(distances[i])) for i in order]
+
+
+def _mean_centroid(vectors: np.ndarray) -> np.ndarray:
+    centroid = vectors.mean(axis=0, keepdims=True)
+    norm = np.linalg.norm(centroid)
+    return centroid / norm if norm else centroid